@@ -0,0 +1,83 @@
+"""Benchmark the extraction of the `dv1` viewer payload from register pages.
+
+Compares the DOM-based extraction of `ChurchRegisterSpider` (lxml, XPath, regex and
+one base64 decode per page) with the byte scan of `extract_register_pages`.
+
+The saved register page in `tests/fixtures/church_register.html` is used as is and
+with its `dv1` payload replaced by registers of more pages (up to 5000 by default),
+to show how both approaches scale with the size of a register.
+
+Usage:
+    $ python benchmarks/bench_dv1_extraction.py --pages 500 5000 --repeat 20
+"""
+
+import argparse
+import base64
+import json
+import re
+import timeit
+from pathlib import Path
+
+FIXTURE = Path(__file__).parent.parent / "tests" / "fixtures" / "church_register.html"
+REGISTER = "https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/KB+001/?pg=1"
+
+
+def make_register(template: str, pages: int) -> bytes:
+    """Replace the labels and files of the saved register with `pages` generated pages."""
+    images = [
+        f"http://hosted-images.matricula-online.eu/images/matricula/DE/AA/aachen-hl-kreuz/KB+001/KB+001_{i:05d}.jpg"
+        for i in range(1, pages + 1)
+    ]
+    files = [
+        "/image/" + base64.b64encode(url.encode()).decode().rstrip("=") + "/"
+        for url in images
+    ]
+    labels = [str(i) for i in range(1, pages + 1)]
+    html = re.sub(r'"labels": \[[^\]]*\]', f'"labels": {json.dumps(labels)}', template)
+    html = re.sub(r'"files": \[[^\]]*\]', f'"files": {json.dumps(files)}', html)
+    return html.encode()
+
+
+def main():  # noqa: D103
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[500, 5000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from scrapy.http import HtmlResponse
+    from scrapy.utils.test import get_crawler
+
+    from matricula_online_scraper.spiders.church_register import ChurchRegisterSpider
+    from matricula_online_scraper.spiders.utils import extract_register_pages
+
+    spider = ChurchRegisterSpider.from_crawler(get_crawler(ChurchRegisterSpider))
+    template = FIXTURE.read_text(encoding="utf-8")
+    bodies = {"fixture": template.encode()} | {
+        f"{pages} pages": make_register(template, pages) for pages in args.pages
+    }
+
+    print(
+        f"{'register':<12} {'size (KiB)':>10} {'DOM (ms)':>10} {'fast (ms)':>10} {'speedup':>8}"
+    )
+    for name, body in bodies.items():
+
+        def dom():
+            # a new response each time, the selector is cached per response
+            response = HtmlResponse(REGISTER, body=body, encoding="utf-8")
+            return spider._extract_pages_from_dom(response)
+
+        def fast():
+            return extract_register_pages(body)
+
+        assert dom() == fast(), f"results differ for {name}"
+
+        dom_ms = min(timeit.repeat(dom, number=1, repeat=args.repeat)) * 1000
+        fast_ms = min(timeit.repeat(fast, number=1, repeat=args.repeat)) * 1000
+        print(
+            f"{name:<12} {len(body) / 1024:>10.1f} {dom_ms:>10.3f} {fast_ms:>10.3f}"
+            f" {dom_ms / fast_ms:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
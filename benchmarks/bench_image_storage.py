@@ -0,0 +1,148 @@
+"""Benchmark the storage modes of `parish fetch --storage` against each other.
+
+Feeds synthetic scans into `CustomImagesPipeline` (`reencode`) and
+`RawImagesPipeline` (`raw`) as if they had been downloaded and reports the
+throughput (pages/s) and the peak memory (RSS) of each. No network is involved,
+only the processing and storing of the responses is measured.
+
+Each mode runs in a fresh subprocess so that the peak RSS of one mode
+does not affect the other.
+
+Usage:
+    $ python benchmarks/bench_image_storage.py --pages 200 --width 2480 --height 3508
+"""
+
+import argparse
+import io
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+MODES = ("reencode", "raw")
+REGISTER = (
+    "https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/KB+001/"
+)
+
+
+def make_scan(width: int, height: int) -> bytes:
+    """Create a JPEG that roughly resembles a scanned page in size and entropy."""
+    from PIL import Image
+
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    buf = io.BytesIO()
+    image.save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+def run_mode(mode: str, pages: int, scan_path: Path) -> dict:
+    """Store `pages` copies of the scan with the pipeline of `mode`."""
+    from scrapy.http import Response
+    from scrapy.utils.test import get_crawler
+    from twisted.internet.defer import maybeDeferred
+
+    from matricula_online_scraper.spiders.church_register import (
+        ChurchRegisterDownloadItem,
+        ChurchRegisterSpider,
+    )
+    from matricula_online_scraper.utils.file_format import ImageStorage
+
+    body = scan_path.read_bytes()
+    image_urls = [
+        f"http://hosted-images.matricula-online.eu/images/KB_001/KB_001_{i:04d}.jpg"
+        for i in range(pages)
+    ]
+    item = ChurchRegisterDownloadItem(image_urls=image_urls, original_url=REGISTER)
+
+    with tempfile.TemporaryDirectory() as store:
+        crawler = get_crawler(
+            ChurchRegisterSpider,
+            {"IMAGES_STORE": store, "IMAGES_STORAGE": mode, "LOG_ENABLED": False},
+        )
+        crawler.spider = ChurchRegisterSpider.from_crawler(crawler)
+        pipeline_path = ImageStorage(mode).to_pipeline()
+        module, name = pipeline_path.rsplit(".", 1)
+        pipeline_cls = getattr(__import__(module, fromlist=[name]), name)
+        pipeline = pipeline_cls.from_crawler(crawler)
+        pipeline.open_spider(crawler.spider)
+
+        failures = []
+        start = time.perf_counter()
+        for request in pipeline.get_media_requests(item, pipeline.spiderinfo):
+            response = Response(request.url, body=body, request=request)
+            dfd = maybeDeferred(
+                pipeline.media_downloaded,
+                response,
+                request,
+                pipeline.spiderinfo,
+                item=item,
+            )
+            dfd.addErrback(failures.append)
+        elapsed = time.perf_counter() - start
+
+    if failures:
+        raise RuntimeError(f"{len(failures)} pages failed: {failures[0]}")
+
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mib = peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    return {
+        "mode": mode,
+        "pages": pages,
+        "seconds": elapsed,
+        "pages_per_second": pages / elapsed,
+        "peak_rss_mib": peak_mib,
+    }
+
+
+def main():  # noqa: D103
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--width", type=int, default=2480)
+    parser.add_argument("--height", type=int, default=3508)
+    parser.add_argument("--run", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--scan", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # child process: run a single mode and report as JSON
+    if args.run:
+        print(json.dumps(run_mode(args.run, args.pages, args.scan)))
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=".jpg") as scan:
+        scan.write(make_scan(args.width, args.height))
+        scan.flush()
+        size_mib = Path(scan.name).stat().st_size / 1024 / 1024
+        print(
+            f"{args.pages} pages, {args.width}x{args.height} px, {size_mib:.1f} MiB per scan\n"
+        )
+        print(f"{'mode':<10} {'pages/s':>10} {'seconds':>10} {'peak RSS (MiB)':>16}")
+
+        for mode in MODES:
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--run",
+                    mode,
+                    "--pages",
+                    str(args.pages),
+                    "--scan",
+                    scan.name,
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{mode:<10} {result['pages_per_second']:>10.1f}"
+                f" {result['seconds']:>10.2f} {result['peak_rss_mib']:>16.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
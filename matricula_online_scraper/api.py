@@ -0,0 +1,288 @@
+"""Python API to scrape Matricula Online from an asyncio application.
+
+The CLI's commands own Twisted's reactor and write their results to files. The
+functions of this module instead run the spiders in the caller's event loop and yield
+their items as async iterators, as soon as they were scraped:
+
+- `iter_parishes` the parishes found by a search, like `parish list`
+- `iter_registers` the registers of a parish, like `parish show`
+- `download_register` the pages of a register, like `parish fetch`
+
+Scrapy runs on Twisted's asyncio reactor, which is installed on the running event
+loop by the first call. Hence, all calls must be made from that loop and no other
+reactor may be installed before, e.g. by running a CLI command in the same process.
+
+Items are handed over through a bounded buffer: if the caller consumes them slower than
+they are scraped, the spider waits. Breaking out of the loop stops the spider.
+
+Example:
+>>> async for register in iter_registers("https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/"):
+...     async for page in download_register(register.url, Path("images")):
+...         print(page.path)
+"""
+
+import asyncio
+import contextlib
+import functools
+import sys
+import threading
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from matricula_online_scraper.utils.download_journal import (
+    DownloadJournal,
+    register_key,
+)
+from matricula_online_scraper.utils.file_format import ImageStorage
+from matricula_online_scraper.utils.matricula_url import (
+    ParishPageURL,
+    ParishRegisterURL,
+)
+from matricula_online_scraper.utils.page_selection import PageSelection
+
+if TYPE_CHECKING:
+    from matricula_online_scraper.spiders.parish import ParishRegisterMetadata
+    from matricula_online_scraper.spiders.parish_list import ParishMetadata
+
+# NOTE: Scrapy and the spiders are imported after the asyncio reactor was installed,
+# because importing them installs Twisted's default reactor, see `_install_reactor`.
+
+ASYNCIO_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
+
+MAX_BUFFERED_ITEMS = 64
+"""Number of items that are scraped ahead of the caller before the spider waits."""
+
+
+@dataclass
+class DownloadedPage:
+    """A page of a register that `download_register` stored or found up to date on disk."""
+
+    register: str
+    """URL of the register, without `?pg=`."""
+    path: Path
+    """Absolute path of the image file."""
+
+
+def _install_reactor(loop: asyncio.AbstractEventLoop) -> None:
+    """Install Twisted's asyncio reactor on `loop`, unless it already runs on it."""
+    if "twisted.internet.reactor" not in sys.modules:
+        from twisted.internet import asyncioreactor
+
+        asyncioreactor.install(eventloop=loop)
+
+    from twisted.internet import reactor
+
+    if getattr(reactor, "_asyncioEventloop", None) is not loop:
+        raise RuntimeError(
+            "Scrapy runs on Twisted's reactor, which is bound to the event loop of the"
+            " first call of this API. Make all calls from that loop and do not install"
+            " another reactor before."
+        )
+    if not reactor.running:  # type: ignore
+        # the reactor is never stopped, so its idle threads must not keep the process
+        # from exiting
+        reactor.getThreadPool().threadFactory = functools.partial(  # type: ignore
+            threading.Thread, daemon=True
+        )
+        # like `reactor.run()` without running the loop, which is the caller's job,
+        # e.g. starts the thread pool used to write images
+        reactor.startRunning(installSignalHandlers=False)  # type: ignore
+
+
+async def _crawl(
+    spidercls: type,
+    settings: dict[str, Any] | None,
+    *,
+    signal: Any = None,
+    receive: Callable[..., Any] = lambda item, **_: item,
+    **kwargs: Any,
+) -> AsyncIterator[Any]:
+    """Run a spider in the running event loop and yield what it sends with `signal`.
+
+    Args:
+        spidercls (type): The spider to run.
+        settings (dict[str, Any] | None): Additional Scrapy settings.
+        signal (Any, optional): Signal to yield from. Defaults to Scrapy's `item_scraped`.
+        receive (Callable[..., Any], optional): Turns the arguments of `signal` into
+            what is yielded. Defaults to the scraped item.
+        **kwargs: Arguments of the spider.
+    """
+    from scrapy import signals
+    from scrapy.crawler import CrawlerRunner
+    from twisted.internet.defer import Deferred
+
+    loop = asyncio.get_running_loop()
+    runner = CrawlerRunner(
+        settings=(settings or {}) | {"TWISTED_REACTOR": ASYNCIO_REACTOR}
+    )
+    crawler = runner.create_crawler(spidercls)
+    buffer: asyncio.Queue = asyncio.Queue(maxsize=MAX_BUFFERED_ITEMS)
+    done = object()
+
+    def handover(**arguments: Any) -> Deferred | None:
+        value = receive(**arguments)
+        try:
+            buffer.put_nowait(value)
+        except asyncio.QueueFull:
+            # the sender of the signal waits for the Deferred, i.e. for the caller
+            return Deferred.fromFuture(loop.create_task(buffer.put(value)))
+        return None
+
+    crawler.signals.connect(
+        handover, signal=signals.item_scraped if signal is None else signal, weak=False
+    )
+    crawling = runner.crawl(crawler, **kwargs).asFuture(loop)
+    crawling.add_done_callback(lambda _: loop.create_task(buffer.put(done)))
+
+    try:
+        while (value := await buffer.get()) is not done:
+            yield value
+        crawling.result()  # raises if the crawl failed
+    finally:
+        if not crawling.done():  # the caller stopped early
+
+            async def discard():
+                while True:
+                    await buffer.get()
+
+            # the spider may wait for space in the buffer until it stopped
+            discarding = loop.create_task(discard())
+            crawling.add_done_callback(lambda _: discarding.cancel())
+            # NOTE: Neither the crawler's stop nor the crawl itself may be cancelled
+            # with this generator, e.g. when it is finalized while `asyncio.run`
+            # cancels the remaining tasks. That leaves the engine half-stopped and
+            # the loop waiting for it forever. `asyncio.wait` does not cancel them.
+            stopping = crawler.stop()
+            # only cancelled if the loop shuts down, then there is nothing to report
+            stopping.addErrback(lambda failure: failure.trap(asyncio.CancelledError))
+            await asyncio.wait([crawling])
+
+
+async def iter_parishes(
+    place: str = "",
+    diocese: int | None = None,
+    date_range: tuple[int, int] | None = None,
+    include_coordinates: bool = False,
+    *,
+    settings: dict[str, Any] | None = None,
+) -> AsyncIterator["ParishMetadata"]:
+    """Yield the parishes found by a search, like `parish list`.
+
+    Args:
+        place (str, optional): Full-text search for a region or parish name.
+        diocese (int | None, optional): Enum value of a diocese.
+        date_range (tuple[int, int] | None, optional): Only parishes with registers in
+            this range of years.
+        include_coordinates (bool, optional): Also fetch each parish's page for its
+            coordinates.
+        settings (dict[str, Any] | None, optional): Additional Scrapy settings, e.g.
+            `{"AUTOTUNE_ENABLED": True}`.
+    """
+    _install_reactor(asyncio.get_running_loop())
+    from matricula_online_scraper.spiders.parish_list import ParishMetadataSpider
+
+    async with contextlib.aclosing(
+        _crawl(
+            ParishMetadataSpider,
+            settings,
+            place=place,
+            diocese=diocese,
+            date_filter=date_range is not None,
+            date_range=date_range or (0, 9999),
+            include_coordinates=include_coordinates,
+        )
+    ) as parishes:
+        async for parish in parishes:
+            yield parish
+
+
+async def iter_registers(
+    parish_url: str, *, settings: dict[str, Any] | None = None
+) -> AsyncIterator["ParishRegisterMetadata"]:
+    """Yield the registers of a parish and their metadata, like `parish show`.
+
+    Args:
+        parish_url (str): URL of the parish's page.
+        settings (dict[str, Any] | None, optional): Additional Scrapy settings.
+
+    Raises:
+        ValueError: If `parish_url` is not a parish's page.
+    """
+    if not ParishPageURL(parish_url).is_valid:
+        raise ValueError(f"Invalid parish URL: {parish_url}")
+    _install_reactor(asyncio.get_running_loop())
+    from matricula_online_scraper.spiders.parish import ParishSpider
+
+    async with contextlib.aclosing(
+        _crawl(ParishSpider, settings, start_urls=[parish_url])
+    ) as registers:
+        async for register in registers:
+            yield register
+
+
+async def download_register(
+    url: str,
+    dest: Path,
+    *,
+    storage: ImageStorage = ImageStorage.REENCODE,
+    pages: PageSelection | str | None = None,
+    resume: bool = False,
+    settings: dict[str, Any] | None = None,
+) -> AsyncIterator[DownloadedPage]:
+    """Download the pages of a register to `dest` and yield each once it is on disk.
+
+    Like `parish fetch`, the progress is recorded in the journal of `dest`. Pages that
+    failed to download are not yielded, download them again with `resume=True`.
+
+    Args:
+        url (str): URL of the register.
+        dest (Path): Directory to save the image files in.
+        storage (ImageStorage, optional): How to store the images. Archives are not
+            supported, because their pages are not stored one by one.
+        pages (PageSelection | str | None, optional): Only download these pages, e.g.
+            `"10-40,55"`. Defaults to all pages.
+        resume (bool, optional): Only request the pages that the journal does not list
+            as completed.
+        settings (dict[str, Any] | None, optional): Additional Scrapy settings.
+
+    Raises:
+        ValueError: If `url` is not a register, `storage` is an archive or `pages` is
+            not a valid selection.
+    """
+    if not ParishRegisterURL(url).is_valid:
+        raise ValueError(f"Invalid parish register URL: {url}")
+    storage = ImageStorage(storage)
+    if storage.is_archive:
+        raise ValueError(
+            f"Pages stored as '{storage.value}' are not yielded one by one."
+        )
+    if isinstance(pages, str):
+        pages = PageSelection.parse(pages)
+    _install_reactor(asyncio.get_running_loop())
+    from matricula_online_scraper.pipelines.images_pipeline import page_stored
+    from matricula_online_scraper.spiders.church_register import ChurchRegisterSpider
+
+    dest = Path(dest).resolve()
+    register = register_key(url)
+    journal = DownloadJournal(dest)
+    try:
+        # the crawl must have stopped before the journal is closed
+        async with contextlib.aclosing(
+            _crawl(
+                ChurchRegisterSpider,
+                {"IMAGES_STORE": str(dest), "IMAGES_STORAGE": storage}
+                | (settings or {}),
+                signal=page_stored,
+                receive=lambda source, **_: DownloadedPage(register, Path(source)),
+                start_urls=[url],
+                journal=journal,
+                resume=resume,
+                pages=pages,
+            )
+        ) as downloaded:
+            async for page in downloaded:
+                yield page
+    finally:
+        journal.close()
@@ -0,0 +1,41 @@
+"""Options that are shared by several commands."""
+
+from typing import Annotated
+
+import typer
+
+AutotuneOption = Annotated[
+    bool,
+    typer.Option(
+        "--autotune",
+        help=(
+            "Adapt the number of concurrent requests per host to its latency and rate limits"
+            " (429, Retry-After). A summary of the chosen concurrency is shown at the end."
+        ),
+    ),
+]
+"""Enables `AutotuneDownloaderMiddleware` through the `AUTOTUNE_ENABLED` setting."""
+
+CacheOption = Annotated[
+    bool,
+    typer.Option(
+        "--cache",
+        help=(
+            "Keep the HTML pages that were fetched in a cache shared by all commands"
+            " and reuse them for a week instead of fetching them again. Images are never cached."
+        ),
+    ),
+]
+"""Enables `HttpCacheMiddleware` with `SqliteCacheStorage`, see `cache_settings`."""
+
+OfflineOption = Annotated[
+    bool,
+    typer.Option(
+        "--offline",
+        help=(
+            "Do not send any request, only use the pages in the cache (see --cache),"
+            " no matter how old they are. Pages that are not cached are skipped."
+        ),
+    ),
+]
+"""Serves all requests from the cache, see `cache_settings`."""
@@ -4,28 +4,22 @@ from pathlib import Path
 from typing import Annotated, Optional
 
 import typer
-from rich.console import Console
-from rich.progress import (
-    Progress,
-    SpinnerColumn,
-    TextColumn,
-    TimeElapsedColumn,
-)
-from scrapy.crawler import CrawlerRunner
-from twisted.internet import reactor
 
 from matricula_online_scraper.logging_config import get_logger
-from matricula_online_scraper.spiders.newsfeed_spider import NewsfeedSpider
 from matricula_online_scraper.utils.common_error import UNKNOWN_ERROR_MSG
 from matricula_online_scraper.utils.shorten_path import shorten_path
-from matricula_online_scraper.utils.user_console import Level, UserConsole
+from matricula_online_scraper.utils.user_console import UserConsole
 
 from ..utils.file_format import FileFormat
+from .common import AutotuneOption, CacheOption, OfflineOption
+
+# NOTE: Scrapy, Twisted, the spider and rich's progress bar are imported by the command,
+# so that the CLI starts fast when it is not needed, see `test_startup.py`.
 
 logger = get_logger(__name__)
 usrcon = UserConsole()
 
-app = typer.Typer()
+app = typer.Typer(rich_markup_mode=None)  # NOTE: see `main.py`
 
 
 @app.command()
@@ -63,6 +57,9 @@ def fetch(
             min=1,
         ),
     ] = 100,
+    autotune: AutotuneOption = False,
+    cache: CacheOption = False,
+    offline: OfflineOption = False,
 ):
     """Download Matricula Online's newsfeed.
 
@@ -70,6 +67,13 @@ def fetch(
  other changes: https://data.matricula-online.eu/en/nachrichten/.\
  This command will download the entire newsfeed or a limited number of news articles.
     """
+    from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+    from scrapy.crawler import CrawlerRunner
+    from twisted.internet import reactor
+
+    from matricula_online_scraper.middlewares.http_cache import cache_settings
+    from matricula_online_scraper.spiders.newsfeed_spider import NewsfeedSpider
+
     cmd_logger = logger.getChild(fetch.__name__)
 
     use_stdout = outfile == Path("-")
@@ -113,6 +117,7 @@ def fetch(
             runner = CrawlerRunner(
                 settings={
                     "FEEDS": feed,
+                    "AUTOTUNE_ENABLED": autotune,
                     # NOTE: Force a non-asyncio reactor (https://docs.scrapy.org/en/2.13/topics/asyncio.html#switching-to-a-non-asyncio-reactor).
                     # Scrapy 3.12.0 made the asyncio reactor the default one (https://docs.scrapy.org/en/2.13/news.html#scrapy-2-13-0-2025-05-08).
                     # which causes the process to run indefinitely and never finish,
@@ -120,6 +125,7 @@ def fetch(
                     # For now, use a sync reactor to avoid this issue.
                     "TWISTED_REACTOR": None,
                 }
+                | (cache_settings(offline) if cache or offline else {})
             )
             crawler = runner.create_crawler(NewsfeedSpider)
             deferred = runner.crawl(crawler, limit=limit, last_n_days=last_n_days)
@@ -4,62 +4,75 @@ Various subcommands allow to:
 1. `fetch` one or more church registers from a given URL (this downloads the images of the register)
 2. `list` all available parishes and their metadata
 3. `show` the available registers in a parish and their metadata
+4. `verify` the images downloaded by `fetch`
+5. `locate` parishes by their coordinates in a list of `list`
 """
 
+import json
+import os
+import subprocess
 import sys
+import tempfile
+import time
+from enum import Enum
 from pathlib import Path
-from typing import Annotated, Any, Optional, Tuple
+from typing import TYPE_CHECKING, Annotated, Any, Optional, Tuple
 
 import typer
-from rich.console import Console
-from rich.progress import (
-    Progress,
-    SpinnerColumn,
-    TextColumn,
-    TimeElapsedColumn,
-)
-from rich.table import Table
-from scrapy import signals
-from scrapy.crawler import CrawlerRunner
-from twisted.internet import reactor
-
-from matricula_online_scraper.spiders.parish import (
-    ParishRegisterMetadata,
-    ParishSpider,
+
+from matricula_online_scraper.utils.common_error import UNKNOWN_ERROR_MSG
+from matricula_online_scraper.utils.coordinates_cache import (
+    DEFAULT_EXPIRATION_DAYS,
+    coordinates_cache_settings,
 )
-from matricula_online_scraper.spiders.parish_list import (
-    ParishMetadata,
-    ParishMetadataSpider,
+from matricula_online_scraper.utils.download_journal import (
+    JOURNAL_FILENAME,
+    DownloadJournal,
+    JournalTail,
+    shard_registers,
 )
-from matricula_online_scraper.utils.common_error import UNKNOWN_ERROR_MSG
+from matricula_online_scraper.utils.integrity import DEFAULT_WORKERS, verify_directory
 from matricula_online_scraper.utils.matricula_url import (
     ParishPageURL,
     ParishRegisterURL,
 )
+from matricula_online_scraper.utils.page_selection import PageSelection
+from matricula_online_scraper.utils.register_scheduler import (
+    DEFAULT_MAX_PAGES,
+    DEFAULT_MAX_REGISTERS,
+)
 from matricula_online_scraper.utils.shorten_path import shorten_path
 from matricula_online_scraper.utils.user_console import UserConsole
 
 from ..logging_config import get_logger
-from ..spiders.church_register import ChurchRegisterSpider
-from ..utils.file_format import FileFormat
+from ..utils.file_format import FileFormat, ImageStorage
+from .common import AutotuneOption, CacheOption, OfflineOption
+
+if TYPE_CHECKING:
+    from matricula_online_scraper.spiders.parish_list import ParishMetadata
+    from matricula_online_scraper.utils.spatial_index import SpatialIndex
+
+# NOTE: Scrapy, Twisted, Pillow, the spiders and rich's progress bars and tables are
+# imported by the commands that use them, so that `--help` and commands without a crawl
+# start fast, see `test_startup.py`.
 
 logger = get_logger(__name__)
 usrcon = UserConsole()
 
-app = typer.Typer()
+app = typer.Typer(rich_markup_mode=None)  # NOTE: see `main.py`
 
 
 @app.command()
 def fetch(
+    ctx: typer.Context,
     urls: Annotated[
         Optional[list[ParishRegisterURL]],
         typer.Argument(
             help=(
                 "One or more URLs to church register pages."
                 " The parameter '?pg=1' may or may not be included in the URL."
-                " If no URL is provided, read from STDIN."
-                # NOTE: It will block until EOF is reached or the pipeline is closed
-                # because all data must be gathered from STDIN before proceeding
+                " If no URL is provided, read from STDIN, one URL per line."
+                " Each register is downloaded as soon as its line was read."
             ),
             parser=ParishRegisterURL._from_arg,
         ),
@@ -75,6 +88,171 @@ def fetch(
             resolve_path=True,
         ),
     ] = Path.cwd() / "parish_register_images",
+    pages: Annotated[
+        Optional[PageSelection],
+        typer.Option(
+            "--pages",
+            help=(
+                "Only download these pages of each register, e.g. '10-40,55' or '1500-'."
+                " Pages start at 1, like '?pg=' in Matricula's viewer."
+            ),
+            parser=PageSelection._from_arg,
+            metavar="PAGES",
+        ),
+    ] = None,
+    single_page: Annotated[
+        bool,
+        typer.Option(
+            "--single-page",
+            help="Only download the page given by '?pg=' in each URL.",
+        ),
+    ] = False,
+    resume: Annotated[
+        bool,
+        typer.Option(
+            "--resume",
+            help=(
+                "Resume an interrupted download. Only pages that are not recorded as"
+                f" completed in the output directory's journal ({JOURNAL_FILENAME}) are requested."
+            ),
+        ),
+    ] = False,
+    revalidate: Annotated[
+        bool,
+        typer.Option(
+            "--revalidate",
+            help=(
+                "Check all pages that are already on disk with the server, no matter how old"
+                " they are. Unchanged pages are not downloaded again if the server sent"
+                " an ETag or Last-Modified header when they were downloaded."
+            ),
+        ),
+    ] = False,
+    storage: Annotated[
+        ImageStorage,
+        typer.Option(
+            "--storage",
+            help=(
+                "How to store the images. 'reencode' decodes each image and stores it as JPEG,"
+                " 'raw' writes the bytes exactly as received (faster, less memory, original quality)."
+                " 'zip', 'cbz' and 'pdf' store all pages of a register as received in one archive,"
+                " one entry or PDF page per image, labeled like in Matricula's viewer."
+            ),
+        ),
+    ] = ImageStorage.REENCODE,
+    stream_to_disk: Annotated[
+        bool,
+        typer.Option(
+            "--stream-to-disk",
+            help=(
+                "Write each image to disk while it is being downloaded instead of"
+                " buffering it in memory. Requires '--storage raw'."
+            ),
+        ),
+    ] = False,
+    dedupe: Annotated[
+        bool,
+        typer.Option(
+            "--dedupe",
+            help=(
+                "Store identical images only once, even if they belong to several registers."
+                " All paths of an image are hardlinks to the same data."
+                " See 'store stats' and 'store gc'."
+            ),
+        ),
+    ] = False,
+    max_inflight_mib: Annotated[
+        int,
+        typer.Option(
+            "--max-inflight-mib",
+            help=(
+                "With --stream-to-disk, the maximum amount of downloaded data (in MiB)"
+                " that is held in memory before it is written to disk."
+            ),
+            min=1,
+        ),
+    ] = 64,
+    max_registers: Annotated[
+        int,
+        typer.Option(
+            "--max-registers",
+            help=(
+                "Number of registers that are downloaded at once. The others wait,"
+                " so that registers are completed one after another."
+            ),
+            min=1,
+        ),
+    ] = DEFAULT_MAX_REGISTERS,
+    pages_per_register: Annotated[
+        int,
+        typer.Option(
+            "--pages-per-register",
+            help="Number of pages of each register that are downloaded at once.",
+            min=1,
+        ),
+    ] = DEFAULT_MAX_PAGES,
+    largest_first: Annotated[
+        bool,
+        typer.Option(
+            "--largest-first",
+            help=(
+                "Start the largest of the registers that wait to be downloaded first"
+                " (see --max-registers), which shortens the run time."
+            ),
+        ),
+    ] = False,
+    postprocess: Annotated[
+        Optional[str],
+        typer.Option(
+            "--postprocess",
+            metavar="TRANSFORMS",
+            help=(
+                "Create derivatives of each page while downloading, e.g. 'grayscale,thumbnail:512,webp:80'."
+                " Available: grayscale, thumbnail[:SIZE], webp[:QUALITY], avif[:QUALITY]."
+                " They are written to 'derivatives/<transform>/' inside the output directory."
+            ),
+        ),
+    ] = None,
+    postprocess_workers: Annotated[
+        Optional[int],
+        typer.Option(
+            "--postprocess-workers",
+            help="Number of processes for --postprocess. Defaults to the number of CPUs.",
+            min=1,
+        ),
+    ] = None,
+    workers: Annotated[
+        int,
+        typer.Option(
+            "--workers",
+            help=(
+                "Split the registers among this many processes, e.g. the number of CPUs."
+                " All of them write to the same output directory."
+            ),
+            min=1,
+        ),
+    ] = 1,
+    stats_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--stats-file",
+            help="Write Scrapy's stats to this file as JSON, used by --workers.",
+            hidden=True,
+        ),
+    ] = None,
+    plan: Annotated[
+        bool,
+        typer.Option(
+            "--plan",
+            help=(
+                "Do not download anything. Instead, write one JSON line per page"
+                " (register, page_index, label, image_url) to STDOUT."
+            ),
+        ),
+    ] = False,
+    autotune: AutotuneOption = False,
+    cache: CacheOption = False,
+    offline: OfflineOption = False,
 ):
     """(1) Download a church register.https://docs.astral.sh/ruff/rules/escape-sequence-in-docstring.
 
@@ -83,15 +261,51 @@ def fetch(
  it has no option to download a single page or the entire book. This command allows you\
  to do just that and download the entire book or a single page.
 
+    The progress of each download is recorded in a journal inside the output directory.\
+ If a download is interrupted, run the same command again with --resume to only\
+ download the missing pages.
+
+    Pages that are already on disk are only downloaded again once they are older than\
+ 90 days, and only if the server reports that they changed. Use --revalidate to check\
+ all of them right away.
+
+    Use --pages to only download some pages of each register, or --single-page to only\
+ download the page given by '?pg=' in the URL.
+
+    Use --workers to download with several processes, which helps once a single process\
+ is busy decoding and writing images. Each register is downloaded by one of them.
+
+    Use --plan to only list the image URLs of all pages, for example to download them\
+ with another tool.
+
     \n\nExample:\n\n
     $ matricula-online-scraper parish fetch https://data.matricula-online.eu/de/oesterreich/kaernten-evAB/eisentratten/01-02D/?pg=7
     """
+    from rich.filesize import decimal
+    from rich.markup import escape
+    from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+    from scrapy.crawler import CrawlerRunner
+    from twisted.internet import reactor
+
+    from matricula_online_scraper.middlewares.http_cache import cache_settings
+    from matricula_online_scraper.spiders.church_register import ChurchRegisterSpider
+    from matricula_online_scraper.utils.image_transforms import parse_transforms
+    from matricula_online_scraper.utils.url_feed import UrlFeed
+
     cmd_logger = logger.getChild(fetch.__name__)
     cmd_logger.debug("Start fetching Matricula Online parish registers.")
 
-    # read from stdin if no urls are provided
-    if not urls:
-        urls = [ParishRegisterURL(url.strip()) for url in sys.stdin.read().splitlines()]
+    feed = None
+    if not urls and workers == 1:
+        # scheduled while STDIN is read, see `UrlFeedSpiderMixin`
+        feed = UrlFeed(sys.stdin, validate=lambda url: ParishRegisterURL(url).is_valid)
+    # the workers need all URLs up front to split them
+    elif not urls:
+        urls = [
+            ParishRegisterURL(line.strip())
+            for line in sys.stdin.read().splitlines()
+            if line.strip()
+        ]
         for url in urls:
             if not url.is_valid:
                 raise typer.BadParameter(
@@ -99,13 +313,73 @@ def fetch(
                     param_hint="urls",
                 )
 
-    if not urls:
+    if not urls and feed is None:
         raise typer.BadParameter(
             "No URLs provided via terminal or STDIN."
             " Please provide one or more URLs as arguments or via stdin.",
             param_hint="urls",
         )
 
+    if pages and single_page:
+        raise typer.BadParameter(
+            "Use either --pages or --single-page, not both.",
+            param_hint="--pages",
+        )
+
+    if plan and resume:
+        raise typer.BadParameter(
+            "There is nothing to resume when only planning the download.",
+            param_hint="--resume",
+        )
+
+    if plan and workers > 1:
+        raise typer.BadParameter(
+            "Planning the download is not split among workers.",
+            param_hint="--workers",
+        )
+
+    if offline and not plan:
+        raise typer.BadParameter(
+            "Images are never cached, use --offline only with --plan.",
+            param_hint="--offline",
+        )
+
+    if revalidate and (resume or storage.is_archive):
+        raise typer.BadParameter(
+            "Pages are not revalidated with --resume (completed pages are skipped)"
+            " or when storing archives (all pages are downloaded again).",
+            param_hint="--revalidate",
+        )
+
+    if stream_to_disk and storage != ImageStorage.RAW:
+        raise typer.BadParameter(
+            "Streaming images to disk requires '--storage raw'.",
+            param_hint="--stream-to-disk",
+        )
+
+    if dedupe and (stream_to_disk or storage.is_archive):
+        raise typer.BadParameter(
+            "Deduplication requires '--storage raw' or '--storage reencode'"
+            " and cannot be combined with --stream-to-disk.",
+            param_hint="--dedupe",
+        )
+
+    if postprocess:
+        try:
+            parse_transforms(postprocess)
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="--postprocess") from None
+        if storage.is_archive:
+            raise typer.BadParameter(
+                "Pages stored in archives cannot be post-processed.",
+                param_hint="--postprocess",
+            )
+
+    if workers > 1:
+        assert urls is not None
+        _fetch_with_workers(ctx, [url.url for url in urls], directory, workers)
+        return
+
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
@@ -115,14 +389,50 @@ def fetch(
     ) as progress:
         progress.add_task(
             "Scraping...",
-            total=len(urls),  # use the number or urls as a rough estimate
+            # use the number or urls as a rough estimate
+            total=len(urls) if urls else None,
         )
 
+        journal = None
+        settings: dict[str, Any] = {}
+        if plan:
+            # nothing is written to the output directory
+            settings["FEEDS"] = {"stdout:": {"format": "jsonlines"}}
+            settings["FEED_EXPORT_ENCODING"] = "utf-8"
+        else:
+            journal = DownloadJournal(directory)
+            if resume:
+                completed = sum(len(r.completed) for r in journal.registers.values())
+                usrcon.info(
+                    f"Resuming from journal with {len(journal.registers)} registers"
+                    f" and {completed} completed pages."
+                )
+            # reactor handles SIGINT/SIGTERM by stopping, make sure the journal hits the disk
+            reactor.addSystemEventTrigger("before", "shutdown", journal.close)  # type: ignore
+        if cache or offline:
+            # register pages only, see `HtmlCachePolicy`
+            settings |= cache_settings(offline)
+
         try:
             runner = CrawlerRunner(
-                settings={
-                    "ITEM_PIPELINES": {"scrapy.pipelines.images.ImagesPipeline": 1},
-                    "IMAGES_STORE": directory.resolve(),
+                settings=settings
+                | {
+                    "IMAGES_PLAN_ONLY": plan,
+                    # the `cas://` scheme selects `ContentAddressedFilesStore`
+                    "IMAGES_STORE": f"cas://{directory.resolve()}"
+                    if dedupe
+                    else directory.resolve(),
+                    "IMAGES_STORAGE": storage,
+                    # pages older than this are revalidated, see `RegisterPipelineMixin`
+                    **({"IMAGES_EXPIRES": 0} if revalidate else {}),
+                    "IMAGES_SPOOL": stream_to_disk,
+                    "IMAGES_MAX_ACTIVE_REGISTERS": max_registers,
+                    "IMAGES_MAX_PAGES_PER_REGISTER": pages_per_register,
+                    "IMAGES_LARGEST_REGISTERS_FIRST": largest_first,
+                    "IMAGES_SPOOL_MAX_INFLIGHT_BYTES": max_inflight_mib * 1024 * 1024,
+                    "POSTPROCESS_TRANSFORMS": postprocess,
+                    "POSTPROCESS_WORKERS": postprocess_workers,
+                    "AUTOTUNE_ENABLED": autotune,
                     # NOTE: Force a non-asyncio reactor (https://docs.scrapy.org/en/2.13/topics/asyncio.html#switching-to-a-non-asyncio-reactor).
                     # Scrapy 3.12.0 made the asyncio reactor the default one (https://docs.scrapy.org/en/2.13/news.html#scrapy-2-13-0-2025-05-08).
                     # which causes the process to run indefinitely and never finish,
@@ -133,7 +443,15 @@ def fetch(
             )
             crawler = runner.create_crawler(ChurchRegisterSpider)
 
-            deferred = runner.crawl(crawler, start_urls=[urls.url for urls in urls])
+            deferred = runner.crawl(
+                crawler,
+                start_urls=[url.url for url in urls or []],
+                feed=feed,
+                journal=journal,
+                resume=resume,
+                pages=pages,
+                single_page=single_page,
+            )
             deferred.addBoth(lambda _: reactor.stop())  # type: ignore
             reactor.run()  # type: ignore  # blocks until the crawling is finished
 
@@ -145,12 +463,299 @@ def fetch(
             raise typer.Exit(1) from exception
 
         else:
+            if feed is not None and feed.count == 0:
+                raise typer.BadParameter(
+                    "No valid URLs provided via terminal or STDIN.", param_hint="urls"
+                )
             cmd_logger.info("'parish fetch' command terminated successfully.")
-            cmd_logger.debug(
-                f"Output has been written to the specified directory: {directory.resolve()}"
+            if stats_file is not None:
+                stats_file.write_text(
+                    json.dumps(crawler.stats.get_stats(), default=str), encoding="utf-8"
+                )
+            if plan:
+                usrcon.success(
+                    "Successfully planned the download of the parish images."
+                )
+            else:
+                cmd_logger.debug(
+                    f"Output has been written to the specified directory: {directory.resolve()}"
+                )
+                usrcon.success("Successfully scraped the parish images.")
+                stats = crawler.stats
+                if stats.get_value("revalidation/requests"):
+                    usrcon.info(
+                        f"Revalidated {stats.get_value('file_status_count/revalidated', 0)}"
+                        " unchanged pages, downloaded"
+                        f" {stats.get_value('file_status_count/downloaded', 0)} pages."
+                    )
+                if dedupe:
+                    duplicates = stats.get_value("dedupe/duplicate_images", 0)
+                    usrcon.info(
+                        f"Stored {duplicates} duplicate images only once, saving"
+                        f" {decimal(stats.get_value('dedupe/saved_bytes', 0))}."
+                    )
+                usrcon.success(f"Exported images to {shorten_path(directory)}")
+
+        finally:
+            if journal is not None:
+                journal.close()
+
+    if feed is not None and feed.invalid:
+        usrcon.error(
+            f"Skipped {len(feed.invalid)} invalid parish register URLs from STDIN,"
+            f" e.g. {escape(feed.invalid[0])}"
+        )
+        raise typer.Exit(1)
+
+
+def _cli_options(
+    ctx: typer.Context, exclude: tuple[str, ...] = (), **overrides: Any
+) -> list[str]:
+    """Return the options of a command as given on the command line, e.g. for a worker."""
+    params = ctx.params | overrides
+    args: list[str] = []
+    for param in ctx.command.params:
+        # typer may or may not use click, so do not rely on its classes
+        if param.param_type_name != "option" or param.name in exclude:
+            continue
+        value = params.get(param.name)
+        if getattr(param, "is_flag", False):
+            if value:
+                args.append(param.opts[0])
+        elif value is not None:
+            args += [
+                param.opts[0],
+                value.value if isinstance(value, Enum) else str(value),
+            ]
+    return args
+
+
+def _fetch_with_workers(
+    ctx: typer.Context, urls: list[str], directory: Path, workers: int
+) -> None:
+    """Run `parish fetch` in `workers` child processes, each with a share of the registers."""
+    from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+    from rich.table import Table
+
+    cmd_logger = logger.getChild(fetch.__name__)
+    shards = shard_registers(urls, workers)
+
+    overrides: dict[str, Any] = {}
+    if ctx.params["postprocess"] and ctx.params["postprocess_workers"] is None:
+        # share the CPUs among the workers instead of starting a pool per CPU in each
+        overrides["postprocess_workers"] = max(1, (os.cpu_count() or 1) // len(shards))
+    options = _cli_options(ctx, exclude=("workers", "stats_file"), **overrides)
+    root = ctx.find_root()
+    global_options = _cli_options(root, exclude=("version",))
+    env = None
+    if not any(root.params.get(name) for name in ("verbose", "quiet", "loglevel")):
+        # the workers report through their stats, not on the terminal
+        global_options.append("--quiet")
+        env = os.environ | {"PYTHONWARNINGS": "ignore"}
+
+    directory.mkdir(parents=True, exist_ok=True)
+    tail = JournalTail(directory)
+    processes: list[tuple[subprocess.Popen, Path]] = []
+    with (
+        tempfile.TemporaryDirectory(prefix="matricula-workers-") as tmp,
+        Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            TimeElapsedColumn(),
+            transient=True,
+            console=usrcon.console,
+        ) as progress,
+    ):
+        task = progress.add_task(f"Starting {len(shards)} workers...", total=None)
+        try:
+            for i, shard in enumerate(shards):
+                stats_file = Path(tmp, f"worker-{i}.json")
+                command = [
+                    sys.executable,
+                    "-m",
+                    "matricula_online_scraper",
+                    *global_options,
+                    "parish",
+                    "fetch",
+                    *options,
+                    "--stats-file",
+                    str(stats_file),
+                ]
+                cmd_logger.debug(
+                    f"Starting worker {i} with {len(shard)} URLs: {command}"
+                )
+                process = subprocess.Popen(
+                    command, stdin=subprocess.PIPE, text=True, env=env
+                )
+                assert process.stdin is not None
+                process.stdin.write("".join(f"{url}\n" for url in shard))
+                process.stdin.close()
+                processes.append((process, stats_file))
+
+            while True:
+                running = sum(process.poll() is None for process, _ in processes)
+                tail.poll()
+                progress.update(
+                    task,
+                    description=(
+                        f"Scraping... {len(tail.registers)} registers,"
+                        f" {tail.completed} pages done, {tail.failed} failed"
+                        f" ({running} of {len(processes)} workers running)"
+                    ),
+                )
+                if not running:
+                    break
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            # the workers got the SIGINT as well and close their journals
+            for process, _ in processes:
+                process.wait()
+            usrcon.warning(
+                "Interrupted. Run the same command with --resume to download the"
+                " missing pages."
+            )
+            raise typer.Exit(130) from None
+
+        stats = [
+            json.loads(stats_file.read_text(encoding="utf-8"))
+            if stats_file.exists()
+            else {}
+            for _, stats_file in processes
+        ]
+
+    columns = {
+        "Registers": "item_scraped_count",
+        "Downloaded": "file_status_count/downloaded",
+        "Up to date": "file_status_count/uptodate",
+        "Failed": "file_status_count/failed",
+    }
+    table = Table(caption=f"{len(processes)} workers")
+    table.add_column("Worker", justify="left")
+    for column in (*columns, "Exit code"):
+        table.add_column(column, justify="right")
+    for i, ((process, _), worker_stats) in enumerate(zip(processes, stats)):
+        table.add_row(
+            str(i),
+            *(str(worker_stats.get(key, 0)) for key in columns.values()),
+            str(process.returncode),
+        )
+    totals = {key: sum(s.get(key, 0) for s in stats) for key in columns.values()}
+    table.add_row("Total", *(str(value) for value in totals.values()), "", style="bold")
+    usrcon.print(table)
+
+    failed = [i for i, (process, _) in enumerate(processes) if process.returncode]
+    if failed:
+        usrcon.error(
+            f"Workers {', '.join(map(str, failed))} failed. Run the same command with"
+            " --resume to download the missing pages."
+        )
+        raise typer.Exit(1)
+    if totals["file_status_count/failed"]:
+        usrcon.warning(
+            f"{totals['file_status_count/failed']} pages failed to download. Run the"
+            " same command with --resume to download them again."
+        )
+    usrcon.success(f"Exported images to {shorten_path(directory)}")
+
+
+def _print_parishes(
+    parishes: list["ParishMetadata"], include_coordinates: bool
+) -> None:
+    """Print parishes as a table, see `parish list --human-readable`."""
+    from rich.table import Table
+
+    parishes = sorted(parishes, key=lambda item: item["region"])
+
+    table = Table(
+        title="Parishes in Matricula Online.",
+        caption=f"{len(parishes)} parishes found.",
+    )
+    table.add_column("Name", justify="left")
+    table.add_column("Region", justify="left")
+    table.add_column("Country", justify="left")
+    table.add_column("URL", justify="left")
+    if include_coordinates:
+        table.add_column("Coordinates", justify="left")
+
+    for item in parishes:
+        table.add_row(
+            item["name"],
+            item["region"],
+            item["country"],
+            f"[link={item['url']}]URL[/link]",
+            (
+                f"{item['latitude']}, {item['longitude']}"
+                if include_coordinates and "latitude" in item and "longitude" in item
+                else None
+            ),
+        )
+
+    usrcon.print(table)
+
+
+def _list_from_snapshot(
+    snapshot: Path,
+    outfile: Path,
+    *,
+    place: str | None,
+    country: str | None,
+    region: str | None,
+    include_coordinates: bool,
+    human_readable: bool,
+    unsupported: dict[str, bool],
+) -> None:
+    """Search a snapshot instead of Matricula, see `parish list --from-snapshot`."""
+    from matricula_online_scraper.utils.parish_index import ParishIndex
+    from matricula_online_scraper.utils.parish_snapshot import (
+        COORDINATE_FIELDS,
+        load_snapshot,
+        write_snapshot,
+    )
+
+    for option, used in unsupported.items():
+        if used:
+            raise typer.BadParameter(
+                f"{option} cannot be used with a snapshot.",
+                param_hint="--from-snapshot",
             )
-            usrcon.success("Successfully scraped the parish images.")
-            usrcon.success(f"Exported images to {shorten_path(directory)}")
+
+    started = time.perf_counter()
+    try:
+        index = ParishIndex(load_snapshot(snapshot).values())
+    except (ValueError, OSError) as e:
+        raise typer.BadParameter(
+            f"Failed to load the parish list {snapshot}: {e}",
+            param_hint="--from-snapshot",
+        )
+    loaded = time.perf_counter()
+    parishes = index.search(place=place, country=country, region=region)
+    searched = time.perf_counter()
+    logger.debug(
+        f"Indexed {len(index.parishes)} parishes of {snapshot} in"
+        f" {(loaded - started) * 1000:.0f} ms, searched in {(searched - loaded) * 1000:.1f} ms"
+    )
+
+    if not include_coordinates:
+        parishes = [
+            {
+                key: value
+                for key, value in parish.items()
+                if key not in COORDINATE_FIELDS
+            }  # type: ignore
+            for parish in parishes
+        ]
+
+    if human_readable:
+        _print_parishes(parishes, include_coordinates)
+    elif outfile == Path("-"):
+        write_snapshot(parishes, sys.stdout, FileFormat.JSONL)
+    else:
+        with outfile.open("w", encoding="utf-8", newline="") as file:
+            write_snapshot(parishes, file, FileFormat(outfile.suffix[1:]))
+        usrcon.success(
+            f"Found {len(parishes)} of {len(index.parishes)} parishes in"
+            f" {shorten_path(snapshot)}, written to {shorten_path(outfile)}."
+        )
 
 
 @app.command("list")
@@ -174,6 +779,18 @@ def list_parishes(
     place: Annotated[
         Optional[str], typer.Option(help="Full text search for a location.")
     ] = None,
+    country: Annotated[
+        Optional[str],
+        typer.Option(
+            help="Only parishes in a country starting with this (with --from-snapshot)."
+        ),
+    ] = None,
+    region: Annotated[
+        Optional[str],
+        typer.Option(
+            help="Only parishes in a region starting with this (with --from-snapshot)."
+        ),
+    ] = None,
     # NOTE: https://data.matricula-online.eu/en/suchen/ has a dropdown with diocese names
     # that can be used for filtering. The HTML components uses integers to represent such options.
     # Unfortunately, that value is just passed around in Matricula and even used in the URL.
@@ -202,6 +819,65 @@ def list_parishes(
             ),
         ),
     ] = True,
+    coordinates_ttl: Annotated[
+        int,
+        typer.Option(
+            help=(
+                "Coordinates are cached locally and only fetched again after this many"
+                " days. 0 to keep them forever."
+            ),
+            min=0,
+        ),
+    ] = DEFAULT_EXPIRATION_DAYS,
+    refresh_coordinates: Annotated[
+        bool,
+        typer.Option(
+            "--refresh-coordinates",
+            help="Fetch all coordinates again instead of using the cached ones.",
+        ),
+    ] = False,
+    from_snapshot: Annotated[
+        Optional[Path],
+        typer.Option(
+            help=(
+                "Search a previous output of this command, e.g. the cached"
+                " 'parishes.csv.gz', instead of Matricula. Supports --place, --country"
+                " and --region, but not the diocese and date filters."
+            ),
+            exists=True,
+            file_okay=True,
+            dir_okay=False,
+            resolve_path=True,
+        ),
+    ] = None,
+    since: Annotated[
+        Optional[Path],
+        typer.Option(
+            help=(
+                "Output of a previous run of this command to sync against, e.g. the"
+                " cached 'parishes.csv.gz'. The coordinates of parishes whose search"
+                " result did not change are taken from it instead of fetching each"
+                " parish's page. Use the same search parameters as for that run."
+            ),
+            exists=True,
+            file_okay=True,
+            dir_okay=False,
+            resolve_path=True,
+        ),
+    ] = None,
+    diff: Annotated[
+        Optional[Path],
+        typer.Option(
+            help=(
+                "File to which the parishes that were added, removed or changed since"
+                " --since are written (JSON Lines). Defaults to the outfile with the"
+                " suffix '.diff.jsonl'."
+            ),
+            file_okay=True,
+            dir_okay=False,
+            resolve_path=True,
+        ),
+    ] = None,
     skip_prompt: Annotated[
         bool,
         typer.Option(
@@ -221,6 +897,9 @@ def list_parishes(
             ),
         ),
     ] = False,
+    autotune: AutotuneOption = False,
+    cache: CacheOption = False,
+    offline: OfflineOption = False,
 ):
     """(2) List available parishes.
 
@@ -237,13 +916,27 @@ def list_parishes(
     This command will take a while to run, because it fetches all parishes.\
  A GitHub workflow does this once a week and caches the CSV file in the repository.\
  Preferably, you should download that file instead: https://github.com/lsg551/matricula-online-scraper/raw/cache/parishes/parishes.csv.gz
+
+    \n\nTo update such a file, pass it to --since. Only new or changed parishes are\
+ requested for their coordinates and the differences are written to --diff:\n\n
+    $ matricula-online-scraper parish list -y --include-coordinates --since parishes.csv.gz -o parishes.csv
+
+    \n\nOr search such a file right away, without sending any request:\n\n
+    $ matricula-online-scraper parish list --from-snapshot parishes.csv.gz --place paderborn -h
     """
+    from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+
+    from matricula_online_scraper.utils.parish_snapshot import (
+        SnapshotDiff,
+        load_snapshot,
+    )
+
     cmd_logger = logger.getChild(fetch.__name__)
 
     use_stdout = outfile == Path("-")
     settings: dict[str, Any]
 
-    collected_items: list[ParishMetadata] = []
+    collected_items: list["ParishMetadata"] = []
     """Cache for collected items when human_readable is True."""
 
     if human_readable:
@@ -270,12 +963,71 @@ def list_parishes(
 
         settings = {"FEEDS": {str(outfile): {"format": format.to_scrapy()}}}
 
+    if from_snapshot is not None:
+        _list_from_snapshot(
+            from_snapshot,
+            outfile,
+            place=place,
+            country=country,
+            region=region,
+            include_coordinates=not exclude_coordinates,
+            human_readable=human_readable,
+            unsupported={
+                "--diocese": diocese is not None,
+                "--date-filter": date_filter,
+                "--date-range": date_range is not None,
+                "--since": since is not None,
+                "--diff": diff is not None,
+            },
+        )
+        return
+    if country is not None or region is not None:
+        raise typer.BadParameter(
+            "Matricula's search has no country or region filter. Use --place instead"
+            " or search a snapshot of all parishes with --from-snapshot.",
+            param_hint="--country/--region",
+        )
+
+    from scrapy import signals
+    from scrapy.crawler import CrawlerRunner
+    from twisted.internet import reactor
+
+    from matricula_online_scraper.middlewares.http_cache import cache_settings
+    from matricula_online_scraper.spiders.parish_list import ParishMetadataSpider
+
+    snapshot_diff: SnapshotDiff | None = None
+    if since is not None:
+        try:
+            snapshot_diff = SnapshotDiff(load_snapshot(since))
+        except (ValueError, OSError) as e:
+            raise typer.BadParameter(
+                f"Failed to load the previous parish list {since}: {e}",
+                param_hint="--since",
+            )
+        if diff is None and not use_stdout and not human_readable:
+            diff = outfile.with_suffix(".diff.jsonl")
+        if diff is not None and diff.exists():
+            raise typer.BadParameter(
+                f"A file with the same path as the diff already exists: {diff}."
+                " Will not overwrite it. Delete the file or choose a different path. Aborting.",
+                param_hint="--diff",
+            )
+    elif diff is not None:
+        raise typer.BadParameter(
+            "A diff can only be created with a previous parish list.",
+            param_hint="--since",
+        )
+
     # NOTE: Force a non-asyncio reactor (https://docs.scrapy.org/en/2.13/topics/asyncio.html#switching-to-a-non-asyncio-reactor).
     # Scrapy 3.12.0 made the asyncio reactor the default one (https://docs.scrapy.org/en/2.13/news.html#scrapy-2-13-0-2025-05-08).
     # which causes the process to run indefinitely and never finish,
     # see https://github.com/lsg551/matricula-online-scraper/issues/100
     # For now, use a sync reactor to avoid this issue.
     settings["TWISTED_REACTOR"] = None
+    settings["AUTOTUNE_ENABLED"] = autotune
+    if cache or offline:
+        settings |= cache_settings(offline)
+    settings |= coordinates_cache_settings(coordinates_ttl, refresh_coordinates)
 
     # all search parameters are unused => fetching everything takes some time
     if (
@@ -326,6 +1078,13 @@ def list_parishes(
 
                 crawler.signals.connect(collect, signal=signals.item_scraped)
 
+            if snapshot_diff is not None:
+                crawler.signals.connect(
+                    lambda item, **_: snapshot_diff.add(item),
+                    signal=signals.item_scraped,
+                    weak=False,
+                )
+
             deferred = runner.crawl(
                 crawler,
                 place=place or "",
@@ -333,6 +1092,7 @@ def list_parishes(
                 date_filter=date_filter,
                 date_range=date_range or (0, 9999),
                 include_coordinates=not exclude_coordinates,
+                snapshot=snapshot_diff.snapshot if snapshot_diff else None,
             )
             deferred.addBoth(lambda _: reactor.stop())  # type: ignore
             reactor.run()  # type: ignore  # blocks until the crawling is finished
@@ -353,36 +1113,18 @@ def list_parishes(
                     f"The parish list was written to {shorten_path(outfile)}."
                 )
 
-    if human_readable:
-        collected_items.sort(key=lambda item: item["region"])
-
-        table = Table(
-            title="Parishes in Matricula Online.",
-            caption=f"{len(collected_items)} parishes found.",
-        )
-        table.add_column("Name", justify="left")
-        table.add_column("Region", justify="left")
-        table.add_column("Country", justify="left")
-        table.add_column("URL", justify="left")
-        if not exclude_coordinates:
-            table.add_column("Coordinates", justify="left")
-
-        for item in collected_items:
-            table.add_row(
-                item["name"],
-                item["region"],
-                item["country"],
-                f"[link={item['url']}]URL[/link]",
-                (
-                    f"{item['latitude']}, {item['longitude']}"
-                    if not exclude_coordinates
-                    and "latitude" in item
-                    and "longitude" in item
-                    else None
-                ),
-            )
+            if snapshot_diff is not None:
+                usrcon.info(
+                    f"Since {shorten_path(since)}: {len(snapshot_diff.added)} added,"  # type: ignore
+                    f" {len(snapshot_diff.removed)} removed,"
+                    f" {len(snapshot_diff.changed)} changed."
+                )
+                if diff is not None:
+                    snapshot_diff.write(diff)
+                    usrcon.success(f"The changes were written to {shorten_path(diff)}.")
 
-        usrcon.print(table)
+    if human_readable:
+        _print_parishes(collected_items, include_coordinates=not exclude_coordinates)
 
 
 @app.command()
@@ -391,7 +1133,8 @@ def show(
         Optional[ParishPageURL],
         typer.Argument(
             help=(
-                "Parish URL to scrape available registers and metadata for. Reads from STDIN if not provided."
+                "Parish URL to scrape available registers and metadata for."
+                " If not provided, read one or more parish URLs from STDIN, one per line."
             ),
             parser=ParishPageURL._from_arg,
         ),
@@ -404,7 +1147,8 @@ def show(
             help=(
                 f"File to which the data is written (formats: {', '.join(FileFormat)})."
                 " Use '-' to write to STDOUT."
-                r" Default is `matricula_parish_{name}.jsonl`."
+                r" Default is `matricula_parish_{name}.jsonl`,"
+                " or `matricula_parish_registers.jsonl` when reading from STDIN."
             ),
             show_default=False,
             exists=False,
@@ -425,6 +1169,9 @@ def show(
             ),
         ),
     ] = False,
+    autotune: AutotuneOption = False,
+    cache: CacheOption = False,
+    offline: OfflineOption = False,
 ):
     """(3) Show available registers in a parish and their metadata.
 
@@ -434,26 +1181,30 @@ def show(
     \n\nExample:\n\n
     $ matricula-online-scraper parish show https://data.matricula-online.eu/de/oesterreich/kaernten-evAB/eisentratten/
     """
+    from rich.markup import escape
+    from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+    from rich.table import Table
+    from scrapy import signals
+    from scrapy.crawler import CrawlerRunner
+    from twisted.internet import reactor
+
+    from matricula_online_scraper.middlewares.http_cache import cache_settings
+    from matricula_online_scraper.spiders.parish import (
+        ParishRegisterMetadata,
+        ParishSpider,
+    )
+    from matricula_online_scraper.utils.url_feed import UrlFeed
+
     cmd_logger = logger.getChild(fetch.__name__)
 
     # read from stdin if no parish is provided
+    feed = None
     if not parish:
         cmd_logger.debug(
             f"Reading from STDIN as no argument for 'parish' was provided."
         )
-        parish = ParishPageURL(sys.stdin.read().strip())
-        if not parish.is_valid:
-            raise typer.BadParameter(
-                f"Invalid parish URL provided via STDIN: {parish.url}",
-                param_hint="parish",
-            )
-
-    if not parish:
-        raise typer.BadParameter(
-            "No parish URL provided via terminal or STDIN."
-            " Please provide a parish URL as an argument or via STDIN.",
-            param_hint="parish",
-        )
+        # scheduled while STDIN is read, see `UrlFeedSpiderMixin`
+        feed = UrlFeed(sys.stdin, validate=lambda url: ParishPageURL(url).is_valid)
 
     use_stdout = outfile == Path("-")
     settings: dict[str, Any]
@@ -467,7 +1218,11 @@ def show(
         settings = {"FEEDS": {"stdout:": {"format": "jsonlines"}}}
     else:
         if not outfile or outfile == "":
-            outfile = Path(f"matricula_parish_{parish.name}.jsonl")
+            outfile = Path(
+                f"matricula_parish_{parish.name}.jsonl"
+                if parish
+                else "matricula_parish_registers.jsonl"
+            )
             cmd_logger.debug(
                 f"No outfile provided. Using constructed default name: {outfile.resolve()}"
             )
@@ -497,6 +1252,9 @@ def show(
     # see https://github.com/lsg551/matricula-online-scraper/issues/100
     # For now, use a sync reactor to avoid this issue.
     settings["TWISTED_REACTOR"] = None
+    settings["AUTOTUNE_ENABLED"] = autotune
+    if cache or offline:
+        settings |= cache_settings(offline)
 
     with Progress(
         SpinnerColumn(),
@@ -518,7 +1276,9 @@ def show(
 
                 crawler.signals.connect(collect, signal=signals.item_scraped)
 
-            deferred = runner.crawl(crawler, start_urls=[parish.url])
+            deferred = runner.crawl(
+                crawler, start_urls=[parish.url] if parish else [], feed=feed
+            )
             deferred.addBoth(lambda _: reactor.stop())  # type: ignore
             reactor.run()  # type: ignore  # blocks until the crawling is finished
 
@@ -530,6 +1290,11 @@ def show(
             raise typer.Exit(code=1) from exception
 
         else:
+            if feed is not None and feed.count == 0:
+                raise typer.BadParameter(
+                    "No valid parish URL provided via terminal or STDIN.",
+                    param_hint="parish",
+                )
             cmd_logger.info("'parish show' command terminated successfully.")
             usrcon.success("Successfully scraped the parish registers metadata.")
 
@@ -541,7 +1306,8 @@ def show(
     if human_readable:
         table = Table(
             # title="" # TODO: get name of parish
-            caption=f"{len(collected_items)} parish registers found for {parish}",
+            caption=f"{len(collected_items)} parish registers found"
+            + (f" for {parish}" if parish else ""),
         )
         table.add_column("Name", justify="left")
         table.add_column("Accession Num.", justify="left")
@@ -559,3 +1325,339 @@ def show(
             )
 
         usrcon.print(table)
+
+    if feed is not None and feed.invalid:
+        usrcon.error(
+            f"Skipped {len(feed.invalid)} invalid parish URLs from STDIN,"
+            f" e.g. {escape(feed.invalid[0])}"
+        )
+        raise typer.Exit(1)
+
+
+@app.command()
+def verify(
+    directory: Annotated[
+        Path,
+        typer.Argument(
+            help="Output directory of 'parish fetch'.",
+            exists=True,
+            file_okay=False,
+            dir_okay=True,
+        ),
+    ],
+    refetch: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--refetch",
+            help=(
+                "Write the URLs of registers with missing or corrupt pages to this file,"
+                " one per line, mark these pages as not downloaded in the journal"
+                " and delete corrupt images."
+                " Download them again with 'parish fetch -o DIRECTORY --resume < FILE'."
+            ),
+            file_okay=True,
+            dir_okay=False,
+        ),
+    ] = None,
+    workers: Annotated[
+        int,
+        typer.Option("--workers", help="Number of files to read concurrently.", min=1),
+    ] = DEFAULT_WORKERS,
+):
+    """(4) Check the images downloaded with 'parish fetch' for missing or corrupt pages.
+
+    Each page that the journal lists as downloaded is compared against its recorded\
+ size and checksum and checked to be a complete JPEG image. For each register, missing\
+ and corrupt pages as well as files that do not belong to the register are reported.
+
+    \n\nExample:\n\n
+    $ matricula-online-scraper parish verify ./parish_register_images --refetch refetch.txt
+    """
+    from rich.markup import escape
+    from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+    from rich.table import Table
+
+    cmd_logger = logger.getChild(verify.__name__)
+
+    if not (directory / JOURNAL_FILENAME).exists():
+        usrcon.error(
+            f"{shorten_path(directory)} has no journal ({JOURNAL_FILENAME})."
+            " Only directories written with 'parish fetch' can be verified."
+        )
+        raise typer.Exit(1)
+
+    journal = DownloadJournal(directory)
+    try:
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            TimeElapsedColumn(),
+            transient=True,
+            console=usrcon.console,
+        ) as progress:
+            progress.add_task("Verifying...", total=None)
+            reports = verify_directory(directory, journal, workers=workers)
+
+        problems = [report for report in reports if not report.is_ok]
+        pages = sum(report.pages for report in reports)
+        cmd_logger.info(
+            f"Verified {pages} pages of {len(reports)} registers in {directory}."
+        )
+        if not problems:
+            usrcon.success(
+                f"All {pages} pages of {len(reports)} registers are complete and valid."
+            )
+            return
+
+        table = Table(
+            caption=f"{len(problems)} of {len(reports)} registers have problems"
+        )
+        table.add_column("Register", justify="left", overflow="fold")
+        for column in ("Pages", "OK", "Missing", "Corrupt", "Extra"):
+            table.add_column(column, justify="right")
+        for report in problems:
+            table.add_row(
+                escape(report.url),
+                str(report.pages),
+                str(report.ok),
+                str(len(report.missing)),
+                str(len(report.corrupt)),
+                str(len(report.extra)),
+            )
+        usrcon.print(table)
+
+        for report in problems:
+            usrcon.print(escape(report.url))
+            lines = [
+                f"  missing  {p.path or p.page}: {p.reason}" for p in report.missing
+            ]
+            lines += [f"  corrupt  {p.path}: {p.reason}" for p in report.corrupt]
+            lines += [f"  extra    {path}" for path in report.extra]
+            for line in lines[:10]:
+                usrcon.print(line, markup=False, highlight=False)
+            if len(lines) > 10:
+                usrcon.print(f"  … and {len(lines) - 10} more")
+
+        if refetch:
+            registers = [report for report in problems if report.refetch]
+            for report in registers:
+                for problem in report.refetch:
+                    if problem.path is not None:  # i.e. recorded as completed
+                        journal.mark_invalidated(
+                            report.url, problem.page, problem.reason
+                        )
+                for problem in report.corrupt:
+                    # otherwise, the file would be found up to date and kept
+                    path = directory / problem.path
+                    if path.is_file():
+                        path.unlink()
+            refetch.write_text(
+                "".join(f"{report.url}\n" for report in registers), encoding="utf-8"
+            )
+            usrcon.info(
+                f"Wrote {len(registers)} registers to {shorten_path(refetch)}."
+                f" Run 'parish fetch -o {shorten_path(directory)} --resume < {shorten_path(refetch)}'"
+                " to download their missing and corrupt pages."
+            )
+    finally:
+        journal.close()
+
+    raise typer.Exit(1)
+
+
+def _parse_floats(value: str, names: tuple[str, ...], param_hint: str) -> list[float]:
+    """Parse comma-separated numbers of an option, e.g. 'LAT,LON' of `--near`."""
+    try:
+        numbers = [float(number) for number in value.split(",")]
+    except ValueError:
+        numbers = []
+    if len(numbers) != len(names):
+        raise typer.BadParameter(
+            f"Expected {','.join(names)} in degrees, got '{value}'.",
+            param_hint=param_hint,
+        )
+    return numbers
+
+
+def _load_spatial_index(snapshot: Path, index_file: Path | None) -> "SpatialIndex":
+    """Open the index of a snapshot, (re)building it if it is missing or outdated."""
+    from matricula_online_scraper.utils.parish_snapshot import load_snapshot
+    from matricula_online_scraper.utils.spatial_index import INDEX_SUFFIX, SpatialIndex
+
+    if snapshot == Path("-"):
+        # e.g. piped from `parish list`, there is nothing to save the index for
+        try:
+            parishes = [json.loads(line) for line in sys.stdin if line.strip()]
+        except ValueError as e:
+            raise typer.BadParameter(
+                f"Expected parishes as JSON Lines via STDIN: {e}", param_hint="snapshot"
+            )
+        return SpatialIndex.build(parishes)
+
+    if index_file is None:
+        index_file = snapshot.with_name(snapshot.name + INDEX_SUFFIX)
+    if index_file.exists() and index_file.stat().st_mtime >= snapshot.stat().st_mtime:
+        try:
+            return SpatialIndex.open(index_file)
+        except (ValueError, OSError) as e:
+            logger.warning(f"Rebuilding the spatial index: {e}")
+
+    try:
+        index = SpatialIndex.build(load_snapshot(snapshot).values())
+    except (ValueError, OSError) as e:
+        raise typer.BadParameter(
+            f"Failed to load the parish list {snapshot}: {e}", param_hint="snapshot"
+        )
+    try:
+        index.save(index_file)
+        usrcon.info(
+            f"Indexed {len(index)} parishes with coordinates in {shorten_path(index_file)}."
+        )
+    except OSError as e:
+        usrcon.warning(f"Could not save the spatial index to {index_file}: {e}")
+    return index
+
+
+@app.command()
+def locate(
+    snapshot: Annotated[
+        Path,
+        typer.Argument(
+            help=(
+                "Output of 'parish list --include-coordinates', e.g. the cached"
+                " 'parishes.csv.gz'. Use '-' to read JSON Lines from STDIN."
+            ),
+            exists=True,
+            file_okay=True,
+            dir_okay=False,
+            resolve_path=True,
+            allow_dash=True,
+        ),
+    ],
+    near: Annotated[
+        Optional[str],
+        typer.Option(
+            help="Find parishes near this point, see --radius and --nearest.",
+            metavar="LAT,LON",
+        ),
+    ] = None,
+    radius: Annotated[
+        Optional[float],
+        typer.Option(
+            help="Only parishes within this distance (in km) of --near.", min=0
+        ),
+    ] = None,
+    nearest: Annotated[
+        Optional[int],
+        typer.Option(help="Only the K parishes closest to --near.", metavar="K", min=1),
+    ] = None,
+    bbox: Annotated[
+        Optional[str],
+        typer.Option(
+            help="Find parishes within this bounding box.",
+            metavar="SOUTH,WEST,NORTH,EAST",
+        ),
+    ] = None,
+    details: Annotated[
+        bool,
+        typer.Option(
+            "--details",
+            help=(
+                "Write the parishes as JSON Lines, with their distance to --near"
+                " ('distance_km'), instead of their URLs."
+            ),
+        ),
+    ] = False,
+    index_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--index",
+            help=(
+                "File of the spatial index. Defaults to the snapshot with the suffix"
+                " '.spatial'. It is built on the first query and whenever the snapshot"
+                " changed."
+            ),
+            file_okay=True,
+            dir_okay=False,
+            resolve_path=True,
+        ),
+    ] = None,
+):
+    """(5) Find parishes by their coordinates in a parish list.
+
+    The parishes of a snapshot are indexed by their coordinates once, in a file next\
+ to it. Queries only read the parts of the index they need, instead of checking the\
+ distance to every parish.
+
+    Writes the URLs of the parishes to STDOUT, one per line, closest first, so that\
+ they can be piped into 'parish show'.
+
+    \n\nExample:\n\n
+    $ matricula-online-scraper parish locate parishes.csv.gz --near 51.72,8.75 --radius 10 | matricula-online-scraper parish show -o registers.jsonl
+
+    \n\nThe 5 parishes closest to a place, with their distance:\n\n
+    $ matricula-online-scraper parish locate parishes.csv.gz --near 51.72,8.75 --nearest 5 --details
+    """
+    if (near is None) == (bbox is None):
+        raise typer.BadParameter(
+            "Use either --near or --bbox.", param_hint="--near/--bbox"
+        )
+    if near is not None and radius is None and nearest is None:
+        raise typer.BadParameter(
+            "Use --radius and/or --nearest to limit the parishes near a point.",
+            param_hint="--radius/--nearest",
+        )
+    if bbox is not None and (radius is not None or nearest is not None):
+        raise typer.BadParameter(
+            "--radius and --nearest only apply to --near.", param_hint="--bbox"
+        )
+
+    started = time.perf_counter()
+    index = _load_spatial_index(snapshot, index_file)
+    loaded = time.perf_counter()
+    try:
+        if near is not None:
+            lat, lon = _parse_floats(near, ("LAT", "LON"), "--near")
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                raise typer.BadParameter(
+                    f"Coordinates out of range: '{near}'.", param_hint="--near"
+                )
+            if nearest is not None:
+                matches = index.nearest(lat, lon, nearest, radius_km=radius)
+            else:
+                matches = index.within(lat, lon, radius)  # type: ignore
+        else:
+            south, west, north, east = _parse_floats(
+                bbox,  # type: ignore
+                ("SOUTH", "WEST", "NORTH", "EAST"),
+                "--bbox",
+            )
+            if south > north:
+                raise typer.BadParameter(
+                    "SOUTH must not be north of NORTH.", param_hint="--bbox"
+                )
+            # a box across the antimeridian, e.g. '-20,170,-10,-170'
+            boxes = (
+                [(south, west, north, east)]
+                if west <= east
+                else [(south, west, north, 180), (south, -180, north, east)]
+            )
+            matches = [(None, i) for box in boxes for i in index.bbox(*box)]
+        searched = time.perf_counter()
+        logger.debug(
+            f"Loaded the spatial index of {len(index)} parishes in"
+            f" {(loaded - started) * 1000:.0f} ms, searched in {(searched - loaded) * 1000:.1f} ms"
+        )
+
+        for distance, i in matches:
+            parish = index.parish(i)
+            if not details:
+                sys.stdout.write(parish["url"] + "\n")
+                continue
+            if distance is not None:
+                parish["distance_km"] = round(distance, 3)  # type: ignore
+            sys.stdout.write(json.dumps(parish) + "\n")
+    finally:
+        index.close()
+
+    usrcon.info(f"Found {len(matches)} of {len(index)} parishes with coordinates.")
@@ -0,0 +1,294 @@
+"""`queue` command group to coordinate downloads among several machines.
+
+Various subcommands allow to:
+1. `add` add register, parish or search jobs to a queue file on shared storage
+2. `work` claim and run jobs until stopped
+3. `status` show the number of jobs per state
+4. `retry` try failed jobs again
+
+See `JobQueue` for how jobs are leased to workers.
+"""
+
+import sys
+from pathlib import Path
+from typing import Annotated, Any, Optional, Tuple
+
+import typer
+
+from matricula_online_scraper.utils.common_error import UNKNOWN_ERROR_MSG
+from matricula_online_scraper.utils.download_journal import DownloadJournal
+from matricula_online_scraper.utils.file_format import ImageStorage
+from matricula_online_scraper.utils.job_queue import (
+    DEFAULT_LEASE_SECS,
+    DEFAULT_MAX_ATTEMPTS,
+    JobKind,
+    JobQueue,
+    JobState,
+    search_target,
+)
+from matricula_online_scraper.utils.matricula_url import (
+    ParishPageURL,
+    ParishRegisterURL,
+)
+from matricula_online_scraper.utils.shorten_path import shorten_path
+from matricula_online_scraper.utils.user_console import UserConsole
+
+from ..logging_config import get_logger
+from .common import AutotuneOption, CacheOption
+
+# NOTE: Scrapy and Twisted are imported by `work`, so that the other commands start
+# fast, see `test_startup.py`.
+
+logger = get_logger(__name__)
+usrcon = UserConsole()
+
+app = typer.Typer(rich_markup_mode=None)  # NOTE: see `main.py`
+
+QueueArgument = Annotated[
+    Path,
+    typer.Argument(
+        help="Queue file (SQLite) on storage shared by all machines, created if missing.",
+        file_okay=True,
+        dir_okay=False,
+    ),
+]
+
+
+@app.command()
+def add(
+    queue: QueueArgument,
+    urls: Annotated[
+        Optional[list[str]],
+        typer.Argument(
+            help=(
+                "URLs of registers or parishes. For a parish, a job is added for each of its"
+                " registers once a worker ran the parish's job."
+                " If neither URLs nor search options are provided, read from STDIN."
+            ),
+            show_default=False,
+        ),
+    ] = None,
+    place: Annotated[
+        Optional[str],
+        typer.Option(
+            help="Add a job that searches for parishes like 'parish list --place'.",
+        ),
+    ] = None,
+    diocese: Annotated[
+        Optional[int],
+        typer.Option(
+            help="Search parishes of this diocese, like 'parish list --diocese'.",
+            min=0,
+        ),
+    ] = None,
+    date_range: Annotated[
+        Optional[Tuple[int, int]],
+        typer.Option(help="Search parishes by date, like 'parish list --date-range'."),
+    ] = None,
+):
+    """(1) Add jobs to the queue.
+
+    Jobs that are already in the queue are skipped, no matter their state.
+
+    \n\nExample:\n\n
+    $ matricula-online-scraper queue add /mnt/shared/jobs.sqlite3 https://data.matricula-online.eu/de/deutschland/aachen/hellenthal-st-anna/
+    """
+    search = place is not None or diocese is not None or date_range is not None
+    if not urls and not search:
+        urls = [line.strip() for line in sys.stdin.read().splitlines() if line.strip()]
+
+    jobs: list[tuple[JobKind, str]] = []
+    for url in urls or []:
+        if ParishRegisterURL(url).is_valid:
+            jobs.append((JobKind.REGISTER, url))
+        elif ParishPageURL(url).is_valid:
+            jobs.append((JobKind.PARISH, url))
+        else:
+            raise typer.BadParameter(
+                f"Neither a register nor a parish URL: {url}", param_hint="urls"
+            )
+    if search:
+        jobs.append((JobKind.SEARCH, search_target(place or "", diocese, date_range)))
+    if not jobs:
+        raise typer.BadParameter(
+            "No URLs or search options provided.", param_hint="urls"
+        )
+
+    job_queue = JobQueue(queue)
+    try:
+        added = job_queue.add_many(jobs)
+    finally:
+        job_queue.close()
+    usrcon.success(f"Added {added} jobs to {shorten_path(queue)}.")
+    if added < len(jobs):
+        usrcon.info(f"Skipped {len(jobs) - added} jobs that were already queued.")
+
+
+@app.command()
+def work(
+    queue: QueueArgument,
+    directory: Annotated[
+        Path,
+        typer.Option(
+            "--outdirectory",
+            "-o",
+            help="Directory to save the image files in, may be shared by all workers.",
+            file_okay=False,
+            dir_okay=True,
+            resolve_path=True,
+        ),
+    ] = Path.cwd() / "parish_register_images",
+    storage: Annotated[
+        ImageStorage,
+        typer.Option("--storage", help="How to store the images, see 'parish fetch'."),
+    ] = ImageStorage.REENCODE,
+    jobs: Annotated[
+        int,
+        typer.Option("--jobs", "-j", help="Number of jobs to run at once.", min=1),
+    ] = 1,
+    lease: Annotated[
+        int,
+        typer.Option(
+            "--lease",
+            help=(
+                "Seconds after which the jobs of a worker that stopped responding are"
+                " handed to other workers. Leases are renewed every third of this time."
+            ),
+            min=3,
+        ),
+    ] = DEFAULT_LEASE_SECS,
+    max_attempts: Annotated[
+        int,
+        typer.Option(
+            "--max-attempts",
+            help="Number of times a job is tried before it is marked as failed.",
+            min=1,
+        ),
+    ] = DEFAULT_MAX_ATTEMPTS,
+    exit_when_empty: Annotated[
+        bool,
+        typer.Option(
+            "--exit-when-empty",
+            help="Stop once all jobs are done instead of waiting for new ones.",
+        ),
+    ] = False,
+    autotune: AutotuneOption = False,
+    cache: CacheOption = False,
+):
+    """(2) Claim and run jobs from the queue until stopped.
+
+    Run this on each machine. Every worker takes the next job once it has capacity,\
+ and registers are downloaded like with 'parish fetch --resume'. If a worker dies,\
+ its jobs are handed to other workers once their lease expired.
+
+    \n\nExample:\n\n
+    $ matricula-online-scraper queue work /mnt/shared/jobs.sqlite3 -o /mnt/shared/images --jobs 4
+    """
+    from scrapy.crawler import CrawlerRunner
+    from scrapy.utils.defer import deferred_from_coro
+    from twisted.internet import reactor
+    from twisted.internet.defer import DeferredList
+
+    from matricula_online_scraper.middlewares.http_cache import cache_settings
+    from matricula_online_scraper.utils.queue_worker import QueueWorker
+
+    cmd_logger = logger.getChild(work.__name__)
+
+    job_queue = JobQueue(queue, lease_secs=lease, max_attempts=max_attempts)
+    journal = DownloadJournal(directory)
+    settings: dict[str, Any] = {
+        "IMAGES_STORE": str(directory),
+        "IMAGES_STORAGE": storage,
+        "AUTOTUNE_ENABLED": autotune,
+        # NOTE: Force a non-asyncio reactor, see `parish fetch`
+        "TWISTED_REACTOR": None,
+    }
+    if cache:
+        settings |= cache_settings()
+    worker = QueueWorker(
+        job_queue, CrawlerRunner(settings=settings), journal, exit_when_empty
+    )
+
+    def shutdown() -> None:
+        # on CTRL+C, or once all jobs are done
+        worker.release()
+        journal.close()
+
+    # reactor handles SIGINT/SIGTERM by stopping
+    reactor.addSystemEventTrigger("before", "shutdown", shutdown)  # type: ignore
+    usrcon.info(f"Worker {worker.name} waiting for jobs in {shorten_path(queue)}.")
+
+    def log_error(failure) -> None:
+        cmd_logger.error(
+            "A job slot of the worker stopped.",
+            exc_info=(failure.type, failure.value, failure.getTracebackObject()),
+        )
+
+    try:
+        loops = DeferredList(
+            [
+                deferred_from_coro(worker.run()).addErrback(log_error)
+                for _ in range(jobs)
+            ]
+        )
+        loops.addBoth(lambda _: reactor.stop())  # type: ignore
+        reactor.run()  # type: ignore  # blocks until stopped or the queue is empty
+    except Exception as exception:
+        cmd_logger.exception("'queue work' command failed with an unknown exception.")
+        usrcon.error(UNKNOWN_ERROR_MSG)
+        raise typer.Exit(1) from exception
+    finally:
+        job_queue.close()
+
+    usrcon.success(f"Ran {worker.done} jobs, {worker.failed} failed.")
+
+
+@app.command()
+def status(queue: QueueArgument):
+    """(3) Show the number of jobs per kind and state, and the failed jobs.
+
+    \n\nExample:\n\n
+    $ matricula-online-scraper queue status /mnt/shared/jobs.sqlite3
+    """
+    from rich.table import Table
+
+    if not queue.exists():
+        usrcon.error(f"{shorten_path(queue)} does not exist.")
+        raise typer.Exit(1)
+
+    job_queue = JobQueue(queue)
+    try:
+        counts = job_queue.counts()
+        failed = job_queue.failed()
+    finally:
+        job_queue.close()
+
+    table = Table()
+    table.add_column("Kind", justify="left")
+    for state in JobState:
+        table.add_column(state.value.capitalize(), justify="right")
+    for kind, states in counts.items():
+        table.add_row(kind.value, *(str(count) for count in states.values()))
+    usrcon.print(table)
+
+    for kind, target, error in failed[:10]:
+        usrcon.print(f"  {kind.value} {target}: {error}", markup=False, highlight=False)
+    if len(failed) > 10:
+        usrcon.print(f"  … and {len(failed) - 10} more")
+    if failed:
+        usrcon.info("Run 'queue retry' to try the failed jobs again.")
+
+
+@app.command()
+def retry(queue: QueueArgument):
+    """(4) Try all failed jobs again.
+
+    \n\nExample:\n\n
+    $ matricula-online-scraper queue retry /mnt/shared/jobs.sqlite3
+    """
+    job_queue = JobQueue(queue)
+    try:
+        retried = job_queue.retry_failed()
+    finally:
+        job_queue.close()
+    usrcon.success(f"{retried} failed jobs will be tried again.")
@@ -0,0 +1,79 @@
+"""`serve` command, which runs jobs submitted over a local HTTP/JSON API.
+
+Every CLI call pays the startup cost of Python, Scrapy and Twisted, and the reactor
+cannot be restarted within a process. `serve` keeps a single reactor running and runs
+each job in a crawler of its own, see `utils/job_server.py` for the API.
+"""
+
+from typing import Annotated
+
+import typer
+
+from matricula_online_scraper.utils.user_console import UserConsole
+
+# NOTE: Twisted and the job server are imported by `serve`, so that the other commands
+# start fast, see `test_startup.py`.
+
+usrcon = UserConsole()
+
+
+DEFAULT_PORT = 7800
+
+
+def serve(
+    port: Annotated[
+        int, typer.Option("--port", "-p", help="Port to listen on.", min=0)
+    ] = DEFAULT_PORT,
+    host: Annotated[
+        str,
+        typer.Option(
+            "--host",
+            help="Interface to listen on. The API has no authentication, keep it local.",
+        ),
+    ] = "127.0.0.1",
+    max_finished_jobs: Annotated[
+        int,
+        typer.Option(
+            help="Number of finished jobs that are kept, older ones are removed.",
+            min=0,
+        ),
+    ] = 100,
+    max_items: Annotated[
+        int,
+        typer.Option(
+            help=(
+                "Number of scraped items that are kept per job, older ones are dropped."
+                " Poll GET /jobs/<id>/items?offset=N to receive all of them."
+            ),
+            min=1,
+        ),
+    ] = 10_000,
+):
+    """Run jobs submitted over a local HTTP/JSON API in a single long-running process.
+
+    Jobs run at the same time in one reactor and share their connections, which avoids\
+ the startup cost of a new process per command. Submit 'fetch', 'show', 'list' and\
+ 'newsfeed' jobs with POST /jobs and poll their status and stats with GET /jobs/<id>.
+
+    \n\nExample:\n\n
+    $ matricula-online-scraper serve --port 7800\n
+    $ curl -d '{"command": "show", "parish": "https://data.matricula-online.eu/de/deutschland/aachen/hellenthal-st-anna/"}' localhost:7800/jobs
+    """
+    from twisted.internet import reactor
+    from twisted.internet.error import CannotListenError
+    from twisted.web.server import Site
+
+    from matricula_online_scraper.utils.job_server import JobApi, JobRunner
+
+    runner = JobRunner(max_finished_jobs=max_finished_jobs, max_items_per_job=max_items)
+    try:
+        listening = reactor.listenTCP(port, Site(JobApi(runner)), interface=host)  # type: ignore
+    except CannotListenError as e:
+        usrcon.error(f"Cannot listen on {host}:{port}: {e.socketError}")
+        raise typer.Exit(1) from None
+    # reactor handles SIGINT/SIGTERM by stopping
+    reactor.addSystemEventTrigger("before", "shutdown", runner.close)  # type: ignore
+    usrcon.info(
+        f"Listening on http://{host}:{listening.getHost().port}/jobs, press CTRL+C to stop."
+    )
+    reactor.run()  # type: ignore  # blocks until stopped
@@ -0,0 +1,124 @@
+"""`store` command group to inspect and clean up directories written by `parish fetch --dedupe`.
+
+Various subcommands allow to:
+1. `stats` show how many images are stored and how much space deduplication saved
+2. `gc` remove images that are no longer used by any register
+"""
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Annotated
+
+import typer
+
+from matricula_online_scraper.logging_config import get_logger
+from matricula_online_scraper.utils.shorten_path import shorten_path
+from matricula_online_scraper.utils.user_console import UserConsole
+
+if TYPE_CHECKING:
+    from matricula_online_scraper.utils.content_store import ContentStore
+
+# NOTE: the content store and rich's tables are imported by the commands, so that the
+# CLI starts fast, see `test_startup.py`.
+
+logger = get_logger(__name__)
+usrcon = UserConsole()
+
+app = typer.Typer(rich_markup_mode=None)  # NOTE: see `main.py`
+
+_COPIES_MSG = (
+    "{directory} stores copies of the images, as hardlinks were not supported."
+    " Nothing is deduplicated, and unused images cannot be told apart."
+)
+
+DirectoryArgument = Annotated[
+    Path,
+    typer.Argument(
+        help="Output directory of 'parish fetch --dedupe'.",
+        exists=True,
+        file_okay=False,
+        dir_okay=True,
+    ),
+]
+
+
+def _open_store(directory: Path) -> "ContentStore":
+    from matricula_online_scraper.utils.content_store import (
+        OBJECTS_DIRNAME,
+        ContentStore,
+    )
+
+    store = ContentStore(directory)
+    if not store.objects.is_dir():
+        usrcon.error(
+            f"{shorten_path(directory)} has no {OBJECTS_DIRNAME} directory."
+            " Only directories written with 'parish fetch --dedupe' can be inspected."
+        )
+        raise typer.Exit(1)
+    return store
+
+
+@app.command()
+def stats(directory: DirectoryArgument):
+    """(1) Show how much space is saved by storing identical images only once.
+
+    \n\nExample:\n\n
+    $ matricula-online-scraper store stats ./images
+    """
+    from rich.filesize import decimal
+    from rich.table import Table
+
+    result = _open_store(directory).stats()
+
+    table = Table(show_header=False, box=None)
+    table.add_row("Distinct images", str(result.objects))
+    if result.copies:
+        table.add_row("Size of distinct images", decimal(result.stored_bytes))
+        usrcon.print(table)
+        usrcon.warning(_COPIES_MSG.format(directory=shorten_path(directory)))
+        return
+    table.add_row("Stored at paths", str(result.links))
+    table.add_row("Size on disk", decimal(result.stored_bytes))
+    table.add_row("Size without deduplication", decimal(result.linked_bytes))
+    table.add_row("Saved", decimal(result.saved_bytes))
+    table.add_row(
+        "Unused images", f"{result.orphans} ({decimal(result.orphaned_bytes)})"
+    )
+    usrcon.print(table)
+    if result.orphans:
+        usrcon.info("Run 'store gc' to remove the unused images.")
+
+
+@app.command()
+def gc(
+    directory: DirectoryArgument,
+    dry_run: Annotated[
+        bool,
+        typer.Option(
+            "--dry-run", help="Only show what would be removed, remove nothing."
+        ),
+    ] = False,
+):
+    """(2) Remove images that are no longer used by any register.
+
+    An image is unused once all of its paths were deleted, e.g. after deleting\
+ the directory of a register.
+
+    \n\nExample:\n\n
+    $ matricula-online-scraper store gc ./images
+    """
+    from rich.filesize import decimal
+
+    store = _open_store(directory)
+    if store.stores_copies:
+        usrcon.error(_COPIES_MSG.format(directory=shorten_path(directory)))
+        raise typer.Exit(1)
+
+    removed = store.collect_garbage(dry_run=dry_run)
+    if dry_run:
+        usrcon.info(
+            f"Would remove {removed.orphans} unused images ({decimal(removed.orphaned_bytes)})."
+        )
+    else:
+        usrcon.success(
+            f"Removed {removed.orphans} unused images ({decimal(removed.orphaned_bytes)})."
+        )
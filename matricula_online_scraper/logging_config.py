@@ -20,9 +20,8 @@ import logging
 from enum import Enum
 from typing import Optional
 
-from rich.console import Console
-from rich.logging import RichHandler
-from rich.theme import Theme
+# NOTE: rich is imported by `setup_logging`, importing it takes a good part of the CLI's
+# startup time, see `test_startup.py`
 
 APP_NAME = "matricula_online_scraper"
 """Name used for the root application logger."""
@@ -46,8 +45,8 @@ DEFAULT_LOG_LEVEL = LogLevel.WARNING
 DEFAULT_PACKAGE_LOG_LEVEL = LogLevel.CRITICAL
 
 
-LOGGING_THEME = Theme({"logging.level.debug": "blue", "logging.level.info": "green"})
-"""Custom theme for the RichHandler."""
+LOGGING_THEME = {"logging.level.debug": "blue", "logging.level.info": "green"}
+"""Styles of the custom theme for the RichHandler."""
 
 FORMAT = "%(message)s"
 # NOTE: the levelname and time are not needed when using the RichHandler
@@ -98,6 +97,12 @@ class Logging:
         Returns:
             Logger: The application logger.
         """
+        from rich.console import Console
+        from rich.logging import RichHandler
+        from rich.theme import Theme
+
+        theme = Theme(LOGGING_THEME)
+
         # --- 3rd-party package logging ---
         logging.basicConfig(
             level=self.package_log_level,
@@ -107,7 +112,7 @@ class Logging:
             datefmt=LOG_TIME_FORMAT,
             handlers=[
                 RichHandler(
-                    console=Console(stderr=self.use_stderr, theme=LOGGING_THEME),
+                    console=Console(stderr=self.use_stderr, theme=theme),
                     show_time=self.log_level == LogLevel.DEBUG,
                     show_path=self.log_level == LogLevel.DEBUG,
                     # log_time_format=LOG_TIME_FORMAT,
@@ -118,7 +123,7 @@ class Logging:
 
         # --- application logging ---
         console_handler = RichHandler(
-            console=Console(stderr=self.use_stderr, theme=LOGGING_THEME),
+            console=Console(stderr=self.use_stderr, theme=theme),
             show_time=self.log_level == LogLevel.DEBUG,
             show_path=self.log_level == LogLevel.DEBUG,
             # log_time_format=LOG_TIME_FORMAT,
@@ -2,17 +2,22 @@
 """CLI entry point for matricula-online-scraper."""
 
 import logging
-from importlib.metadata import version as get_version
 from typing import Annotated, Optional
 
 import typer
 
 from matricula_online_scraper.cli.newsfeed import app as newsfeed_app
 from matricula_online_scraper.cli.parish import app as parish_app
+from matricula_online_scraper.cli.queue import app as queue_app
+from matricula_online_scraper.cli.serve import serve
+from matricula_online_scraper.cli.store import app as store_app
 from matricula_online_scraper.logging_config import Logging, LogLevel, get_logger
 from matricula_online_scraper.utils.user_console import UserConsole
 
+# NOTE: without rich's help panels, as rendering them imports rich and doubles the
+# time `--help` takes, see `tests/typer/test_startup.py`
 app = typer.Typer(
+    rich_markup_mode=None,
     help="""Command Line Interface (CLI) for scraping Matricula Online https://data.matricula-online.eu.
 
 You can use this tool to scrape the three primary entities from Matricula:\n
@@ -36,11 +41,24 @@ app.add_typer(
     name="newsfeed",
     help="Scrape Matricula Online's Newsfeed.",
 )
+app.add_typer(
+    store_app,
+    name="store",
+    help="Show the space saved (1) or remove unused images (2) in a directory written with 'parish fetch --dedupe'.",
+)
+app.add_typer(
+    queue_app,
+    name="queue",
+    help="Coordinate downloads among several machines: add jobs (1) to a shared queue, run them (2), show their status (3) or retry failed ones (4).",
+)
+app.command()(serve)
 
 
 def version_callback(value: bool):
     """Print the version of the CLI in the format `0.1.0` and exit."""
     if value:
+        from importlib.metadata import version as get_version
+
         version_string = get_version("matricula-online-scraper")
         if version_string.startswith("v"):
             version_string = version_string[1:]
@@ -0,0 +1,373 @@
+"""Downloader middleware that adapts the concurrency per host to how the host responds.
+
+Matricula serves the HTML pages from `data.matricula-online.eu` and the scans from a
+separate image host. Both behave very differently: The HTML host answers quickly but
+is rate limited (429), the image host is slow because the scans are large. A single,
+static concurrency either under-uses one host or gets throttled by the other.
+
+This middleware runs an AIMD (additive increase, multiplicative decrease) controller
+for every host. At the end of each window (`AUTOTUNE_WINDOW` seconds), the concurrency
+of a host is
+
+- increased by one, if the host answered within `AUTOTUNE_TARGET_LATENCY` on average
+  and more requests were waiting for the host than the concurrency allowed
+- halved, as soon as the host throttles (429, 503), fails (5xx, download errors of
+  `RETRY_EXCEPTIONS` such as timeouts) or takes more than twice the target latency to
+  answer; at most once per window. Ignored requests, e.g. cache misses with
+  `--offline`, do not count
+- otherwise left as it is
+
+A `Retry-After` header additionally delays the next request to that host for the
+given number of seconds (capped by `AUTOTUNE_MAX_DELAY`). The delay is halved in each
+subsequent window without throttling.
+
+The chosen concurrency is applied to Scrapy's downloader slot of the host and
+broadcast with the `concurrency_changed` signal, which `SpoolingDownloaderMiddleware`
+listens to. Every change is logged, recorded in the stats (`autotune/<host>/…`) and a
+summary of the concurrency over time is shown when the spider closes.
+
+Settings:
+- `AUTOTUNE_ENABLED` (bool): Enable the middleware. Defaults to False.
+- `AUTOTUNE_MIN_CONCURRENCY` (int): Lower bound per host. Defaults to 1.
+- `AUTOTUNE_MAX_CONCURRENCY` (int): Upper bound per host. Defaults to 16.
+- `AUTOTUNE_TARGET_LATENCY` (float): Latency (s) below which a host may get more
+  concurrent requests. Defaults to 2.0.
+- `AUTOTUNE_WINDOW` (float): Seconds between two adjustments. Defaults to 5.0.
+- `AUTOTUNE_MAX_DELAY` (float): Cap for delays requested by `Retry-After`. Defaults to 60.0.
+
+The initial concurrency of each host is `CONCURRENT_REQUESTS_PER_DOMAIN`.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import scrapy
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Response
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.misc import load_object
+from twisted.internet import reactor, task
+
+from matricula_online_scraper.logging_config import get_logger
+from matricula_online_scraper.utils.user_console import UserConsole
+
+logger = get_logger(__name__)
+usrcon = UserConsole()
+
+
+concurrency_changed = object()
+"""Signal sent with `host`, `concurrency` and `delay` whenever a host's limits change."""
+
+THROTTLE_STATUSES = (429, 503)
+"""Status codes with which a host asks to slow down."""
+
+
+def parse_retry_after(value: bytes | str | None) -> float | None:
+    """Parse the value of a `Retry-After` header into seconds.
+
+    The header is either a number of seconds or an HTTP date.
+
+    Examples:
+    >>> parse_retry_after(b"120")
+    120.0
+    >>> parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0  # in the past
+    True
+    >>> parse_retry_after(b"soon") is None
+    True
+    """
+    if not value:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode("latin-1")
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+@dataclass
+class HostController:
+    """AIMD controller of the concurrency and delay of a single host."""
+
+    host: str
+    concurrency: int
+    min_concurrency: int = 1
+    max_concurrency: int = 16
+    target_latency: float = 2.0
+    base_delay: float = 0.0
+    max_delay: float = 60.0
+
+    delay: float = field(init=False)
+    history: list[tuple[float, int]] = field(default_factory=list)
+    """Concurrency over time as (seconds since start, concurrency)."""
+
+    in_flight: int = field(default=0, init=False)
+    """Requests that were sent to the downloader but not answered yet."""
+
+    # observations of the current window
+    peak_in_flight: int = field(default=0, init=False)
+    responses: int = field(default=0, init=False)
+    throttled: int = field(default=0, init=False)
+    errors: int = field(default=0, init=False)
+    latency_total: float = field(default=0.0, init=False)
+    _backed_off: bool = field(default=False, init=False)
+    _window_concurrency: int = field(default=0, init=False)
+
+    def __post_init__(self):  # noqa: D105
+        self.concurrency = min(
+            max(self.concurrency, self.min_concurrency), self.max_concurrency
+        )
+        self.delay = self.base_delay
+        self._window_concurrency = self.concurrency
+        self.history.append((0.0, self.concurrency))
+
+    @property
+    def mean_latency(self) -> float:
+        """Mean latency of the responses in the current window."""
+        return self.latency_total / self.responses if self.responses else 0.0
+
+    def started(self) -> None:
+        """Record that a request was sent to the downloader."""
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def cancelled(self) -> None:
+        """Record that a request was not downloaded, e.g. ignored by a middleware."""
+        self.in_flight = max(0, self.in_flight - 1)
+
+    def observe(
+        self,
+        status: int | None,
+        latency: float | None = None,
+        retry_after: float | None = None,
+    ) -> bool:
+        """Record a response (or a failed download if `status` is None).
+
+        Throttling is acted on immediately, without waiting for the window to end,
+        so that a burst of 429s does not keep hammering the host.
+
+        Returns:
+            bool: Whether the concurrency or the delay changed.
+        """
+        self.in_flight = max(0, self.in_flight - 1)
+        if status is None or (status >= 500 and status not in THROTTLE_STATUSES):
+            self.errors += 1
+            return False
+
+        self.responses += 1
+        if latency is not None:
+            self.latency_total += latency
+        if status not in THROTTLE_STATUSES:
+            return False
+
+        self.throttled += 1
+        changed = self._back_off()
+        if retry_after is not None:
+            delay = min(retry_after, self.max_delay)
+            if delay > self.delay:
+                self.delay = delay
+                changed = True
+        return changed
+
+    def _back_off(self) -> bool:
+        """Halve the concurrency, at most once per window."""
+        if self._backed_off:
+            return False
+        self._backed_off = True
+        previous = self.concurrency
+        self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+        return self.concurrency != previous
+
+    def tick(self, elapsed: float) -> bool:
+        """Close the current window, adjust the limits and start a new window.
+
+        Args:
+            elapsed (float): Seconds since the start of the crawl, used for the history.
+
+        Returns:
+            bool: Whether the concurrency or the delay changed.
+        """
+        previous = (self.concurrency, self.delay)
+        observed = self.responses + self.errors
+        unhealthy = (
+            self.throttled > 0
+            or self.errors > 0.1 * max(observed, 1)
+            or self.mean_latency > 2 * self.target_latency
+        )
+
+        if observed and unhealthy:
+            self._back_off()
+        elif (
+            self.responses
+            and self.mean_latency <= self.target_latency
+            # only grow if there were more requests than the concurrency allows
+            and self.peak_in_flight > self.concurrency
+        ):
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+
+        if self.throttled == 0 and self.delay > self.base_delay:
+            self.delay = self.delay / 2 if self.delay / 2 > 0.1 else self.base_delay
+
+        # also covers an immediate back-off during the window
+        if self.concurrency != self._window_concurrency:
+            self.history.append((elapsed, self.concurrency))
+        self._window_concurrency = self.concurrency
+
+        self.peak_in_flight = self.in_flight
+        self.responses = self.throttled = self.errors = 0
+        self.latency_total = 0.0
+        self._backed_off = False
+        return (self.concurrency, self.delay) != previous
+
+    def summary(self, limit: int = 10) -> str:
+        """Describe the concurrency over time, e.g. `8 (0s) → 9 (5s) → 4 (40s)`."""
+        steps = [f"{conc} ({elapsed:.0f}s)" for elapsed, conc in self.history]
+        if len(steps) > limit:
+            steps = [steps[0], "…", *steps[-(limit - 1) :]]
+        values = [conc for _, conc in self.history]
+        return f"{' → '.join(steps)} (min {min(values)}, max {max(values)})"
+
+
+class AutotuneDownloaderMiddleware:
+    """Adjusts the concurrency of every host with an `HostController`."""
+
+    def __init__(self, crawler):  # noqa: D107
+        settings = crawler.settings
+        if not settings.getbool("AUTOTUNE_ENABLED"):
+            raise NotConfigured
+
+        self.crawler = crawler
+        self.controllers: dict[str, HostController] = {}
+        self.controller_kwargs = {
+            "min_concurrency": settings.getint("AUTOTUNE_MIN_CONCURRENCY", 1),
+            "max_concurrency": settings.getint("AUTOTUNE_MAX_CONCURRENCY", 16),
+            "target_latency": settings.getfloat("AUTOTUNE_TARGET_LATENCY", 2.0),
+            "base_delay": settings.getfloat("DOWNLOAD_DELAY"),
+            "max_delay": settings.getfloat("AUTOTUNE_MAX_DELAY", 60.0),
+        }
+        # like `RetryMiddleware`, e.g. not `IgnoreRequest` of a cache miss with --offline
+        self.download_errors = tuple(
+            load_object(error) if isinstance(error, str) else error
+            for error in settings.getlist("RETRY_EXCEPTIONS")
+        )
+        """Exceptions that are failed downloads and count against the host."""
+        self.start_concurrency = settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN")
+        self.window = settings.getfloat("AUTOTUNE_WINDOW", 5.0)
+        self.start_time = 0.0
+        self.loop = task.LoopingCall(self._tick)
+
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler):  # noqa: D102
+        return cls(crawler)
+
+    def spider_opened(self, spider: scrapy.Spider) -> None:  # noqa: D102
+        self.start_time = reactor.seconds()  # type: ignore
+        self.loop.start(self.window, now=False)
+
+    def spider_closed(self, spider: scrapy.Spider) -> None:  # noqa: D102
+        if self.loop.running:
+            self.loop.stop()
+        for host, controller in self.controllers.items():
+            self.crawler.stats.set_value(f"autotune/{host}/history", controller.history)
+            usrcon.info(f"Concurrency for {host} over time: {controller.summary()}")
+
+    def _controller(self, request: scrapy.Request) -> HostController:
+        host = urlparse_cached(request).hostname or ""
+        if host not in self.controllers:
+            self.controllers[host] = HostController(
+                host, self.start_concurrency, **self.controller_kwargs
+            )
+        return self.controllers[host]
+
+    def _sync_slot(self, controller: HostController) -> None:
+        """Apply the limits to the host's downloader slot, if there is one.
+
+        Slots are created lazily and discarded when idle, so a new slot starts with
+        the default concurrency and has to be synced again.
+        """
+        slot = self.crawler.engine.downloader.slots.get(controller.host)
+        if slot is not None:
+            slot.concurrency = controller.concurrency
+            slot.delay = controller.delay
+
+    def _apply(self, controller: HostController) -> None:
+        """Apply changed limits and notify other components."""
+        self._sync_slot(controller)
+        prefix = f"autotune/{controller.host}"
+        self.crawler.stats.set_value(f"{prefix}/concurrency", controller.concurrency)
+        self.crawler.stats.max_value(
+            f"{prefix}/max_concurrency", controller.concurrency
+        )
+        self.crawler.stats.min_value(
+            f"{prefix}/min_concurrency", controller.concurrency
+        )
+        self.crawler.signals.send_catch_log(
+            signal=concurrency_changed,
+            host=controller.host,
+            concurrency=controller.concurrency,
+            delay=controller.delay,
+        )
+
+    def _tick(self) -> None:
+        elapsed = reactor.seconds() - self.start_time  # type: ignore
+        for controller in self.controllers.values():
+            responses, latency = controller.responses, controller.mean_latency
+            throttled, errors = controller.throttled, controller.errors
+            previous = controller.concurrency
+            if controller.tick(elapsed):
+                logger.info(
+                    f"Autotune {controller.host}: concurrency {previous} -> {controller.concurrency},"
+                    f" delay {controller.delay:.1f}s ({responses} responses,"
+                    f" mean latency {latency:.2f}s, {throttled} throttled, {errors} errors)"
+                )
+                self._apply(controller)
+
+    def process_request(
+        self, request: scrapy.Request, spider: scrapy.Spider | None = None
+    ) -> None:
+        """Count the request as in flight for its host."""
+        self._controller(request).started()
+
+    def process_response(
+        self,
+        request: scrapy.Request,
+        response: Response,
+        spider: scrapy.Spider | None = None,
+    ) -> Response:
+        """Feed the response to the controller of its host."""
+        controller = self._controller(request)
+        if controller.observe(
+            response.status,
+            request.meta.get("download_latency"),
+            parse_retry_after(response.headers.get("Retry-After")),
+        ):
+            logger.info(
+                f"Autotune {controller.host}: throttled ({response.status}),"
+                f" concurrency {controller.concurrency}, delay {controller.delay:.1f}s"
+            )
+            self._apply(controller)
+        else:
+            self._sync_slot(controller)
+        return response
+
+    def process_exception(
+        self,
+        request: scrapy.Request,
+        exception: Exception,
+        spider: scrapy.Spider | None = None,
+    ) -> None:
+        """Count a failed download (e.g. a timeout) against its host."""
+        controller = self._controller(request)
+        if isinstance(exception, self.download_errors):
+            controller.observe(None)
+        else:
+            controller.cancelled()
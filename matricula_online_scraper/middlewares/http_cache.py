@@ -0,0 +1,210 @@
+"""Persistent cache of Matricula's HTML pages, shared by all commands.
+
+Plugs into Scrapy's `HttpCacheMiddleware` (see `cache_settings`) with
+
+- `HtmlCachePolicy`, which only caches successful HTML responses. Scans are never
+  looked up in or written to the cache, they would fill it up in no time.
+- `SqliteCacheStorage`, which stores the responses of all spiders in a single SQLite
+  database. Bodies are compressed with zlib. Entries older than
+  `HTTPCACHE_EXPIRATION_SECS` are dropped when the cache is opened, and once the
+  cache grows beyond `HTTPCACHE_MAX_BYTES`, the least recently used entries are
+  evicted.
+
+With `HTTPCACHE_IGNORE_MISSING` (`--offline`), requests that are not in the cache are
+ignored instead of being sent, so a command runs entirely from the cache.
+
+Settings (besides Scrapy's `HTTPCACHE_*`):
+- `HTTPCACHE_MAX_BYTES` (int): Maximum size of the compressed bodies. Defaults to 512 MiB.
+"""
+
+import os
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from typing import Any
+
+import scrapy
+from scrapy.extensions.httpcache import DummyPolicy
+from scrapy.http import Headers, Response
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+
+from matricula_online_scraper.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+CACHE_FILENAME = "http-cache.sqlite3"
+"""Name of the database inside `HTTPCACHE_DIR`."""
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_EXPIRATION_SECS = 7 * 24 * 60 * 60
+
+_IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".gif", ".webp")
+
+
+def default_cache_dir() -> Path:
+    """Return the user's cache directory for this tool, e.g. `~/.cache/matricula-online-scraper`."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base, "matricula-online-scraper")
+
+
+def cache_settings(offline: bool = False) -> dict[str, Any]:
+    """Return the Scrapy settings that enable the cache, see `--cache` and `--offline`."""
+    return {
+        "HTTPCACHE_ENABLED": True,
+        "HTTPCACHE_STORAGE": f"{__name__}.SqliteCacheStorage",
+        "HTTPCACHE_POLICY": f"{__name__}.HtmlCachePolicy",
+        "HTTPCACHE_DIR": str(default_cache_dir()),
+        # offline, everything that is in the cache is good enough
+        "HTTPCACHE_EXPIRATION_SECS": 0 if offline else DEFAULT_EXPIRATION_SECS,
+        "HTTPCACHE_IGNORE_MISSING": offline,
+    }
+
+
+class HtmlCachePolicy(DummyPolicy):
+    """Caches successful HTML responses only, never images."""
+
+    def should_cache_request(self, request: scrapy.Request) -> bool:  # noqa: D102
+        path = request.url.split("?", 1)[0].lower()
+        # e.g. requests of the image pipelines, which are streamed to disk
+        if path.endswith(_IMAGE_SUFFIXES) or "spool_path" in request.meta:
+            return False
+        return super().should_cache_request(request)
+
+    def should_cache_response(  # noqa: D102
+        self, response: Response, request: scrapy.Request
+    ) -> bool:
+        content_type = response.headers.get("Content-Type", b"").lower()
+        return response.status == 200 and content_type.startswith(b"text/html")
+
+
+class SqliteCacheStorage:
+    """Stores the responses of all spiders compressed in one SQLite database."""
+
+    def __init__(self, settings):  # noqa: D107
+        self.path = Path(data_path(settings["HTTPCACHE_DIR"], createdir=True))
+        self.path /= CACHE_FILENAME
+        self.expiration_secs = settings.getint("HTTPCACHE_EXPIRATION_SECS")
+        self.max_bytes = settings.getint("HTTPCACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+        self.db: sqlite3.Connection | None = None
+        self.size = 0
+        """Total size of the compressed bodies."""
+
+    def open_spider(self, spider: scrapy.Spider) -> None:  # noqa: D102
+        self._fingerprinter = spider.crawler.request_fingerprinter
+        # several commands may run at the same time
+        self.db = sqlite3.connect(self.path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    fingerprint BLOB PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    headers BLOB NOT NULL,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+                """
+            )
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+            )
+            if self.expiration_secs > 0:
+                expired = self.db.execute(
+                    "DELETE FROM responses WHERE stored < ?",
+                    (time.time() - self.expiration_secs,),
+                ).rowcount
+                if expired:
+                    logger.debug(f"Removed {expired} expired responses from the cache")
+        (self.size,) = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        logger.debug(f"Using HTTP cache {self.path} ({self.size} bytes)")
+
+    def close_spider(self, spider: scrapy.Spider) -> None:  # noqa: D102
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def retrieve_response(  # noqa: D102
+        self, spider: scrapy.Spider, request: scrapy.Request
+    ) -> Response | None:
+        assert self.db is not None
+        key = self._fingerprinter.fingerprint(request)
+        row = self.db.execute(
+            "SELECT url, status, headers, body, stored FROM responses WHERE fingerprint = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        url, status, raw_headers, body, stored = row
+        if 0 < self.expiration_secs < time.time() - stored:
+            return None
+
+        with self.db:
+            self.db.execute(
+                "UPDATE responses SET accessed = ? WHERE fingerprint = ?",
+                (time.time(), key),
+            )
+        request.meta["cache_timestamp"] = stored
+        headers = Headers(headers_raw_to_dict(raw_headers))
+        body = zlib.decompress(body)
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, headers=headers, status=status, body=body)
+
+    def store_response(  # noqa: D102
+        self, spider: scrapy.Spider, request: scrapy.Request, response: Response
+    ) -> None:
+        assert self.db is not None
+        key = self._fingerprinter.fingerprint(request)
+        body = zlib.compress(response.body)
+        now = time.time()
+        with self.db:
+            previous = self.db.execute(
+                "SELECT size FROM responses WHERE fingerprint = ?", (key,)
+            ).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    response.url,
+                    response.status,
+                    headers_dict_to_raw(response.headers),
+                    body,
+                    len(body),
+                    now,
+                    now,
+                ),
+            )
+        self.size += len(body) - (previous[0] if previous else 0)
+        if self.size > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove the least recently used responses until the cache fits again."""
+        assert self.db is not None
+        # leave some room, so that not every new response causes an eviction
+        target = self.max_bytes * 0.9
+        keys: list[tuple[bytes]] = []
+        rows = self.db.execute(
+            "SELECT fingerprint, size FROM responses ORDER BY accessed"
+        )
+        for key, size in rows:
+            if self.size <= target:
+                break
+            keys.append((key,))
+            self.size -= size
+        rows.close()
+        with self.db:
+            self.db.executemany("DELETE FROM responses WHERE fingerprint = ?", keys)
+        logger.debug(
+            f"Evicted {len(keys)} responses from the cache ({self.size} bytes)"
+        )
@@ -0,0 +1,43 @@
+"""Download handler that shares one connection pool among all crawlers of a process.
+
+Each Scrapy crawler creates its own HTTP connection pool and closes it when it is
+done. In a long-running process that runs many crawlers one after another or at the
+same time (see `serve`), every crawler would open new connections and do the TLS
+handshakes again. `SharedPoolDownloadHandler` hands the same pool to all crawlers and
+keeps it open when a crawler closes, so that connections to Matricula's servers are
+reused across jobs. DNS lookups are cached by Scrapy for the whole process anyway.
+
+Enable it with `shared_pool_settings()`.
+"""
+
+from typing import Any
+
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from twisted.internet.defer import Deferred, succeed
+from twisted.web.client import HTTPConnectionPool
+
+_HANDLER = f"{__name__}.SharedPoolDownloadHandler"
+
+
+def shared_pool_settings() -> dict[str, Any]:
+    """Return the Scrapy settings that enable `SharedPoolDownloadHandler`."""
+    return {"DOWNLOAD_HANDLERS": {"http": _HANDLER, "https": _HANDLER}}
+
+
+class SharedPoolDownloadHandler(HTTP11DownloadHandler):
+    """`HTTP11DownloadHandler` whose connection pool outlives the crawler."""
+
+    _shared_pool: HTTPConnectionPool | None = None
+
+    def __init__(self, *args, **kwargs):  # noqa: D107
+        # the signature differs between Scrapy versions
+        super().__init__(*args, **kwargs)
+        cls = type(self)
+        if cls._shared_pool is None:
+            cls._shared_pool = self._pool
+        # the pool created by the parent has no connections yet, hence needs no cleanup
+        self._pool = cls._shared_pool
+
+    def close(self) -> Deferred:  # type: ignore[override]
+        """Keep the pool's connections open for the next crawler."""
+        return succeed(None)
@@ -0,0 +1,371 @@
+"""Downloader middleware that streams images straight to disk.
+
+By default, Scrapy buffers the entire body of a response in memory before it is passed
+on to the item pipelines, which then write it to disk. With many concurrent requests
+of scans that are 5–20 MB each, the memory usage swings by hundreds of MB.
+
+This middleware takes over the download of requests that carry a `spool_path` in
+their meta (see `RawImagesPipeline`). Each body is written into a temporary file in the
+target directory as the bytes arrive and renamed into place once it is complete.
+The pipeline then receives an empty response flagged as `spooled`.
+
+Received bytes are written to disk in a thread. The total number of bytes that have
+been received but not yet written is capped by `IMAGES_SPOOL_MAX_INFLIGHT_BYTES`:
+Once the cap is reached, all spooling downloads stop reading from their sockets until
+enough bytes were written. This keeps the peak memory flat regardless of the size
+of the scans.
+
+Because the middleware bypasses Scrapy's downloader slots, it limits the number of
+concurrent downloads per host itself, starting with `CONCURRENT_REQUESTS_PER_DOMAIN`.
+The limits follow `AutotuneDownloaderMiddleware` if it is enabled.
+
+Settings:
+- `IMAGES_SPOOL` (bool): Enable the middleware. Defaults to False.
+- `IMAGES_SPOOL_MAX_INFLIGHT_BYTES` (int): Cap of bytes held in memory. Defaults to 64 MiB.
+"""
+
+import hashlib
+import os
+import tempfile
+from collections import deque
+from pathlib import Path
+from typing import Any
+
+import scrapy
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Headers, Response
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.python import to_bytes, to_unicode
+from twisted.internet import error, reactor, threads
+from twisted.internet.defer import CancelledError, Deferred
+from twisted.internet.endpoints import clientFromString
+from twisted.internet.protocol import Protocol
+from twisted.python.failure import Failure
+from twisted.web.client import (
+    Agent,
+    BrowserLikePolicyForHTTPS,
+    HTTPConnectionPool,
+    ProxyAgent,
+    ResponseDone,
+)
+from twisted.web.http import PotentialDataLoss
+from twisted.web.http_headers import Headers as TxHeaders
+
+from matricula_online_scraper.logging_config import get_logger
+from matricula_online_scraper.middlewares import autotune
+
+logger = get_logger(__name__)
+
+
+DEFAULT_MAX_INFLIGHT_BYTES = 64 * 1024 * 1024
+"""Default cap of received bytes that have not been written to disk yet."""
+
+
+class ByteBudget:
+    """Limits the number of bytes held in memory across all spooling downloads.
+
+    Producers (= transports of the downloads) are paused when the budget is exceeded
+    and resumed once enough bytes were released.
+    """
+
+    def __init__(self, capacity: int):  # noqa: D107
+        self.capacity = capacity
+        self.used = 0
+        self.peak = 0
+        self._paused: deque[Any] = deque()
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether the budget is used up."""
+        return self.used >= self.capacity
+
+    def reserve(self, size: int, producer: Any) -> None:
+        """Account for `size` received bytes and pause `producer` if the budget is used up."""
+        self.used += size
+        self.peak = max(self.peak, self.used)
+        if self.exhausted and producer not in self._paused:
+            producer.pauseProducing()
+            self._paused.append(producer)
+
+    def release(self, size: int) -> None:
+        """Give back `size` bytes and resume paused producers while there is room."""
+        self.used -= size
+        while self._paused and not self.exhausted:
+            self._paused.popleft().resumeProducing()
+
+    def forget(self, producer: Any) -> None:
+        """Stop tracking a producer, e.g. because its connection was lost."""
+        if producer in self._paused:
+            self._paused.remove(producer)
+
+
+class HostLimiter:
+    """Limits the concurrent downloads to a host, like Scrapy's downloader slots do."""
+
+    def __init__(self, concurrency: int, delay: float = 0.0):  # noqa: D107
+        self.concurrency = concurrency
+        self.delay = delay
+        self.active = 0
+        self._lastseen = 0.0
+        self._waiting: deque[Deferred] = deque()
+        self._latercall: Any = None
+
+    def acquire(self) -> Deferred:
+        """Return a Deferred that fires once a download may start."""
+        waiter: Deferred = Deferred()
+        self._waiting.append(waiter)
+        self._process()
+        return waiter
+
+    def release(self) -> None:
+        """Mark a download as finished and start the next waiting one."""
+        self.active -= 1
+        self._process()
+
+    def update(self, concurrency: int, delay: float) -> None:
+        """Change the limits, waiting downloads are started if they now fit."""
+        self.concurrency, self.delay = concurrency, delay
+        self._process()
+
+    def _process(self) -> None:
+        if self._latercall is not None and self._latercall.active():
+            return
+        while self._waiting and self.active < self.concurrency:
+            now = reactor.seconds()  # type: ignore
+            penalty = self._lastseen + self.delay - now
+            if penalty > 0:
+                self._latercall = reactor.callLater(penalty, self._process)  # type: ignore
+                return
+            self._lastseen = now
+            self.active += 1
+            self._waiting.popleft().callback(None)
+
+
+class _SpoolingProtocol(Protocol):
+    """Receives a response body and writes it into a temporary file in a thread."""
+
+    def __init__(self, target: Path, budget: ByteBudget, finished: Deferred):
+        self.target = target
+        self.budget = budget
+        self.finished = finished
+        self.size = 0
+        self._md5 = hashlib.md5()
+        self._pending: list[bytes] = []
+        self._writing = False
+        self._lost: Failure | None = None
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(
+            dir=target.parent, prefix=f".{target.name}.", suffix=".part"
+        )
+        self._file = os.fdopen(fd, "wb")
+        self.tmp = Path(tmp)
+
+    def dataReceived(self, data: bytes) -> None:  # noqa: N802
+        self.size += len(data)
+        self._pending.append(data)
+        self.budget.reserve(len(data), self.transport)
+        self._write_pending()
+
+    def connectionLost(self, reason: Failure) -> None:  # noqa: N802
+        self.budget.forget(self.transport)
+        self._lost = reason
+        self._write_pending()
+
+    def _write_pending(self) -> None:
+        """Write all buffered chunks in a thread, one batch at a time per file."""
+        if self._writing:
+            return
+        if self._pending:
+            chunks, self._pending = self._pending, []
+            self._writing = True
+            dfd = threads.deferToThread(self._write, chunks)
+            dfd.addBoth(self._written, sum(len(chunk) for chunk in chunks))
+        elif self._lost is not None:
+            self._finish(self._lost)
+
+    def _write(self, chunks: list[bytes]) -> None:
+        for chunk in chunks:
+            self._md5.update(chunk)
+        self._file.writelines(chunks)
+
+    def _written(self, result: Any, size: int) -> None:
+        self._writing = False
+        self.budget.release(size)
+        if isinstance(result, Failure):
+            # e.g. disk full, abort the download
+            self._lost = result
+            self._pending.clear()
+            if self.transport is not None:
+                self.transport.stopProducing()
+        self._write_pending()
+
+    def _finish(self, reason: Failure) -> None:
+        self._file.close()
+        if reason.check(ResponseDone, PotentialDataLoss) and not self.finished.called:
+            os.replace(self.tmp, self.target)
+            self.finished.callback(self._md5.hexdigest())
+        else:
+            self.tmp.unlink(missing_ok=True)
+            if not self.finished.called:  # not yet cancelled
+                self.finished.errback(reason)
+
+
+class _BodyCollector(Protocol):
+    """Collects a (small) response body in memory, used for non-200 responses."""
+
+    def __init__(self, finished: Deferred):
+        self.finished = finished
+        self._chunks: list[bytes] = []
+
+    def dataReceived(self, data: bytes) -> None:  # noqa: N802
+        self._chunks.append(data)
+
+    def connectionLost(self, reason: Failure) -> None:  # noqa: N802
+        if reason.check(ResponseDone, PotentialDataLoss):
+            self.finished.callback(b"".join(self._chunks))
+        else:
+            self.finished.errback(reason)
+
+
+class SpoolingDownloaderMiddleware:
+    """Downloads requests with a `spool_path` meta key directly into that file."""
+
+    def __init__(self, crawler):  # noqa: D107
+        settings = crawler.settings
+        if not settings.getbool("IMAGES_SPOOL"):
+            raise NotConfigured
+
+        self.crawler = crawler
+        self.budget = ByteBudget(
+            settings.getint(
+                "IMAGES_SPOOL_MAX_INFLIGHT_BYTES", DEFAULT_MAX_INFLIGHT_BYTES
+            )
+        )
+        self.concurrency = settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN")
+        self.limiters: dict[str, HostLimiter] = {}
+        self.pool = HTTPConnectionPool(reactor, persistent=True)
+        self.pool.maxPersistentPerHost = self.concurrency
+        self.agent = Agent(
+            reactor, contextFactory=BrowserLikePolicyForHTTPS(), pool=self.pool
+        )
+
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(
+            self.concurrency_changed, signal=autotune.concurrency_changed
+        )
+
+    @classmethod
+    def from_crawler(cls, crawler):  # noqa: D102
+        return cls(crawler)
+
+    def spider_closed(self, spider: scrapy.Spider) -> Deferred:  # noqa: D102
+        self.crawler.stats.set_value("spool/peak_inflight_bytes", self.budget.peak)
+        return self.pool.closeCachedConnections()
+
+    def concurrency_changed(self, host: str, concurrency: int, delay: float) -> None:
+        """Follow the limits chosen by `AutotuneDownloaderMiddleware`."""
+        self._limiter_for(host).update(concurrency, delay)
+        self.pool.maxPersistentPerHost = max(
+            self.pool.maxPersistentPerHost, concurrency
+        )
+
+    def _limiter_for(self, host: str) -> HostLimiter:
+        if host not in self.limiters:
+            self.limiters[host] = HostLimiter(self.concurrency)
+        return self.limiters[host]
+
+    def _agent_for(self, request: scrapy.Request) -> Agent | ProxyAgent | None:
+        """Return the agent to download the request with, or None if unsupported."""
+        proxy = request.meta.get("proxy")
+        if not proxy:
+            return self.agent
+        if request.url.startswith("http://"):
+            host, _, port = (
+                to_unicode(proxy).split("://")[-1].rstrip("/").partition(":")
+            )
+            endpoint = f"tcp:host={host}:port={port or 80}"
+            return ProxyAgent(clientFromString(reactor, endpoint), pool=self.pool)
+        # tunneling HTTPS through a proxy is left to Scrapy's download handler
+        return None
+
+    async def process_request(
+        self, request: scrapy.Request, spider: scrapy.Spider | None = None
+    ):
+        """Download the request into `request.meta['spool_path']` if present."""
+        spool_path = request.meta.get("spool_path")
+        if not spool_path:
+            return None
+
+        agent = self._agent_for(request)
+        if agent is None:
+            logger.debug(f"Cannot spool {request.url} through a proxy. Buffering it.")
+            return None
+
+        limiter = self._limiter_for(urlparse_cached(request).hostname or "")
+        await limiter.acquire()
+        try:
+            return await self._download(request, agent, spool_path)
+        finally:
+            limiter.release()
+
+    async def _download(
+        self, request: scrapy.Request, agent: Agent | ProxyAgent, spool_path: str
+    ) -> Response:
+        headers = TxHeaders(
+            {
+                to_bytes(key): values
+                for key, values in request.headers.items()
+                # the body must be stored exactly as sent, do not let it be compressed
+                if key.lower() != b"accept-encoding"
+            }
+        )
+
+        start = reactor.seconds()  # type: ignore
+        waiting: Deferred = agent.request(
+            to_bytes(request.method), to_bytes(request.url), headers, None
+        )
+        timeout = request.meta.get("download_timeout", 180)
+        # cancels whatever is awaited at the time: the headers or the body
+        timer = reactor.callLater(timeout, lambda: waiting.cancel())  # type: ignore
+
+        try:
+            try:
+                txresponse = await waiting
+                request.meta["download_latency"] = reactor.seconds() - start  # type: ignore
+
+                if txresponse.code == 200:
+                    finished = waiting = Deferred(
+                        # aborting the connection lets the protocol clean up
+                        canceller=lambda _: protocol.transport.stopProducing()
+                    )
+                    protocol = _SpoolingProtocol(
+                        Path(spool_path), self.budget, finished
+                    )
+                    txresponse.deliverBody(protocol)
+                    request.meta["spool_checksum"] = await finished
+                    request.meta["spool_size"] = protocol.size
+                    body, flags = b"", ["spooled"]
+                else:
+                    finished = waiting = Deferred()
+                    txresponse.deliverBody(_BodyCollector(finished))
+                    body, flags = await finished, []
+            except CancelledError as exc:
+                raise error.TimeoutError(
+                    f"Getting {request.url} took longer than {timeout} seconds."
+                ) from exc
+        finally:
+            if timer.active():
+                timer.cancel()
+
+        return Response(
+            url=request.url,
+            status=txresponse.code,
+            headers=Headers(
+                {key: values for key, values in txresponse.headers.getAllRawHeaders()}
+            ),
+            body=body,
+            flags=flags,
+            request=request,
+        )
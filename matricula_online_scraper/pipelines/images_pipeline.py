@@ -1,20 +1,53 @@
-"""Custom image pipeline to store downloaded images.
+"""Custom image pipelines to store downloaded images.
 
-This pipeline is used to customized the path where the images are stored.
-It can be used by specifying a valid module path in the Scrapy settings.
+These pipelines are used to customized the path where the images are stored.
+They can be used by specifying a valid module path in the Scrapy settings.
+
+- `CustomImagesPipeline` decodes each image with Pillow (based on Scrapy's `ImagesPipeline`)
+- `RawImagesPipeline` writes the bytes exactly as received (based on Scrapy's `FilesPipeline`)
+- `ArchiveImagesPipeline` appends the bytes to one ZIP, CBZ or PDF per register
+
+All of them store each distinct image only once if `IMAGES_STORE` uses the `cas://`
+scheme, see `ContentAddressedFilesStore`.
+
+Pages are downloaded register by register, see `RegisterScheduler`.
+
+The validators of each response (ETag, Last-Modified, Content-Length) are recorded in
+the journal. When a page that is already on disk has to be downloaded again (because
+it is older than `IMAGES_EXPIRES`), it is requested conditionally with `If-None-Match`
+and `If-Modified-Since`, so that an unchanged page costs a bodyless 304 response.
 """
 
 import hashlib
+import os
 import re
+from dataclasses import dataclass, field
+from functools import cached_property
 from pathlib import Path
+from typing import Any
 
-from attr import dataclass
 from scrapy.http.request import Request
 from scrapy.http.response import Response
 from scrapy.item import Item
+from scrapy.pipelines.files import FilesPipeline, FSFilesStore
 from scrapy.pipelines.images import ImagesPipeline
+from scrapy.utils.defer import deferred_from_coro, maybe_deferred_to_future
+from twisted.internet.defer import Deferred, DeferredSemaphore, maybeDeferred, succeed
+from twisted.python.failure import Failure
 
 from matricula_online_scraper.logging_config import get_logger
+from matricula_online_scraper.utils.archive_writer import (
+    WRITERS,
+    ArchiveWriter,
+    entry_name,
+)
+from matricula_online_scraper.utils.content_store import ContentStore
+from matricula_online_scraper.utils.file_format import ImageStorage
+from matricula_online_scraper.utils.register_scheduler import (
+    DEFAULT_MAX_PAGES,
+    DEFAULT_MAX_REGISTERS,
+    RegisterScheduler,
+)
 
 logger = get_logger(__name__)
 
@@ -120,8 +153,287 @@ def _extract_last_path_segment(image_url: str) -> str:
     return match.group(1)
 
 
-class CustomImagesPipeline(ImagesPipeline):
-    """Custom image pipelines to store images in a structured way (= custom paths)."""
+VALIDATORS = ("etag", "last_modified", "content_length")
+"""Keys of the response validators recorded in the journal for each page."""
+
+
+def _validators(response: Response, size: int) -> dict[str, Any]:
+    """Return the validators of a response, `size` is the length of its body."""
+    validators: dict[str, Any] = {}
+    if etag := response.headers.get("ETag"):
+        validators["etag"] = etag.decode("latin-1")
+    if last_modified := response.headers.get("Last-Modified"):
+        validators["last_modified"] = last_modified.decode("latin-1")
+    try:
+        validators["content_length"] = int(response.headers["Content-Length"])
+    except (KeyError, ValueError):
+        # not passed on by all download handlers
+        validators["content_length"] = size
+    return validators
+
+
+page_stored = object()
+"""Signal sent for each page that was stored or found up to date on disk.
+
+Sent with `path` (relative to `IMAGES_STORE`), `source` (absolute path on disk) and
+`spider`. Handlers may return a Deferred to delay the pipeline, e.g. to apply
+backpressure, see `PostProcessingPipeline`.
+"""
+
+
+class ContentAddressedFilesStore(FSFilesStore):
+    """Files store that saves the bytes of identical images only once.
+
+    Selected with the `cas://` scheme, e.g. `IMAGES_STORE = "cas:///path/to/images"`.
+    Files are hardlinked from the usual paths to objects named by their content,
+    see `ContentStore`.
+    """
+
+    def __init__(self, basedir):  # noqa: D107
+        super().__init__(basedir)
+        self.content = ContentStore(Path(self.basedir))
+
+    def persist_file(self, path, buf, info, meta=None, headers=None):
+        """Store the file once by its content and link it to `path`."""
+        data = buf.getvalue()
+        is_new = self.content.add(path, data)
+        stats = info.spider.crawler.stats
+        if is_new:
+            stats.inc_value("dedupe/new_images")
+        else:
+            stats.inc_value("dedupe/duplicate_images")
+            stats.inc_value("dedupe/saved_bytes", len(data))
+
+
+class RegisterPipelineMixin:
+    """Behavior shared by all pipelines that store the pages of a register.
+
+    Stores images in a structured way (= custom paths) and, if the spider has a `journal`
+    (see `DownloadJournal`), records every page that was downloaded, found up-to-date
+    on disk or failed in it.
+
+    Also sends the `page_stored` signal for each page that is stored on disk.
+
+    Items (= registers) are processed as admitted by a `RegisterScheduler`, configured by
+    the settings `IMAGES_MAX_ACTIVE_REGISTERS`, `IMAGES_MAX_PAGES_PER_REGISTER` and
+    `IMAGES_LARGEST_REGISTERS_FIRST`.
+
+    Must precede a subclass of Scrapy's `FilesPipeline` in the MRO.
+    """
+
+    STORE_SCHEMES = {**FilesPipeline.STORE_SCHEMES, "cas": ContentAddressedFilesStore}
+
+    @cached_property
+    def registers(self) -> RegisterScheduler:
+        """Scheduler of the registers, see `RegisterScheduler`."""
+        settings = self.spiderinfo.spider.crawler.settings
+        return RegisterScheduler(
+            max_registers=settings.getint(
+                "IMAGES_MAX_ACTIVE_REGISTERS", DEFAULT_MAX_REGISTERS
+            ),
+            max_pages=settings.getint(
+                "IMAGES_MAX_PAGES_PER_REGISTER", DEFAULT_MAX_PAGES
+            ),
+            largest_first=settings.getbool("IMAGES_LARGEST_REGISTERS_FIRST"),
+        )
+
+    @cached_property
+    def _page_limiters(self) -> dict[int, DeferredSemaphore]:
+        # by `id()` of the items that are being processed
+        return {}
+
+    async def process_item(self, item, spider=None):
+        """Process the register once the scheduler admits it."""
+        pages = len(item["image_urls"])
+        admitted = self.registers.admit(pages)
+        if not admitted.called:
+            logger.debug(
+                f"Waiting to download {item['original_url']}"
+                f" ({self.registers.waiting} registers waiting)"
+            )
+        # the limiter of the pages of this register, see `get_media_requests`
+        self._page_limiters[id(item)] = await maybe_deferred_to_future(admitted)
+        try:
+            # Scrapy < 2.13 requires the spider, later versions deprecate it
+            args = () if spider is None else (spider,)
+            result = deferred_from_coro(super().process_item(item, *args))
+            result = await maybe_deferred_to_future(result)
+        finally:
+            del self._page_limiters[id(item)]
+            self.registers.finish()
+        # a failure is logged by Scrapy's scraper, with the item
+        logger.info(f"Processed {pages} pages of {item['original_url']}")
+        return result
+
+    def get_media_requests(self, item, info):
+        """Attach the register's URL and page limiter to each request."""
+        requests = super().get_media_requests(item, info)
+        limiter = self._page_limiters.get(id(item))
+        for request in requests:
+            # `media_failed` has no access to the item, so pass the URL along
+            request.meta["original_url"] = item["original_url"]
+            request.meta["page_limiter"] = limiter
+        return requests
+
+    def _acquire_page(self, request: Request) -> Deferred:
+        """Wait until the page's register may download another page."""
+        limiter = request.meta.get("page_limiter")
+        if limiter is None:
+            return succeed(None)
+        request.meta["page_slot"] = limiter
+        return limiter.acquire().addCallback(lambda _: None)
+
+    def _release_page(self, request: Request) -> None:
+        """Let the page's register download another page. Safe to call more than once."""
+        limiter = request.meta.pop("page_slot", None)
+        if limiter is not None:
+            limiter.release()
+
+    def media_to_download(self, request, info, *, item=None):
+        """Record pages that are already on disk and up to date as completed.
+
+        Pages that are on disk, but need to be downloaded again, are requested
+        conditionally if the journal has their validators. Waits until the page's
+        register may download another page.
+        """
+        media_to_download = super().media_to_download
+        dfd = self._acquire_page(request)
+        dfd.addCallback(lambda _: media_to_download(request, info, item=item))
+
+        def skip_download(result):
+            if result is not None:  # incl. failures, nothing is downloaded
+                self._release_page(request)
+            return result
+
+        dfd.addCallback(self._make_conditional, request, info, item)
+        dfd.addBoth(skip_download)
+        dfd.addCallback(self._journal_completed, request, info)
+        return dfd.addCallback(self._page_stored, info)
+
+    def media_downloaded(self, response, request, info, *, item=None):
+        """Record downloaded pages as completed and unsuccessful ones as failed."""
+        self._release_page(request)
+        if response.status == 304 and "revalidate" in request.meta:
+            dfd = maybeDeferred(self._not_modified, response, request, info)
+        else:
+            request.meta["validators"] = _validators(response, len(response.body))
+            dfd = maybeDeferred(
+                super().media_downloaded, response, request, info, item=item
+            )
+        dfd.addCallback(self._journal_completed, request, info)
+        dfd.addCallback(self._page_stored, info)
+        dfd.addErrback(self._journal_failed, request, info)
+        return dfd
+
+    def media_failed(self, failure, request, info):
+        """Record pages that could not be downloaded at all as failed."""
+        self._release_page(request)
+        self._journal_failed(failure, request, info)
+        return super().media_failed(failure, request, info)
+
+    def _recorded(self, request: Request, info) -> dict[str, Any] | None:
+        """Return the metadata of a page that the journal lists as completed."""
+        journal = getattr(info.spider, "journal", None)
+        progress = journal and journal.get(request.meta["original_url"])
+        return progress.completed.get(request.url) if progress else None
+
+    def _make_conditional(
+        self, result: dict | None, request: Request, info, item
+    ) -> dict | None:
+        if result is not None or not isinstance(self.store, FSFilesStore):
+            return result
+        recorded = self._recorded(request, info)
+        if not recorded or not ("etag" in recorded or "last_modified" in recorded):
+            return None
+        path = self.file_path(request, info=info, item=item)
+        try:
+            size = self.store._get_filesystem_path(path).stat().st_size
+        except OSError:
+            return None
+        # only if the page on disk is intact, otherwise it is downloaded entirely
+        if recorded.get("path") != path or recorded.get("size") != size:
+            return None
+
+        if "etag" in recorded:
+            request.headers["If-None-Match"] = recorded["etag"]
+        if "last_modified" in recorded:
+            request.headers["If-Modified-Since"] = recorded["last_modified"]
+        request.meta["revalidate"] = recorded
+        info.spider.crawler.stats.inc_value("revalidation/requests")
+        return None
+
+    def _not_modified(self, response: Response, request: Request, info) -> dict:
+        """Keep the page on disk, the server confirmed that it did not change."""
+        recorded = request.meta["revalidate"]
+        validators = {key: recorded[key] for key in VALIDATORS if key in recorded}
+        # a 304 response may update the validators
+        validators.update(
+            {
+                key: value
+                for key, value in _validators(response, 0).items()
+                if key != "content_length"
+            }
+        )
+        request.meta["validators"] = validators
+        # the page is fresh again, do not revalidate it before `IMAGES_EXPIRES`
+        os.utime(self.store._get_filesystem_path(recorded["path"]))
+        logger.debug(f"Page {request.url} was not modified")
+        self._inc_stats(info, "revalidated")
+        return {
+            "url": request.url,
+            "path": recorded["path"],
+            "checksum": recorded["checksum"],
+            "status": "uptodate",
+        }
+
+    def _inc_stats(self, info, status: str) -> None:
+        # like `FilesPipeline.inc_stats`, whose signature differs between Scrapy versions
+        stats = info.spider.crawler.stats
+        stats.inc_value("file_count")
+        stats.inc_value(f"file_status_count/{status}")
+
+    def _journal_completed(self, result: dict | None, request: Request, info) -> Any:
+        journal = getattr(info.spider, "journal", None)
+        if journal is not None and result is not None:
+            metadata = {"path": result["path"], "checksum": result["checksum"]}
+            if isinstance(self.store, FSFilesStore):
+                # recorded for `parish verify`
+                path = self.store._get_filesystem_path(result["path"])
+                metadata["size"] = path.stat().st_size
+            validators = request.meta.get("validators")
+            if validators is None:
+                # up to date on disk without a request, keep the recorded validators
+                recorded = self._recorded(request, info) or {}
+                validators = {k: recorded[k] for k in VALIDATORS if k in recorded}
+            journal.mark_completed(
+                request.meta["original_url"], request.url, **metadata, **validators
+            )
+        return result
+
+    def _page_stored(self, result: dict | None, info) -> Any:
+        if result is None or not isinstance(self.store, FSFilesStore):
+            return result
+        # NOTE: deprecated by Scrapy 2.14, but its replacement `send_catch_log_async`
+        # does not exist in the versions supported, see `pyproject.toml`
+        dfd = info.spider.crawler.signals.send_catch_log_deferred(
+            page_stored,
+            path=result["path"],
+            source=self.store._get_filesystem_path(result["path"]),
+            spider=info.spider,
+        )
+        return dfd.addCallback(lambda _: result)
+
+    def _journal_failed(self, failure: Failure, request: Request, info) -> Failure:
+        journal = getattr(info.spider, "journal", None)
+        # depending on Scrapy's version, a failure in `media_downloaded` is also
+        # passed to `media_failed`, hence avoid recording it twice
+        if request.meta.get("journal_failed"):
+            return failure
+        request.meta["journal_failed"] = True
+        info.spider.crawler.stats.inc_value("file_status_count/failed")
+        if journal is not None:
+            journal.mark_failed(request.meta["original_url"], request.url)
+        return failure
 
     def file_path(
         self,
@@ -150,3 +462,220 @@ class CustomImagesPipeline(ImagesPipeline):
         page = _extract_last_path_segment(request.url)
 
         return f"{path}/{page}_{url_hash}.jpg"
+
+
+class CustomImagesPipeline(RegisterPipelineMixin, ImagesPipeline):
+    """Custom image pipeline to store images in a structured way (= custom paths).
+
+    Each image is decoded with Pillow and, if needed, converted to RGB and re-encoded
+    as JPEG before it is stored.
+    """
+
+
+class RawImagesPipeline(RegisterPipelineMixin, FilesPipeline):
+    """Custom image pipeline that stores images exactly as received.
+
+    Other than `CustomImagesPipeline`, images are not decoded, converted or
+    re-encoded with Pillow. This saves CPU time on the reactor thread and memory,
+    and keeps the original quality. Uses the same paths and settings
+    (e.g. `IMAGES_STORE`) as `CustomImagesPipeline`.
+    """
+
+    MEDIA_NAME = "image"
+    DEFAULT_FILES_URLS_FIELD = "image_urls"
+    DEFAULT_FILES_RESULT_FIELD = "images"
+
+    def __init__(self, store_uri, download_func=None, *, crawler):  # noqa: D107
+        super().__init__(store_uri, crawler=crawler)
+        self.expires = crawler.settings.getint("IMAGES_EXPIRES", self.EXPIRES)
+        # stream bodies straight to disk, see `SpoolingDownloaderMiddleware`
+        # (not possible when deduplicating, the content is only known once downloaded)
+        self.spool = (
+            crawler.settings.getbool("IMAGES_SPOOL")
+            and isinstance(self.store, FSFilesStore)
+            and not isinstance(self.store, ContentAddressedFilesStore)
+        )
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Create the pipeline from the `IMAGES_STORE` setting instead of `FILES_STORE`."""
+        cls._update_stores(crawler.settings)
+        return cls(crawler.settings["IMAGES_STORE"], crawler=crawler)
+
+    def get_media_requests(self, item, info):
+        """Tell `SpoolingDownloaderMiddleware` where to write each image, if enabled."""
+        requests = super().get_media_requests(item, info)
+        if self.spool:
+            for request in requests:
+                path = self.file_path(request, info=info, item=item)
+                request.meta["spool_path"] = str(self.store._get_filesystem_path(path))
+        return requests
+
+    def media_downloaded(self, response, request, info, *, item=None):
+        """Skip storing the body of responses that were already written to disk."""
+        if "spooled" not in response.flags:
+            return super().media_downloaded(response, request, info, item=item)
+
+        self._release_page(request)
+        self._inc_stats(info, "downloaded")
+        request.meta["validators"] = _validators(response, request.meta["spool_size"])
+        result = {
+            "url": request.url,
+            "path": self.file_path(request, response=response, info=info, item=item),
+            "checksum": request.meta["spool_checksum"],
+            "status": "downloaded",
+        }
+        return self._page_stored(self._journal_completed(result, request, info), info)
+
+
+@dataclass
+class _RegisterArchive:
+    """Archive of a register that is being written by `ArchiveImagesPipeline`."""
+
+    path: Path
+    items: int = 0
+    """Number of items of the register whose pages are still being downloaded."""
+    writer: ArchiveWriter | None = None
+    """Created with the first page that was downloaded."""
+    completed: list[dict] = field(default_factory=list)
+    """Pages to record as completed in the journal once the archive is complete."""
+
+
+class ArchiveImagesPipeline(RawImagesPipeline):
+    """Custom image pipeline that stores all pages of a register in one archive.
+
+    The format is chosen by the `IMAGES_STORAGE` setting ('zip', 'cbz' or 'pdf'),
+    see `matricula_online_scraper.utils.archive_writer`. Each image is appended to its
+    register's archive as soon as it was downloaded, without being decoded or written
+    to disk as a file of its own. The archive is completed once all pages of its
+    register were downloaded, or when the spider closes.
+
+    Pages are recorded as completed in the journal only after their archive was
+    completed, so that resuming an interrupted download never skips pages that
+    are missing from an archive.
+    """
+
+    def __init__(self, store_uri, download_func=None, *, crawler):  # noqa: D107
+        super().__init__(store_uri, crawler=crawler)
+        if type(self.store) is not FSFilesStore:
+            raise ValueError(
+                f"Archives can only be stored on the local filesystem, not in {store_uri}."
+            )
+        # pages are appended to the archive from memory
+        self.spool = False
+        storage = ImageStorage(crawler.settings.get("IMAGES_STORAGE", ImageStorage.ZIP))
+        self.writer_class = WRITERS[storage.value]
+        self.archives: dict[Path, _RegisterArchive] = {}
+
+    def _archive_name(self, original_url: str) -> str:
+        """Return the path of a register's archive relative to `IMAGES_STORE`."""
+        try:
+            path = _extract_unique_id(original_url)
+        except ValueError as e:
+            logger.exception(f"Could not decompose URL {original_url}: {e}")
+            path = Path("unknown")
+        return f"{path.as_posix()}{self.writer_class.suffix}"
+
+    def _archive(self, original_url: str) -> _RegisterArchive:
+        path = self.store._get_filesystem_path(self._archive_name(original_url))
+        if path not in self.archives:
+            self.archives[path] = _RegisterArchive(path)
+        return self.archives[path]
+
+    def get_media_requests(self, item, info):
+        """Attach the page number and label to each request, see `ArchiveWriter.add`."""
+        requests = super().get_media_requests(item, info)
+        pages = item.get("pages") or range(1, len(requests) + 1)
+        labels = item.get("labels") or [None] * len(requests)
+        for request, page, label in zip(requests, pages, labels):
+            request.meta["page"] = page
+            request.meta["label"] = label
+        self._archive(item["original_url"]).items += 1
+        return requests
+
+    def media_to_download(self, request, info, *, item=None):
+        """Download every page, the archive cannot be checked for up-to-date pages."""
+        return self._acquire_page(request)
+
+    def file_path(
+        self,
+        request: Request,
+        response: Response | None = None,
+        info=None,
+        *,
+        item: Item | None = None,
+    ):
+        """Get the path of the archive and the name of the page in it."""
+        original_url = request.meta["original_url"]
+        name = entry_name(request.meta["page"], request.meta["label"])
+        return f"{self._archive_name(original_url)}/{name}"
+
+    def file_downloaded(self, response, request, info, *, item=None):
+        """Append the page to its register's archive instead of storing it as a file."""
+        archive = self._archive(request.meta["original_url"])
+        if archive.writer is None:
+            archive.writer = self.writer_class(archive.path)
+        archive.writer.add(request.meta["page"], request.meta["label"], response.body)
+        request.meta["size"] = len(response.body)
+        return hashlib.md5(response.body).hexdigest()  # noqa: S324
+
+    def _journal_completed(self, result: dict | None, request: Request, info) -> Any:
+        if result is not None:
+            # recorded when the archive is complete, see `_close_archive`
+            self._archive(request.meta["original_url"]).completed.append(
+                {
+                    "original_url": request.meta["original_url"],
+                    "url": request.url,
+                    "path": result["path"],
+                    "checksum": result["checksum"],
+                    "size": request.meta["size"],
+                }
+            )
+        return result
+
+    def _page_stored(self, result: dict | None, info) -> Any:
+        # pages are not stored as files of their own
+        return result
+
+    def item_completed(self, results, item, info):
+        """Complete the register's archive once all of its items were processed."""
+        archive = self._archive(item["original_url"])
+        archive.items -= 1
+        if archive.items <= 0:
+            self._close_archive(archive, getattr(info.spider, "journal", None))
+        return super().item_completed(results, item, info)
+
+    def close_spider(self, spider=None):
+        """Complete the archives of registers that were not entirely downloaded."""
+        journal = getattr(spider or self.spiderinfo.spider, "journal", None)
+        for archive in list(self.archives.values()):
+            self._close_archive(archive, journal)
+
+    def _close_archive(self, archive: _RegisterArchive, journal) -> None:
+        del self.archives[archive.path]
+        if archive.writer is None:
+            return  # no page was downloaded
+
+        try:
+            archive.writer.close()
+        except Exception as e:
+            logger.exception(f"Could not complete archive {archive.path}: {e}")
+            archive.writer.abort()
+            if journal is not None:
+                for page in archive.completed:
+                    journal.mark_failed(page["original_url"], page["url"])
+            return
+
+        logger.info(
+            f"Stored {len(archive.completed)} pages in {archive.path}"
+            f" ({len(archive.writer.labels)} pages in total)"
+        )
+        if journal is not None:
+            for page in archive.completed:
+                journal.mark_completed(
+                    page["original_url"],
+                    page["url"],
+                    path=page["path"],
+                    checksum=page["checksum"],
+                    size=page["size"],
+                )
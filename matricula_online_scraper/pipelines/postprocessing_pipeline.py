@@ -0,0 +1,139 @@
+"""Pipeline that creates derivatives (grayscale, thumbnails, WebP, AVIF) of downloaded scans.
+
+Runs after the pipeline that stores the images. Each page is sent to a pool of worker
+processes as soon as it was stored (see the `page_stored` signal), so CPU-bound work
+overlaps with downloading and every scan is read from disk once, while it is most
+likely still in the page cache.
+
+The number of pages that are waiting for or being processed by the pool is bounded.
+When the pool is saturated, the image pipeline waits before it passes on further pages,
+which slows down downloading instead of queueing an unbounded amount of work.
+
+Settings:
+- `POSTPROCESS_TRANSFORMS` (str): Transforms to apply, e.g. `"grayscale,thumbnail:512,webp"`,
+  see `matricula_online_scraper.utils.image_transforms`. Disabled if empty.
+- `POSTPROCESS_STORE` (str): Directory of the derivatives, one subdirectory per transform.
+  Defaults to `derivatives` inside `IMAGES_STORE`.
+- `POSTPROCESS_WORKERS` (int): Number of worker processes. Defaults to the number of CPUs.
+- `POSTPROCESS_MAX_PENDING` (int): Maximum number of pages submitted to the pool at once.
+  Defaults to twice the number of workers.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+from scrapy.exceptions import NotConfigured
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, DeferredList, DeferredSemaphore
+
+from matricula_online_scraper.logging_config import get_logger
+from matricula_online_scraper.pipelines.images_pipeline import page_stored
+from matricula_online_scraper.utils.image_transforms import (
+    Transform,
+    apply_transforms,
+    parse_transforms,
+)
+
+logger = get_logger(__name__)
+
+
+class PostProcessingPipeline:
+    """Applies `POSTPROCESS_TRANSFORMS` to each stored page in a bounded process pool."""
+
+    def __init__(  # noqa: D107
+        self,
+        transforms: list[Transform],
+        store: Path,
+        workers: int,
+        max_pending: int,
+        stats,
+    ):
+        self.transforms = transforms
+        self.store = store
+        self.workers = workers
+        self.stats = stats
+        self.semaphore = DeferredSemaphore(max_pending)
+        self.pending: set[Deferred] = set()
+        self.pool: ProcessPoolExecutor | None = None
+
+    @classmethod
+    def from_crawler(cls, crawler):  # noqa: D102
+        settings = crawler.settings
+        spec = settings.get("POSTPROCESS_TRANSFORMS")
+        if not spec:
+            raise NotConfigured
+        store = settings.get("POSTPROCESS_STORE")
+        if not store:
+            images_store = str(settings.get("IMAGES_STORE"))
+            # e.g. `cas://`, see `ContentAddressedFilesStore`
+            images_store = images_store.split("://", 1)[-1]
+            store = Path(images_store, "derivatives")
+        workers = settings.getint("POSTPROCESS_WORKERS") or os.cpu_count() or 1
+
+        pipeline = cls(
+            transforms=parse_transforms(spec),
+            store=Path(store),
+            workers=workers,
+            max_pending=settings.getint("POSTPROCESS_MAX_PENDING") or 2 * workers,
+            stats=crawler.stats,
+        )
+        crawler.signals.connect(pipeline.page_stored, signal=page_stored)
+        return pipeline
+
+    def open_spider(self, spider=None):  # noqa: D102
+        # "spawn" instead of "fork", the reactor's threads must not be forked
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.debug(
+            f"Post-processing with {self.workers} workers: {', '.join(map(str, self.transforms))}"
+        )
+
+    def process_item(self, item, spider=None):  # noqa: D102
+        # pages are processed as soon as they are stored, see `page_stored`
+        return item
+
+    def page_stored(self, path: str, source: Path, spider=None) -> Deferred | None:
+        """Submit a page to the pool, the Deferred fires once the pool accepted it."""
+        outputs = [(t, t.output_path(self.store, path)) for t in self.transforms]
+        if all(output.exists() for _, output in outputs):
+            self.stats.inc_value("postprocess/skipped")
+            return None
+        return self.semaphore.acquire().addCallback(self._submit, source, outputs)
+
+    def _submit(self, _, source: Path, outputs: list[tuple[Transform, Path]]) -> None:
+        assert self.pool is not None
+        done = Deferred()
+        self.pending.add(done)
+        future = self.pool.submit(apply_transforms, str(source), outputs)
+        # called from one of the pool's threads
+        future.add_done_callback(
+            lambda f: reactor.callFromThread(self._done, f, done, source)  # type: ignore
+        )
+
+    def _done(self, future: Future, done: Deferred, source: Path) -> None:
+        self.semaphore.release()
+        self.pending.discard(done)
+        try:
+            created = future.result()
+        except Exception as e:
+            self.stats.inc_value("postprocess/errors")
+            logger.error(f"Could not post-process {source}: {e!r}")
+        else:
+            self.stats.inc_value("postprocess/pages")
+            self.stats.inc_value("postprocess/derivatives", len(created))
+        done.callback(None)
+
+    def close_spider(self, spider=None):
+        """Wait for the pages that are still being processed and stop the pool."""
+        if self.pool is None:
+            return None
+
+        def shutdown(result):
+            self.pool.shutdown()
+            return result
+
+        return DeferredList(list(self.pending)).addBoth(shutdown)
@@ -4,10 +4,22 @@ import base64
 import json
 import logging
 import re
+from dataclasses import dataclass
 
 import scrapy
 from rich import console
 
+from matricula_online_scraper.spiders.utils import extract_register_pages
+from matricula_online_scraper.utils.archive_writer import WRITERS
+from matricula_online_scraper.utils.download_journal import (
+    DownloadJournal,
+    register_key,
+)
+from matricula_online_scraper.utils.file_format import ImageStorage
+from matricula_online_scraper.utils.matricula_url import ParishRegisterURL
+from matricula_online_scraper.utils.page_selection import PageSelection
+from matricula_online_scraper.utils.url_feed import UrlFeedSpiderMixin
+
 stderr = console.Console(stderr=True)
 logger = logging.getLogger(__name__)
 
@@ -20,9 +32,26 @@ class ChurchRegisterDownloadItem(scrapy.Item):
     images = scrapy.Field()
     # --- custom fields ---
     original_url = scrapy.Field()
+    # page numbers (starting at 1) and labels of the images, in the same order as `image_urls`
+    pages = scrapy.Field()
+    labels = scrapy.Field()
+
+
+@dataclass
+class ChurchRegisterPage:
+    """A single page of a church register, yielded instead of downloading it with `IMAGES_PLAN_ONLY`."""
+
+    register: str
+    """URL of the register, without `?pg=`."""
+    page_index: int
+    """Position of the page in the register, starting at 1 like `?pg=`."""
+    label: str | None
+    """Label of the page as shown in Matricula's viewer, usually the page number."""
+    image_url: str
+    """Decoded URL of the scanned image."""
 
 
-class ChurchRegisterSpider(scrapy.Spider):
+class ChurchRegisterSpider(UrlFeedSpiderMixin, scrapy.Spider):
     """Scrapy spider to scrape church registers (= scanned church books) from Matricula Online."""
 
     name = "church_register"
@@ -30,15 +59,72 @@ class ChurchRegisterSpider(scrapy.Spider):
     custom_settings = {
         # see the order of middleware here:  https://doc.scrapy.org/en/latest/topics/settings.html#std-setting-SPIDER_MIDDLEWARES_BASE
         # 51 is right after the built-in middleware `HttpErrorMiddleware` which handles 404s
-        "ITEM_PIPELINES": {
-            "matricula_online_scraper.pipelines.images_pipeline.CustomImagesPipeline": 1
-        },
+        # NOTE: "ITEM_PIPELINES" is set in `update_settings` depending on "IMAGES_STORAGE"
+        # and "IMAGES_PLAN_ONLY"
         # TODO: inject through settings object
         "SPIDER_MIDDLEWARES": {
             "matricula_online_scraper.middlewares.custom_http_error.HTTPErrorLoggingMiddleware": 49
         },
+        "DOWNLOADER_MIDDLEWARES": {
+            # only enabled with "AUTOTUNE_ENABLED", sees responses before they are retried (550)
+            "matricula_online_scraper.middlewares.autotune.AutotuneDownloaderMiddleware": 560,
+            # only enabled with "IMAGES_SPOOL", runs after all built-in middlewares (e.g. proxy, stats)
+            "matricula_online_scraper.middlewares.spooling.SpoolingDownloaderMiddleware": 950,
+        },
     }
 
+    @classmethod
+    def update_settings(cls, settings):
+        super().update_settings(settings)
+        # custom setting to only yield the pages of each register, e.g. set by `parish fetch --plan`
+        if settings.getbool("IMAGES_PLAN_ONLY"):
+            settings.set("ITEM_PIPELINES", {}, priority="spider")
+            return
+        # custom setting to choose how images are stored, e.g. set by `parish fetch --storage`
+        storage = ImageStorage(settings.get("IMAGES_STORAGE", ImageStorage.REENCODE))
+        settings.set(
+            "ITEM_PIPELINES",
+            {
+                storage.to_pipeline(): 1,
+                # only enabled with "POSTPROCESS_TRANSFORMS", handles the pages stored by the above
+                "matricula_online_scraper.pipelines.postprocessing_pipeline.PostProcessingPipeline": 2,
+            },
+            priority="spider",
+        )
+
+    def __init__(
+        self,
+        journal: DownloadJournal | None = None,
+        resume: bool = False,
+        pages: PageSelection | None = None,
+        single_page: bool = False,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        # records the progress of each register, see `CustomImagesPipeline`
+        self.journal = journal
+        # only request pages that the journal does not list as completed
+        self.resume = resume
+        # only request these pages of each register, all if None
+        self.pages = pages
+        # only request the page given by `?pg=` in each register's URL
+        self.single_page = single_page
+
+    def _selected_pages(self, url: str, count: int) -> list[int]:
+        """Return the pages (starting at 1) of a register with `count` pages to download."""
+        selection = self.pages
+        if self.single_page:
+            selection = PageSelection.single(ParishRegisterURL(url).register_page or 1)
+        if selection is None:
+            return list(range(1, count + 1))
+
+        selected = selection.select(count)
+        if not selected:
+            self.logger.warning(
+                f"None of the pages {selection} exist in {url}, which has {count} pages."
+            )
+        return selected
+
     def parse(self, response):
         # Note: a "church register url" like https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/KB+001/?pg=1
         # leads to a page where the image with some page number is embedded in a canvas. The user can navigate to the next page,
@@ -51,6 +137,75 @@ class ChurchRegisterSpider(scrapy.Spider):
 
         # self.pipeline_observer.mark_as_started(response.url)
 
+        # fast path: find and decode the variable in the raw bytes without building a DOM
+        pages = extract_register_pages(response.body)
+        if pages is None:
+            self.logger.debug(
+                f"Fast extraction of 'dv1' failed for {response.url}, parsing the DOM instead."
+            )
+            pages = self._extract_pages_from_dom(response)
+            if pages is None:
+                return
+        labels, files = pages
+        selected = self._selected_pages(response.url, len(files))
+
+        if self.settings.getbool("IMAGES_PLAN_ONLY"):
+            register = register_key(response.url)
+            for page in selected:
+                yield ChurchRegisterPage(
+                    register=register,
+                    page_index=page,
+                    label=labels[page - 1] if page <= len(labels) else None,
+                    image_url=files[page - 1],
+                )
+            return
+
+        # if len(files) > 0:
+        #     for file, label in zip(files, labels):
+        #         self.pipeline_observer.observe(file, label, initiator=response.url)
+        #     self.pipeline_observer.mark_as_in_process(response.url)
+
+        if not selected:
+            return
+
+        if self.journal is not None:
+            # the journal always knows all pages of a register
+            progress = self.journal.register(response.url, files)
+            if self.resume:
+                missing = [
+                    page
+                    for page in selected
+                    if files[page - 1] not in progress.completed
+                ]
+                if not missing:
+                    self.logger.info(
+                        f"All pages of {response.url} were already downloaded. Skipping."
+                    )
+                    return
+                self.logger.info(
+                    f"Resuming {response.url}: {len(missing)} of {len(selected)} pages missing."
+                )
+                # an archive that cannot be appended to, e.g. a PDF, is rebuilt from
+                # all selected pages
+                storage = self.settings.get("IMAGES_STORAGE", ImageStorage.REENCODE)
+                writer = WRITERS.get(ImageStorage(storage).value)
+                if writer is None or writer.can_append:
+                    selected = missing
+
+        yield ChurchRegisterDownloadItem(
+            image_urls=[files[page - 1] for page in selected],
+            original_url=response.url,
+            pages=selected,
+            labels=[
+                labels[page - 1] if page <= len(labels) else None for page in selected
+            ],
+        )
+
+    def _extract_pages_from_dom(self, response) -> tuple[list[str], list[str]] | None:
+        """Extract labels and image URLs from the `dv1` variable through the DOM.
+
+        Slower than `extract_register_pages`, but more lenient with malformed entries.
+        """
         # found in the last script tag in the body of the HTML
         dv1_var = response.xpath("//body/script[last()]/text()").get()
 
@@ -64,7 +219,7 @@ class ChurchRegisterSpider(scrapy.Spider):
             self.logger.error(
                 "Could not extract 'labels' and 'files' from JavaScript variable 'dv1'"
             )
-            return
+            return None
 
         labels = matches.group(1)
         labels = json.loads(labels)
@@ -87,15 +242,4 @@ class ChurchRegisterSpider(scrapy.Spider):
                 )
                 continue
 
-        # TODO: implement option `--dump-decoded-urls-only` to only output the decoded URLs and labels
-        # if dump_decoded_urls_only:
-        #     yield from (
-        #         {"label": label, "file": file} for label, file in zip(labels, files)
-        #     )
-
-        # if len(files) > 0:
-        #     for file, label in zip(files, labels):
-        #         self.pipeline_observer.observe(file, label, initiator=response.url)
-        #     self.pipeline_observer.mark_as_in_process(response.url)
-
-        yield ChurchRegisterDownloadItem(image_urls=files, original_url=response.url)
+        return labels, files
@@ -5,13 +5,14 @@ from typing import Optional
 from urllib.parse import parse_qs, urlencode, urljoin, urlparse, urlunparse
 
 import scrapy  # pylint: disable=import-error # type: ignore
+from scrapy.exceptions import CloseSpider
 from scrapy.http.response import Response
 
 from matricula_online_scraper.logging_config import get_logger
 from matricula_online_scraper.utils.matricula_datestring import (
     parse_matricula_datestr,
 )
-from matricula_online_scraper.utils.matricula_pagination import create_next_url
+from matricula_online_scraper.utils.matricula_pagination import PaginationSpiderMixin
 
 logger = get_logger(__name__)
 
@@ -19,7 +20,7 @@ logger = get_logger(__name__)
 HOST = "https://data.matricula-online.eu"
 
 
-class NewsfeedSpider(scrapy.Spider):
+class NewsfeedSpider(PaginationSpiderMixin, scrapy.Spider):
     """Scrapy spider to scrape Matricula Online's newsfeed."""
 
     name = "newsfeed"
@@ -28,6 +29,10 @@ class NewsfeedSpider(scrapy.Spider):
         "SPIDER_MIDDLEWARES": {
             "matricula_online_scraper.middlewares.custom_http_error.HTTPErrorLoggingMiddleware": 49
         },
+        # only enabled with "AUTOTUNE_ENABLED", sees responses before they are retried (550)
+        "DOWNLOADER_MIDDLEWARES": {
+            "matricula_online_scraper.middlewares.autotune.AutotuneDownloaderMiddleware": 560
+        },
     }
 
     def __init__(
@@ -35,26 +40,38 @@ class NewsfeedSpider(scrapy.Spider):
     ):
         super().__init__(**kwargs)
         self.start_urls = ["https://data.matricula-online.eu/en/nachrichten/"]
-        # TODO: this is not thread-safe (?), it seems to work though ... investigate
+        # number of articles yielded, in order, see `parse`
         self.counter = 0
 
         self.limit = limit
         self.last_n_days = last_n_days
 
-    def parse(self, response: Response):
+    def parse_page(self, response: Response):
         items = response.css('#page-main-content div[id^="news-"]')
 
         for news_article in items:
-            if self.limit is not None and self.counter >= self.limit:
-                self.close(self, reason=f"User set limit ({self.limit=}) reached")
-                break
-            self.counter += 1
-
             headline_container = news_article.css("h3")
             headline = (headline_container.css("a::text").get() or "").strip()
             article_url = headline_container.css("a::attr('href')").get()
             article_date_str = headline_container.css("small::text").get() or ""
+            preview = news_article.css("p.text-justify + p::text").get()
+
+            yield {
+                "headline": headline,
+                "date": article_date_str,
+                "preview": preview,
+                "url": urljoin(HOST, article_url),
+            }
 
+    def in_page_order(self, output):
+        # pages are requested at once, but their articles arrive here in order,
+        # i.e. the newest first, hence the limits are checked here
+        for article in output:
+            # may be reached already, if pages arrive while the spider is closed
+            if self.limit is not None and self.counter >= self.limit:
+                raise CloseSpider(f"User set limit ({self.limit=}) reached")
+
+            article_date_str = article["date"]
             try:
                 article_date = parse_matricula_datestr(article_date_str)
             except Exception as e:
@@ -62,7 +79,7 @@ class NewsfeedSpider(scrapy.Spider):
                     f"Failed to parse Matricula date string '{article_date_str}': {e}"
                 )
                 logger.exception(reason)
-                self.close(self, reason)
+                raise CloseSpider(reason) from e
             else:
                 # check if the article is older than the last_n_days
                 if (
@@ -75,27 +92,10 @@ class NewsfeedSpider(scrapy.Spider):
                         f" specified days (max={self.last_n_days}): {article_date_str}. Stopping."
                     )
                     logger.debug(reason)
-                    break
-
-            preview = news_article.css("p.text-justify + p::text").get()
+                    raise CloseSpider(reason)
 
-            yield {
-                "headline": headline,
-                "date": article_date_str,
-                "preview": preview,
-                "url": urljoin(HOST, article_url),
-            }
+            self.counter += 1
+            yield article
 
-        # queries the pagination component at the bottom of the page
-        # to find the next page, if it exists
-        next_page = response.css(
-            "ul.pagination li.page-item.active + li.page-item a.page-link::attr('href')"
-        ).get()
-
-        if next_page is not None:
-            # construct a valid url from that information
-            # next_page will be a url query parameter like '?page=2'
-            _, page = next_page.split("=")
-            next_url = create_next_url(response.url, page)
-            logger.debug(f"Next URL to scrape: {next_url}")
-            yield response.follow(next_url, self.parse)
+            if self.limit is not None and self.counter >= self.limit:
+                raise CloseSpider(f"User set limit ({self.limit=}) reached")
@@ -13,7 +13,8 @@ import scrapy.exceptions
 from scrapy.exceptions import CloseSpider
 from scrapy.http.response import Response
 
-from matricula_online_scraper.utils.matricula_pagination import create_next_url
+from matricula_online_scraper.utils.matricula_pagination import PaginationSpiderMixin
+from matricula_online_scraper.utils.url_feed import UrlFeedSpiderMixin
 from matricula_online_scraper.utils.user_console import UserConsole
 
 HOST = "https://data.matricula-online.eu"
@@ -53,7 +54,7 @@ class PlaceholderParish:
     """One or more URLs to some external resource."""
 
 
-class ParishSpider(scrapy.Spider):
+class ParishSpider(UrlFeedSpiderMixin, PaginationSpiderMixin, scrapy.Spider):
     """Scrapy spider to scrape parish registers from a specific location from Matricula Online."""
 
     name = "parish_registers"
@@ -65,9 +66,13 @@ class ParishSpider(scrapy.Spider):
         "SPIDER_MIDDLEWARES": {
             "matricula_online_scraper.middlewares.custom_http_error.HTTPErrorLoggingMiddleware": 49
         },
+        # only enabled with "AUTOTUNE_ENABLED", sees responses before they are retried (550)
+        "DOWNLOADER_MIDDLEWARES": {
+            "matricula_online_scraper.middlewares.autotune.AutotuneDownloaderMiddleware": 560
+        },
     }
 
-    def parse(self, response: Response):
+    def parse_page(self, response: Response):
         items = response.css("div.table-responsive tr")
 
         # in some cases, a parish's page is left blank intentionally
@@ -137,14 +142,3 @@ class ParishSpider(scrapy.Spider):
                     date=date_range_str,
                     details=details,
                 )
-
-        next_page = response.css(
-            "ul.pagination li.page-item.active + li.page-item a.page-link::attr('href')"
-        ).get()
-
-        if next_page is not None:
-            # next_page will be a url query parameter like '?page=2'
-            _, page = next_page.split("=")
-            next_url = create_next_url(response.url, page)
-            self.logger.debug(f"## Next URL: {next_url}")
-            yield response.follow(next_url, self.parse)
@@ -8,6 +8,14 @@ from typing import NotRequired, Tuple, TypedDict
 from urllib.parse import urljoin
 
 import scrapy  # pylint: disable=import-error # type: ignore
+from scrapy import signals
+
+from matricula_online_scraper.utils.coordinates_cache import CoordinatesCache
+from matricula_online_scraper.utils.matricula_pagination import PaginationSpiderMixin
+from matricula_online_scraper.utils.parish_snapshot import (
+    COORDINATE_FIELDS,
+    is_unchanged,
+)
 
 from .utils import extract_coordinates
 
@@ -40,7 +48,7 @@ class ParishMetadata(TypedDict):
     """Longitude of the parish."""
 
 
-class ParishMetadataSpider(scrapy.Spider):
+class ParishMetadataSpider(PaginationSpiderMixin, scrapy.Spider):
     """Scrapy spider to scrape available parishes from Matricula Online."""
 
     name = "parishes"
@@ -49,8 +57,15 @@ class ParishMetadataSpider(scrapy.Spider):
         "SPIDER_MIDDLEWARES": {
             "matricula_online_scraper.middlewares.custom_http_error.HTTPErrorLoggingMiddleware": 49
         },
+        # only enabled with "AUTOTUNE_ENABLED", sees responses before they are retried (550)
+        "DOWNLOADER_MIDDLEWARES": {
+            "matricula_online_scraper.middlewares.autotune.AutotuneDownloaderMiddleware": 560
+        },
     }
 
+    coordinates_cache: CoordinatesCache | None = None
+    """Enabled with the `COORDINATES_CACHE_ENABLED` setting."""
+
     def __init__(
         self,
         place: str,
@@ -58,6 +73,7 @@ class ParishMetadataSpider(scrapy.Spider):
         date_filter: bool,
         date_range: Tuple[int, int],
         include_coordinates: bool,
+        snapshot: dict[str, ParishMetadata] | None = None,
         **kwargs,
     ):
         super().__init__(**kwargs)
@@ -69,6 +85,8 @@ class ParishMetadataSpider(scrapy.Spider):
         self.date_range = date_range
 
         self.include_coordinates = include_coordinates
+        # parishes of a previous run, whose coordinates are reused if unchanged
+        self.snapshot = snapshot or {}
 
         # start URL to begin iteration from
         self.start_urls = [
@@ -83,7 +101,26 @@ class ParishMetadataSpider(scrapy.Spider):
 
         self.logger.debug(f"Start urls: {self.start_urls}")
 
-    def parse(self, response):
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):  # noqa: D102
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        if spider.include_coordinates and crawler.settings.getbool(
+            "COORDINATES_CACHE_ENABLED"
+        ):
+            spider.coordinates_cache = CoordinatesCache.from_settings(crawler.settings)
+            crawler.signals.connect(
+                spider._close_coordinates_cache, signal=signals.spider_closed
+            )
+        return spider
+
+    def _close_coordinates_cache(self, spider) -> None:
+        assert self.coordinates_cache is not None
+        self.logger.debug(
+            f"Coordinates of {self.coordinates_cache.hits} parishes were cached"
+        )
+        self.coordinates_cache.close()
+
+    def parse_page(self, response):
         # iterate over each parish in the result table
         for parish in response.css("div.results a.list-group-item"):
             # extract the parish information
@@ -107,22 +144,25 @@ class ParishMetadataSpider(scrapy.Spider):
                 "url": url,
             }
 
-            if self.include_coordinates:
+            known = self.snapshot.get(url)
+            if not self.include_coordinates:
+                # export information
+                yield export
+            elif is_unchanged(export, known) and all(
+                key in known  # type: ignore
+                for key in COORDINATE_FIELDS
+            ):
+                # the search result did not change since the snapshot, so neither did
+                # the coordinates (most likely), reuse them to save a request
+                yield export | {key: known[key] for key in COORDINATE_FIELDS}  # type: ignore
+            elif self.coordinates_cache is not None and (
+                (cached := self.coordinates_cache.get(url)) is not None
+            ):
+                yield export | cached
+            else:
                 yield scrapy.Request(
                     url=url, callback=self.parse_coordinates, meta={"data": export}
                 )
-            else:
-                # export information
-                yield export
-
-        # build next URL to scrape, retrieve from pagination element if available
-        next_page = response.css(
-            "ul.pagination li.page-item.active + li.page-item a.page-link::attr('href')"
-        ).get()
-
-        # stop iteration if no next page is available
-        if next_page is not None:
-            yield response.follow(urljoin(SCRAPE_ROUTE, next_page), self.parse)
 
     def parse_coordinates(self, response):
         data = response.meta["data"]
@@ -137,4 +177,9 @@ class ParishMetadataSpider(scrapy.Spider):
                     data["latitude"] = coordinates[1]
                     break
 
+        if self.coordinates_cache is not None:
+            self.coordinates_cache.put(
+                data["url"],
+                {key: data[key] for key in COORDINATE_FIELDS if key in data},
+            )
         yield data
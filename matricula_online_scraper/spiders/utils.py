@@ -1,5 +1,7 @@
 """Utilities for the spiders."""
 
+import binascii
+import json
 import re
 from typing import Tuple
 
@@ -22,3 +24,85 @@ def extract_coordinates(text: str) -> Coordinates | None:
     except Exception as _:
         return None
     return (longitutde, latitude)
+
+
+_DOC_VIEW = b"MatriculaDocView("
+_IMAGE_PREFIX = "/image/"
+_PADDING = ("", "", "==", "=")
+"""Padding of a base64 string by its length modulo 4 (1 is invalid and fails to decode)."""
+_json_decoder = json.JSONDecoder()
+
+
+def _json_array_after(text: str, key: str) -> list | None:
+    """Decode the JSON array that is the value of `key` in a JavaScript object literal."""
+    start = text.find(key)
+    if start < 0:
+        return None
+    bracket = text.find("[", start + len(key))
+    if bracket < 0 or text[start + len(key) : bracket].strip() != ":":
+        return None
+    value, _ = _json_decoder.raw_decode(text, bracket)
+    return value if isinstance(value, list) else None
+
+
+def decode_image_paths(files: list[str]) -> list[str] | None:
+    """Decode the paths `/image/<base64 encoded URL>/` of Matricula's viewer.
+
+    All paths are decoded in a single pass without handling errors per path: Either
+    all of them are valid or the register is left to the slower, more lenient path.
+
+    Returns:
+        list[str] | None: The decoded URLs, or None if any path is malformed.
+
+    Examples:
+    >>> decode_image_paths(["/image/aHR0cDovL2EuanBn/", "/image/aHR0cDovL2JjLmpwZw/"])
+    ['http://a.jpg', 'http://bc.jpg']
+    >>> decode_image_paths(["/img/aHR0cDovL2EuanBn/"]) is None
+    True
+    """
+    if not all(file.startswith(_IMAGE_PREFIX) and file.endswith("/") for file in files):
+        return None
+    # the paths have 8 characters besides the base64 string, so the length of the
+    # path modulo 4 is the same as the length of the unpadded base64 string modulo 4
+    try:
+        return [
+            binascii.a2b_base64(
+                file[7:-1] + _PADDING[len(file) % 4], strict_mode=True
+            ).decode("utf-8")
+            for file in files
+        ]
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def extract_register_pages(body: bytes) -> tuple[list[str], list[str]] | None:
+    """Extract the labels and image URLs of a register from its raw HTML.
+
+    Each register page embeds its pages in the JavaScript variable `dv1`:
+    `dv1 = new arc.imageview.MatriculaDocView("document", { "labels": […], "files": […] })`.
+    This locates the payload with a plain byte search and decodes both arrays as JSON,
+    without building a DOM.
+
+    Returns:
+        tuple[list[str], list[str]] | None: Labels and decoded image URLs, or None if the
+            payload could not be found or decoded.
+    """
+    start = body.rfind(_DOC_VIEW)
+    if start < 0:
+        return None
+    end = body.find(b"</script>", start)
+    try:
+        payload = body[start : end if end >= 0 else None].decode("utf-8")
+        labels = _json_array_after(payload, '"labels"')
+        files = _json_array_after(payload, '"files"')
+    except (UnicodeDecodeError, ValueError):
+        return None
+    if labels is None or files is None:
+        return None
+    if not all(isinstance(file, str) for file in files):
+        return None
+
+    urls = decode_image_paths(files)
+    if urls is None:
+        return None
+    return labels, urls
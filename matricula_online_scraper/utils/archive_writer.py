@@ -0,0 +1,393 @@
+"""Writers that collect the pages of a register in a single archive file.
+
+Instead of one file per page, `parish fetch --storage zip|cbz|pdf` stores each register
+as one archive. Pages are appended to the archive as soon as they were downloaded,
+in whatever order they arrive, and never touch the disk as loose files.
+
+While a register is being downloaded, its archive is written to `<archive>.part`.
+`close()` completes the archive (e.g. writes the ZIP's central directory or the PDF's
+page tree and cross-reference table) and renames it into place.
+
+- `ZipArchiveWriter`: ZIP with the unmodified JPEGs and an `index.json`
+- `CbzArchiveWriter`: the same, plus a `ComicInfo.xml` understood by comic book readers
+- `PdfArchiveWriter`: PDF that embeds the unmodified JPEGs (no re-encoding)
+
+Entries are named by their page number and label, e.g. `00012_7r.jpg`, and each
+archive has an index of the pages with their labels: `index.json` in ZIP/CBZ,
+an outline (bookmarks) and page labels in PDF.
+
+Example:
+>>> writer = ZipArchiveWriter(Path("KB+001.zip"))
+>>> writer.add(2, "1", jpeg_bytes)
+'00002_1.jpg'
+>>> writer.close()
+"""
+
+import json
+import os
+import re
+import zipfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+
+from matricula_online_scraper.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+INDEX_FILENAME = "index.json"
+"""Name of the index of pages inside ZIP and CBZ archives."""
+
+COMIC_INFO_FILENAME = "ComicInfo.xml"
+"""Name of the metadata file of CBZ archives."""
+
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}  # fmt: skip
+"""JPEG start of frame markers, i.e. C0-CF except DHT (C4), JPG (C8) and DAC (CC)."""
+STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}
+"""JPEG markers without a length: TEM and RST0-7."""
+
+
+@dataclass
+class JpegInfo:
+    """Properties of a JPEG image needed to embed it into a PDF."""
+
+    width: int
+    height: int
+    components: int
+    """1 (grayscale), 3 (YCbCr/RGB) or 4 (CMYK)."""
+    dpi: tuple[float, float] = (72.0, 72.0)
+    """Resolution from the JFIF header, 72 dpi if unknown."""
+
+
+def read_jpeg_info(data: bytes) -> JpegInfo:
+    """Read the size and color components of a JPEG image from its headers.
+
+    Raises:
+        ValueError: If the data is not a JPEG image that can be embedded in a PDF.
+    """
+    if not data.startswith(b"\xff\xd8"):
+        raise ValueError("Not a JPEG image (missing SOI marker).")
+
+    dpi = (72.0, 72.0)
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            raise ValueError(f"Corrupt JPEG image (no marker at byte {pos}).")
+        marker = data[pos + 1]
+        pos += 2
+        if marker == 0xFF:  # fill byte
+            pos -= 1
+            continue
+        if marker in STANDALONE_MARKERS:
+            continue
+        length = int.from_bytes(data[pos : pos + 2], "big")
+        segment = data[pos + 2 : pos + length]
+
+        if marker == 0xE0 and segment.startswith(b"JFIF\x00") and len(segment) >= 12:
+            units = segment[7]
+            x = int.from_bytes(segment[8:10], "big")
+            y = int.from_bytes(segment[10:12], "big")
+            if units == 1 and x and y:  # dots per inch
+                dpi = (float(x), float(y))
+            elif units == 2 and x and y:  # dots per cm
+                dpi = (x * 2.54, y * 2.54)
+        elif marker in SOF_MARKERS:
+            precision = segment[0]
+            height = int.from_bytes(segment[1:3], "big")
+            width = int.from_bytes(segment[3:5], "big")
+            components = segment[5]
+            if precision != 8 or not height or not width or components not in (1, 3, 4):
+                raise ValueError(
+                    f"Unsupported JPEG image ({precision} bit, {components} components,"
+                    f" {width}x{height} px)."
+                )
+            return JpegInfo(width, height, components, dpi)
+        elif marker == 0xDA:  # start of scan
+            break
+        pos += length
+
+    raise ValueError("Corrupt JPEG image (missing SOF marker).")
+
+
+def entry_name(page: int, label: str | None) -> str:
+    """Name of a page in an archive, sorts by page number.
+
+    Examples:
+    >>> entry_name(12, "7r")
+    '00012_7r.jpg'
+    >>> entry_name(3, "Einband / vorne")
+    '00003_Einband_vorne.jpg'
+    >>> entry_name(4, None)
+    '00004.jpg'
+    """
+    slug = re.sub(r"[^\w.-]+", "_", label or "").strip("._")[:40]
+    return f"{page:05d}_{slug}.jpg" if slug else f"{page:05d}.jpg"
+
+
+class ArchiveWriter(ABC):
+    """Base class of all writers, writes to `<path>.part` until closed."""
+
+    suffix: str
+    """File extension of the archive."""
+    can_append = True
+    """Whether pages can be added to an archive that was closed before."""
+
+    def __init__(self, path: Path):  # noqa: D107
+        self.path = path
+        self.part = path.with_name(path.name + ".part")
+        self.labels: dict[int, str | None] = {}
+        """Labels of the pages in the archive by page number."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    @abstractmethod
+    def add(self, page: int, label: str | None, data: bytes) -> str:
+        """Append a page to the archive and return its name inside the archive."""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Complete the archive and move it into place."""
+
+    @abstractmethod
+    def abort(self) -> None:
+        """Discard the incomplete archive."""
+
+
+class ZipArchiveWriter(ArchiveWriter):
+    """Writes the pages as JPEGs into a ZIP archive with an `index.json`.
+
+    JPEGs are stored without compression, deflating them would only cost time.
+    If the archive already exists, e.g. when resuming a download, its pages that
+    were not added again are copied into the new archive when closing it.
+    """
+
+    suffix = ".zip"
+
+    def __init__(self, path: Path):  # noqa: D107
+        super().__init__(path)
+        self._zip = zipfile.ZipFile(self.part, "w", zipfile.ZIP_STORED)
+
+    def _copy_pages(self, path: Path) -> None:
+        """Copy the pages of a previous archive that were not added again."""
+        copied = 0
+        try:
+            with zipfile.ZipFile(path) as previous:
+                index = json.loads(previous.read(INDEX_FILENAME))
+                for entry in index:
+                    if entry["page"] in self.labels:
+                        continue
+                    try:
+                        data = previous.read(entry["file"])
+                    except (KeyError, zipfile.BadZipFile) as e:
+                        logger.warning(f"Dropping page {entry['file']} of {path}: {e}")
+                        continue
+                    self._zip.writestr(entry["file"], data)
+                    self.labels[entry["page"]] = entry["label"]
+                    copied += 1
+        except (KeyError, zipfile.BadZipFile, OSError, ValueError) as e:
+            logger.warning(f"Could not copy the pages of {path}, rebuilding it: {e}")
+        logger.debug(f"Copied {copied} pages from existing archive {path}")
+
+    def add(self, page: int, label: str | None, data: bytes) -> str:  # noqa: D102
+        name = entry_name(page, label)
+        if page in self.labels:
+            logger.debug(f"Page {page} was already added to {self.path}, skipping it.")
+            return name
+        self._zip.writestr(name, data)
+        self.labels[page] = label
+        return name
+
+    def _index(self) -> list[dict]:
+        return [
+            {"page": page, "label": label, "file": entry_name(page, label)}
+            for page, label in sorted(self.labels.items())
+        ]
+
+    def _write_metadata(self) -> None:
+        self._zip.writestr(
+            INDEX_FILENAME, json.dumps(self._index(), ensure_ascii=False, indent=1)
+        )
+
+    def close(self) -> None:  # noqa: D102
+        if self.path.exists():
+            self._copy_pages(self.path)
+        self._write_metadata()
+        self._zip.close()
+        os.replace(self.part, self.path)
+
+    def abort(self) -> None:  # noqa: D102
+        self._zip.close()
+        self.part.unlink(missing_ok=True)
+
+
+class CbzArchiveWriter(ZipArchiveWriter):
+    """Writes a comic book archive, a ZIP with a `ComicInfo.xml` listing the page labels."""
+
+    suffix = ".cbz"
+
+    def _write_metadata(self) -> None:
+        # imports `urllib.request`, which would slow down the start of the CLI
+        from xml.sax.saxutils import quoteattr
+
+        super()._write_metadata()
+        pages = "\n".join(
+            f"    <Page Image={quoteattr(str(image))}"
+            + (f" Bookmark={quoteattr(label)}" if label else "")
+            + " />"
+            for image, (_, label) in enumerate(sorted(self.labels.items()))
+        )
+        self._zip.writestr(
+            COMIC_INFO_FILENAME,
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            "<ComicInfo>\n"
+            f"  <PageCount>{len(self.labels)}</PageCount>\n"
+            f"  <Pages>\n{pages}\n  </Pages>\n"
+            "</ComicInfo>\n",
+        )
+
+
+def _pdf_string(text: str) -> bytes:
+    """Encode text as a PDF text string (UTF-16BE with BOM, hexadecimal)."""
+    return b"<" + ("\ufeff" + text).encode("utf-16-be").hex().upper().encode() + b">"
+
+
+class PdfArchiveWriter(ArchiveWriter):
+    """Writes a PDF with one page per image that embeds the JPEG data as is (DCTDecode).
+
+    Pages are written as they arrive, the page tree, outline (one bookmark per page
+    with its label) and page labels are written in page order when closing.
+
+    NOTE: Pages cannot be added to a closed PDF. Resuming a register that is stored
+    as PDF downloads all of its pages again.
+    """
+
+    suffix = ".pdf"
+    can_append = False
+
+    _CATALOG = 1
+    _PAGES = 2
+
+    def __init__(self, path: Path):  # noqa: D107
+        super().__init__(path)
+        self._file = self.part.open("wb")
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._offsets: dict[int, int] = {}
+        self._next = 3  # 1 and 2 are reserved for the catalog and the page tree
+        self._page_objects: dict[int, int] = {}
+
+    def _allocate(self) -> int:
+        number = self._next
+        self._next += 1
+        return number
+
+    def _write_object(self, number: int, content: bytes, stream: bytes | None = None):
+        self._offsets[number] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % number + content)
+        if stream is not None:
+            self._file.write(b"\nstream\n")
+            self._file.write(stream)
+            self._file.write(b"\nendstream")
+        self._file.write(b"\nendobj\n")
+
+    def add(self, page: int, label: str | None, data: bytes) -> str:  # noqa: D102
+        name = entry_name(page, label)
+        if page in self.labels:
+            logger.debug(f"Page {page} is already in archive {self.path}, skipping it.")
+            return name
+
+        info = read_jpeg_info(data)
+        colorspace = {1: b"/DeviceGray", 3: b"/DeviceRGB", 4: b"/DeviceCMYK"}
+        # CMYK JPEGs (written by Adobe software) store inverted values
+        decode = b" /Decode [1 0 1 0 1 0 1 0]" if info.components == 4 else b""
+        # size of the page in points (1/72 inch), based on the scan's resolution
+        width = info.width * 72 / info.dpi[0]
+        height = info.height * 72 / info.dpi[1]
+
+        image, content, page_object = (
+            self._allocate(),
+            self._allocate(),
+            self._allocate(),
+        )
+        self._write_object(
+            image,
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d"
+            b" /ColorSpace %s /BitsPerComponent 8 /Filter /DCTDecode%s /Length %d >>"
+            % (info.width, info.height, colorspace[info.components], decode, len(data)),
+            data,
+        )
+        drawing = b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (width, height)
+        self._write_object(content, b"<< /Length %d >>" % len(drawing), drawing)
+        self._write_object(
+            page_object,
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f]"
+            b" /Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+            % (self._PAGES, width, height, image, content),
+        )
+        self._page_objects[page] = page_object
+        self.labels[page] = label
+        return name
+
+    def _write_outline(self, pages: list[int]) -> int:
+        """Write one bookmark per page and return the number of the outline object."""
+        outline = self._allocate()
+        items = [self._allocate() for _ in pages]
+        for idx, (page, item) in enumerate(zip(pages, items)):
+            title = self.labels[page] or str(page)
+            siblings = b""
+            if idx > 0:
+                siblings += b" /Prev %d 0 R" % items[idx - 1]
+            if idx < len(items) - 1:
+                siblings += b" /Next %d 0 R" % items[idx + 1]
+            self._write_object(
+                item,
+                b"<< /Title %s /Parent %d 0 R%s /Dest [%d 0 R /Fit] >>"
+                % (_pdf_string(title), outline, siblings, self._page_objects[page]),
+            )
+        first_last = (
+            b" /First %d 0 R /Last %d 0 R" % (items[0], items[-1]) if items else b""
+        )
+        self._write_object(
+            outline,
+            b"<< /Type /Outlines%s /Count %d >>" % (first_last, len(items)),
+        )
+        return outline
+
+    def close(self) -> None:  # noqa: D102
+        pages = sorted(self._page_objects)
+        kids = b" ".join(b"%d 0 R" % self._page_objects[page] for page in pages)
+        self._write_object(
+            self._PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(pages))
+        )
+        outline = self._write_outline(pages)
+        page_labels = b" ".join(
+            b"%d << /P %s >>" % (idx, _pdf_string(self.labels[page] or str(page)))
+            for idx, page in enumerate(pages)
+        )
+        self._write_object(
+            self._CATALOG,
+            b"<< /Type /Catalog /Pages %d 0 R /Outlines %d 0 R /PageMode /UseOutlines"
+            b" /PageLabels << /Nums [%s] >> >>" % (self._PAGES, outline, page_labels),
+        )
+
+        xref = self._file.tell()
+        self._file.write(b"xref\n0 %d\n0000000000 65535 f \n" % self._next)
+        for number in range(1, self._next):
+            self._file.write(b"%010d 00000 n \n" % self._offsets[number])
+        self._file.write(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (self._next, self._CATALOG, xref)
+        )
+        self._file.close()
+        os.replace(self.part, self.path)
+
+    def abort(self) -> None:  # noqa: D102
+        self._file.close()
+        self.part.unlink(missing_ok=True)
+
+
+WRITERS: dict[str, type[ArchiveWriter]] = {
+    "zip": ZipArchiveWriter,
+    "cbz": CbzArchiveWriter,
+    "pdf": PdfArchiveWriter,
+}
+"""Archive writers by format."""
@@ -0,0 +1,191 @@
+"""Content-addressed storage of images, see `parish fetch --dedupe`.
+
+Matricula publishes the same scans under several registers. Instead of storing the
+same bytes once per register, each distinct image is stored once as an object named
+by its SHA-256 digest, e.g. `.objects/3f/3f7a…e1.jpg`, and hardlinked to every path
+it is stored at, e.g. `deutschland/aachen/aachen-hl-kreuz/KB+001/…_0001.jpg`.
+All paths of an image therefore share the same data on disk.
+
+The number of links of an object tells how many paths use it. Objects that are
+no longer used by any path (e.g. after deleting a register's directory) are removed
+with `collect_garbage`. On file systems without hardlinks, paths hold copies of the
+objects instead, and which objects are still used is unknown.
+
+Example:
+>>> store = ContentStore(Path("images"))
+>>> store.add("deutschland/aachen/p/KB+001/KB+001_0001.jpg", image_bytes)
+True
+>>> store.stats().saved_bytes
+0
+"""
+
+import hashlib
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from matricula_online_scraper.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+OBJECTS_DIRNAME = ".objects"
+"""Directory inside the store's root that holds the objects."""
+
+COPIES_FILENAME = "COPIES"
+"""File inside `OBJECTS_DIRNAME` that marks a store whose paths hold copies, as
+hardlinks were not supported."""
+
+TMP_MAX_AGE_SECS = 60 * 60
+"""Age after which a temporary object is left over, not still being written by `add`."""
+
+
+@dataclass
+class ContentStoreStats:
+    """Usage of a content-addressed store."""
+
+    objects: int = 0
+    """Number of distinct images."""
+    links: int = 0
+    """Number of paths the images are stored at."""
+    stored_bytes: int = 0
+    """Size of all distinct images, i.e. what is actually used on disk."""
+    linked_bytes: int = 0
+    """Size of the images at all paths, i.e. what would be used without deduplication."""
+    orphans: int = 0
+    """Objects that are not used by any path, see `ContentStore.collect_garbage`."""
+    orphaned_bytes: int = 0
+    copies: bool = False
+    """Whether paths hold copies of the images, then `links` and `orphans` are unknown."""
+
+    @property
+    def saved_bytes(self) -> int:
+        """Bytes saved by storing every distinct image only once."""
+        if self.copies:
+            return 0
+        return self.linked_bytes - (self.stored_bytes - self.orphaned_bytes)
+
+
+class ContentStore:
+    """Stores images once by their content and hardlinks them to their paths."""
+
+    def __init__(self, root: Path):  # noqa: D107
+        self.root = Path(root)
+        self.objects = self.root / OBJECTS_DIRNAME
+        # set once hardlinks turned out not to be supported, possibly by an earlier run
+        self._copy_instead_of_link = self.stores_copies
+
+    @property
+    def stores_copies(self) -> bool:
+        """Whether paths hold copies of the objects, as hardlinks were not supported.
+
+        Objects of such a store always look unused, so no garbage is collected.
+        """
+        return (self.objects / COPIES_FILENAME).exists()
+
+    def object_path(self, digest: str) -> Path:
+        """Return the path of the object with the given SHA-256 digest."""
+        return self.objects / digest[:2] / f"{digest}.jpg"
+
+    def add(self, path: str | Path, data: bytes) -> bool:
+        """Store the image at `path` (relative to the root).
+
+        Returns:
+            Whether the image was new to the store. If not, the existing object is
+            linked to `path` and no additional space is used.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        obj = self.object_path(digest)
+        is_new = not obj.exists()
+        if is_new:
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            # write to a temporary file first, a concurrent reader never sees a partial object
+            tmp = obj.with_name(f"{obj.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, obj)
+
+        target = self.root / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.exists() and os.path.samefile(target, obj):
+            return is_new
+        self._link(obj, target)
+        return is_new
+
+    def _link(self, obj: Path, target: Path) -> None:
+        """Replace `target` with a hardlink to `obj`."""
+        tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        tmp.unlink(missing_ok=True)
+        if not self._copy_instead_of_link:
+            try:
+                os.link(obj, tmp)
+            except OSError as e:
+                logger.warning(
+                    f"Could not hardlink {obj} ({e}), storing copies instead."
+                    " Images will not be deduplicated."
+                )
+                self._copy_instead_of_link = True
+                (self.objects / COPIES_FILENAME).touch()
+        if self._copy_instead_of_link:
+            shutil.copyfile(obj, tmp)
+        os.replace(tmp, target)
+
+    def _iter_objects(self):
+        if not self.objects.is_dir():
+            return
+        for obj in self.objects.glob("*/*.jpg"):
+            yield obj, obj.stat()
+
+    def stats(self) -> ContentStoreStats:
+        """Count the objects in the store and the paths that use them."""
+        stats = ContentStoreStats(copies=self.stores_copies)
+        for _, stat in self._iter_objects():
+            stats.objects += 1
+            stats.stored_bytes += stat.st_size
+            if stats.copies:
+                continue
+            links = stat.st_nlink - 1  # without the object itself
+            stats.links += links
+            stats.linked_bytes += stat.st_size * links
+            if links == 0:
+                stats.orphans += 1
+                stats.orphaned_bytes += stat.st_size
+        return stats
+
+    def collect_garbage(self, dry_run: bool = False) -> ContentStoreStats:
+        """Remove objects that are not used by any path and leftover temporary files.
+
+        Returns:
+            The removed objects (`orphans` and `orphaned_bytes`).
+
+        Raises:
+            RuntimeError: If the store holds copies, see `stores_copies`.
+        """
+        if self.stores_copies:
+            raise RuntimeError(
+                f"{self.root} stores copies instead of hardlinks,"
+                " which images are unused is unknown."
+            )
+        removed = ContentStoreStats()
+        for obj, stat in self._iter_objects():
+            if stat.st_nlink > 1:
+                continue
+            removed.orphans += 1
+            removed.orphaned_bytes += stat.st_size
+            if not dry_run:
+                logger.debug(f"Removing unused object {obj}")
+                obj.unlink()
+        if not dry_run and self.objects.is_dir():
+            # newer ones may still be written by a concurrent `add`
+            expired = time.time() - TMP_MAX_AGE_SECS
+            for tmp in self.objects.glob("*/*.tmp"):
+                try:
+                    if tmp.stat().st_mtime < expired:
+                        tmp.unlink()
+                except FileNotFoundError:  # renamed by `add` in the meantime
+                    pass
+            for directory in self.objects.iterdir():
+                if directory.is_dir() and not any(directory.iterdir()):
+                    directory.rmdir()
+        return removed
@@ -0,0 +1,167 @@
+"""Persistent cache of the parishes' coordinates, see `parish list --include-coordinates`.
+
+The coordinates of a parish are only found on its own page, so listing all parishes
+with coordinates takes one request per parish. They almost never change, though.
+`CoordinatesCache` keeps them in a SQLite database in the user's cache directory,
+keyed by the parish's URL, together with the time they were fetched. Parishes whose
+page has no coordinates are cached as well, so they are not requested again either.
+
+Entries older than `COORDINATES_CACHE_EXPIRATION_SECS` are dropped when the cache is
+opened. Once the cache holds more than `COORDINATES_CACHE_MAX_ENTRIES` parishes, the
+least recently used ones are evicted when it is closed.
+
+Settings:
+- `COORDINATES_CACHE_ENABLED` (bool): Look up and store coordinates. Defaults to False.
+- `COORDINATES_CACHE_DIR` (str): Directory of the database. Defaults to the user's
+  cache directory, see `default_cache_dir`.
+- `COORDINATES_CACHE_EXPIRATION_SECS` (int): Age after which coordinates are fetched
+  again, 0 to never expire. Defaults to 90 days.
+- `COORDINATES_CACHE_MAX_ENTRIES` (int): Maximum number of parishes. Defaults to 100 000.
+- `COORDINATES_CACHE_REFRESH` (bool): Fetch all coordinates again and update the
+  cache with them. Defaults to False.
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any
+
+from matricula_online_scraper.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+CACHE_FILENAME = "coordinates.sqlite3"
+"""Name of the database inside `COORDINATES_CACHE_DIR`."""
+
+DEFAULT_EXPIRATION_DAYS = 90
+DEFAULT_EXPIRATION_SECS = DEFAULT_EXPIRATION_DAYS * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 100_000
+
+
+def coordinates_cache_settings(
+    expiration_days: int = DEFAULT_EXPIRATION_DAYS, refresh: bool = False
+) -> dict[str, Any]:
+    """Return the Scrapy settings that enable the cache, see `--coordinates-ttl`."""
+    return {
+        "COORDINATES_CACHE_ENABLED": True,
+        "COORDINATES_CACHE_EXPIRATION_SECS": expiration_days * 24 * 60 * 60,
+        "COORDINATES_CACHE_REFRESH": refresh,
+    }
+
+
+class CoordinatesCache:
+    """Coordinates of parishes by their URL, shared by all runs."""
+
+    def __init__(  # noqa: D107
+        self,
+        directory: Path,
+        *,
+        expiration_secs: int = DEFAULT_EXPIRATION_SECS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        refresh: bool = False,
+    ):
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / CACHE_FILENAME
+        self.max_entries = max_entries
+        self.refresh = refresh
+        self.hits = 0
+        """Number of lookups that were answered from the cache."""
+        self._accessed: list[tuple[float, str]] = []
+        """Hits whose access time is yet to be updated, see `close`."""
+
+        # several commands may run at the same time
+        self.db = sqlite3.connect(self.path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS coordinates (
+                    url TEXT PRIMARY KEY,
+                    longitude REAL,
+                    latitude REAL,
+                    fetched REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+                """
+            )
+            if expiration_secs > 0:
+                expired = self.db.execute(
+                    "DELETE FROM coordinates WHERE fetched < ?",
+                    (time.time() - expiration_secs,),
+                ).rowcount
+                if expired:
+                    logger.debug(
+                        f"Removed {expired} expired coordinates from the cache"
+                    )
+
+    @classmethod
+    def from_settings(cls, settings) -> "CoordinatesCache":
+        """Open the cache configured by the `COORDINATES_CACHE_*` settings."""
+        from matricula_online_scraper.middlewares.http_cache import default_cache_dir
+
+        return cls(
+            Path(settings.get("COORDINATES_CACHE_DIR") or default_cache_dir()),
+            expiration_secs=settings.getint(
+                "COORDINATES_CACHE_EXPIRATION_SECS", DEFAULT_EXPIRATION_SECS
+            ),
+            max_entries=settings.getint(
+                "COORDINATES_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES
+            ),
+            refresh=settings.getbool("COORDINATES_CACHE_REFRESH"),
+        )
+
+    def get(self, url: str) -> dict[str, float] | None:
+        """Return the cached coordinates of a parish.
+
+        Returns:
+            dict[str, float] | None: `longitude` and `latitude`, an empty dict if the
+                parish has no coordinates or `None` if it is not cached.
+        """
+        if self.refresh:
+            return None
+        row = self.db.execute(
+            "SELECT longitude, latitude FROM coordinates WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        self.hits += 1
+        self._accessed.append((time.time(), url))
+        longitude, latitude = row
+        if longitude is None or latitude is None:
+            return {}
+        return {"longitude": longitude, "latitude": latitude}
+
+    def put(self, url: str, coordinates: dict[str, float]) -> None:
+        """Store the coordinates of a parish, an empty dict if it has none."""
+        now = time.time()
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO coordinates VALUES (?, ?, ?, ?, ?)",
+                (
+                    url,
+                    coordinates.get("longitude"),
+                    coordinates.get("latitude"),
+                    now,
+                    now,
+                ),
+            )
+
+    def close(self) -> None:
+        """Record the access times of the hits, evict old entries and close the cache."""
+        with self.db:
+            self.db.executemany(
+                "UPDATE coordinates SET accessed = ? WHERE url = ?", self._accessed
+            )
+            evicted = self.db.execute(
+                """
+                DELETE FROM coordinates WHERE url NOT IN (
+                    SELECT url FROM coordinates ORDER BY accessed DESC LIMIT ?
+                )
+                """,
+                (self.max_entries,),
+            ).rowcount
+        if evicted:
+            logger.debug(f"Evicted {evicted} coordinates from the cache")
+        self.db.close()
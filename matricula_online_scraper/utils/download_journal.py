@@ -0,0 +1,306 @@
+"""On-disk journal that records the progress of `parish fetch` per output directory.
+
+Downloading a large register takes hours. Without a record of what has already been
+done, an interrupted run (CTRL+C, pod restart, crash) has to start over and request
+every page again. The journal is an append-only JSON Lines file inside the output
+directory that records, for every register:
+
+1. the list of page (image) URLs decoded from the register's `dv1` variable
+2. each page that was downloaded successfully
+3. each page that failed to download
+4. each page that was downloaded, but is missing or corrupt on disk (see `parish verify`)
+
+Appending is cheap and a crash can at worst truncate the last line, which is ignored
+when the journal is read back. Buffered events are appended with a single write, so
+several processes (see `parish fetch --workers`) can share a journal without their
+lines getting mixed up. `JournalTail` follows the events that other processes append. Use `DownloadJournal.missing()` to obtain the pages of a
+register that still need to be downloaded.
+
+Example:
+>>> journal = DownloadJournal(Path("parish_register_images"))
+>>> journal.register("https://data.matricula-online.eu/de/…/KB+001/?pg=1", ["http://…/0001.jpg"])
+>>> journal.mark_completed("https://data.matricula-online.eu/de/…/KB+001/", "http://…/0001.jpg")
+>>> journal.missing("https://data.matricula-online.eu/de/…/KB+001/")
+[]
+>>> journal.close()
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit, urlunsplit
+
+from matricula_online_scraper.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+JOURNAL_FILENAME = ".matricula-journal.jsonl"
+"""Name of the journal file inside the output directory."""
+
+DEFAULT_FLUSH_EVERY = 50
+"""Number of buffered events after which the journal is written to disk."""
+
+
+def register_key(url: str) -> str:
+    """Normalize a register URL so that it can be used as a key in the journal.
+
+    The same register can be referenced with or without the `?pg=` parameter
+    and with or without a trailing slash.
+
+    Examples:
+    >>> register_key("https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/KB+001/?pg=7")
+    'https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/KB+001/'
+    >>> register_key("https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/KB+001")
+    'https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/KB+001/'
+    """
+    parts = urlsplit(url)
+    path = parts.path.rstrip("/") + "/"
+    return urlunsplit((parts.scheme, parts.netloc, path, "", ""))
+
+
+def shard_registers(urls: list[str], shards: int) -> list[list[str]]:
+    """Split register URLs into at most `shards` lists, see `parish fetch --workers`.
+
+    URLs of the same register (see `register_key`) end up in the same list, so that no
+    two processes download the same register.
+
+    Examples:
+    >>> shard_registers(["https://…/KB+001/?pg=1", "https://…/KB+002/", "https://…/KB+001/?pg=9"], 4)
+    [['https://…/KB+001/?pg=1', 'https://…/KB+001/?pg=9'], ['https://…/KB+002/']]
+    """
+    groups: dict[str, list[str]] = {}
+    for url in urls:
+        groups.setdefault(register_key(url), []).append(url)
+    result: list[list[str]] = [[] for _ in range(min(shards, len(groups)))]
+    for i, group in enumerate(groups.values()):
+        result[i % len(result)].extend(group)
+    return result
+
+
+@dataclass
+class RegisterProgress:
+    """Progress of a single register as recorded in the journal."""
+
+    url: str
+    """Normalized URL of the register, see `register_key`."""
+    pages: list[str] = field(default_factory=list)
+    """Image URLs of all pages of the register, in order."""
+    completed: dict[str, dict[str, Any]] = field(default_factory=dict)
+    """Pages that were downloaded successfully, mapped to their recorded metadata."""
+    failed: set[str] = field(default_factory=set)
+    """Pages that failed to download in the most recent attempt."""
+
+    @property
+    def missing(self) -> list[str]:
+        """Pages that have not been downloaded successfully yet, in order."""
+        return [page for page in self.pages if page not in self.completed]
+
+    @property
+    def is_complete(self) -> bool:
+        """Whether all pages of the register were downloaded."""
+        return len(self.pages) > 0 and len(self.missing) == 0
+
+
+class DownloadJournal:
+    """Append-only journal with the download progress of all registers in a directory."""
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        filename: str = JOURNAL_FILENAME,
+        flush_every: int = DEFAULT_FLUSH_EVERY,
+    ):
+        """Open (or create) the journal inside `directory` and replay its events.
+
+        Args:
+            directory (Path): Output directory the journal belongs to.
+            filename (str, optional): Name of the journal file. Defaults to JOURNAL_FILENAME.
+            flush_every (int, optional): Flush the buffer to disk after this many events.
+                Defaults to DEFAULT_FLUSH_EVERY.
+        """
+        self.path = directory / filename
+        self.flush_every = flush_every
+        self.registers: dict[str, RegisterProgress] = {}
+        self._buffer: list[str] = []
+        self._closed = False
+
+        directory.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            self._replay()
+        # unbuffered, so that each flush is a single append to the end of the file
+        self._file = self.path.open("ab", buffering=0)
+        if self._file.tell() > 0 and not self._ends_with_newline():
+            # terminate a line truncated by a crash, so new events start on their own line
+            self._file.write(b"\n")
+
+    def _replay(self) -> None:
+        """Rebuild the in-memory state from the journal file."""
+        with self.path.open("r", encoding="utf-8") as file:
+            for lineno, line in enumerate(file, start=1):
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # most likely the last line, truncated by a crash
+                    logger.warning(
+                        f"Ignoring malformed line {lineno} in journal {self.path}"
+                    )
+                    continue
+                self._apply(event)
+
+        logger.debug(
+            f"Replayed journal {self.path} with {len(self.registers)} registers."
+        )
+
+    def _ends_with_newline(self) -> bool:
+        with self.path.open("rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+    def _apply(self, event: dict[str, Any]) -> None:
+        """Apply a single event to the in-memory state."""
+        progress = self.registers.setdefault(
+            event["register"], RegisterProgress(event["register"])
+        )
+        match event["event"]:
+            case "register":
+                progress.pages = event["pages"]
+            case "completed":
+                progress.completed[event["page"]] = {
+                    key: value
+                    for key, value in event.items()
+                    if key not in ("event", "register", "page")
+                }
+                progress.failed.discard(event["page"])
+            case "failed":
+                progress.failed.add(event["page"])
+            case "invalidated":
+                progress.completed.pop(event["page"], None)
+            case unknown:
+                logger.warning(f"Ignoring unknown journal event '{unknown}'")
+
+    def _record(self, event: dict[str, Any]) -> None:
+        """Apply an event and buffer it to be written to disk."""
+        if self._closed:
+            logger.debug(f"Journal {self.path} is closed. Dropping event {event}")
+            return
+        self._apply(event)
+        self._buffer.append(json.dumps(event, ensure_ascii=False))
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def register(self, url: str, pages: list[str]) -> RegisterProgress:
+        """Record the list of pages of a register.
+
+        Already completed pages of that register are kept.
+
+        Args:
+            url (str): URL of the register, with or without `?pg=`.
+            pages (list[str]): Image URLs of the register's pages.
+
+        Returns:
+            RegisterProgress: The register's progress after recording the pages.
+        """
+        key = register_key(url)
+        self._record({"event": "register", "register": key, "pages": pages})
+        return self.registers[key]
+
+    def mark_completed(self, url: str, page: str, **metadata: Any) -> None:
+        """Record that a page of a register was downloaded successfully.
+
+        Args:
+            url (str): URL of the register.
+            page (str): Image URL of the page.
+            **metadata: Additional JSON-serializable data to store with the page,
+                such as its path or checksum.
+        """
+        self._record(
+            {"event": "completed", "register": register_key(url), "page": page}
+            | metadata
+        )
+
+    def mark_failed(self, url: str, page: str) -> None:
+        """Record that a page of a register failed to download."""
+        self._record({"event": "failed", "register": register_key(url), "page": page})
+
+    def mark_invalidated(self, url: str, page: str, reason: str) -> None:
+        """Record that a completed page is missing or corrupt, so it is downloaded again."""
+        self._record(
+            {
+                "event": "invalidated",
+                "register": register_key(url),
+                "page": page,
+                "reason": reason,
+            }
+        )
+
+    def get(self, url: str) -> RegisterProgress | None:
+        """Return the recorded progress of a register or None if it is unknown."""
+        return self.registers.get(register_key(url))
+
+    def missing(self, url: str) -> list[str] | None:
+        """Return the pages of a register that still need to be downloaded.
+
+        Returns:
+            list[str] | None: Missing pages in order, or None if the register is unknown.
+        """
+        progress = self.get(url)
+        return None if progress is None else progress.missing
+
+    def flush(self) -> None:
+        """Write all buffered events to disk."""
+        if not self._buffer or self._closed:
+            return
+        self._file.write(("\n".join(self._buffer) + "\n").encode())
+        os.fsync(self._file.fileno())
+        self._buffer.clear()
+
+    def close(self) -> None:
+        """Flush and close the journal. Safe to call more than once."""
+        if self._closed:
+            return
+        self.flush()
+        self._file.close()
+        self._closed = True
+
+
+class JournalTail:
+    """Counts the events that other processes append to a journal, e.g. to show progress.
+
+    Only events appended after the tail was created are counted.
+    """
+
+    def __init__(self, directory: Path, *, filename: str = JOURNAL_FILENAME):  # noqa: D107
+        self.path = directory / filename
+        self.offset = self.path.stat().st_size if self.path.exists() else 0
+        self.registers: set[str] = set()
+        """Registers whose pages were recorded."""
+        self.completed = 0
+        self.failed = 0
+        self._partial = b""
+
+    def poll(self) -> None:
+        """Read and count the events that were appended since the last call."""
+        if not self.path.exists():
+            return
+        with self.path.open("rb") as file:
+            file.seek(self.offset)
+            data = file.read()
+        self.offset += len(data)
+        # the last line may still be written
+        *lines, self._partial = (self._partial + data).split(b"\n")
+        for line in lines:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            match event.get("event"):
+                case "register":
+                    self.registers.add(event["register"])
+                case "completed":
+                    self.completed += 1
+                case "failed":
+                    self.failed += 1
@@ -19,3 +19,33 @@ class FileFormat(str, Enum):
             case _:
                 # In most cases the file suffix is the same as scrapy's value for it
                 return self.value
+
+
+class ImageStorage(str, Enum):
+    """Supported ways to store the downloaded images of a register."""
+
+    REENCODE = "reencode"
+    """Decode each image with Pillow and store it as (re-encoded) JPEG."""
+    RAW = "raw"
+    """Store the bytes of each image exactly as received."""
+    ZIP = "zip"
+    """Store all images of a register as received in one ZIP archive."""
+    CBZ = "cbz"
+    """Store all images of a register as received in one comic book archive (ZIP)."""
+    PDF = "pdf"
+    """Store all images of a register in one PDF, embedding the JPEGs without re-encoding."""
+
+    @property
+    def is_archive(self) -> bool:
+        """Whether all images of a register are stored in one archive file."""
+        return self in (ImageStorage.ZIP, ImageStorage.CBZ, ImageStorage.PDF)
+
+    def to_pipeline(self) -> str:
+        """Return the module path of the item pipeline implementing this storage."""
+        match self:
+            case ImageStorage.REENCODE:
+                return "matricula_online_scraper.pipelines.images_pipeline.CustomImagesPipeline"
+            case ImageStorage.RAW:
+                return "matricula_online_scraper.pipelines.images_pipeline.RawImagesPipeline"
+            case ImageStorage.ZIP | ImageStorage.CBZ | ImageStorage.PDF:
+                return "matricula_online_scraper.pipelines.images_pipeline.ArchiveImagesPipeline"
@@ -0,0 +1,135 @@
+"""Transforms that create derivatives of downloaded scans, see `parish fetch --postprocess`.
+
+A transform is given by its name and an optional argument, several transforms are
+separated by commas, e.g. `grayscale,thumbnail:512,webp:80`:
+
+- `grayscale`: grayscale copy as JPEG
+- `thumbnail[:SIZE]`: JPEG that fits into SIZE x SIZE pixels (default 256)
+- `webp[:QUALITY]`: WebP copy (default quality 80)
+- `avif[:QUALITY]`: AVIF copy (default quality 60)
+
+`apply_transforms` runs in a worker process of `PostProcessingPipeline`. It reads and
+decodes each scan only once and creates all derivatives from the decoded image.
+
+Example:
+>>> transforms = parse_transforms("grayscale,thumbnail:512")
+>>> apply_transforms("scan.jpg", [(t, t.output_path("derivatives", "scan.jpg")) for t in transforms])
+['derivatives/grayscale/scan.jpg', 'derivatives/thumbnail/scan.jpg']
+"""
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from PIL import Image, features
+
+
+@dataclass(frozen=True)
+class Transform:
+    """A transform and its argument, if any."""
+
+    name: str
+    arg: int | None = None
+
+    def __str__(self) -> str:  # noqa: D105
+        return self.name if self.arg is None else f"{self.name}:{self.arg}"
+
+    @property
+    def suffix(self) -> str:
+        """File extension of the derivatives."""
+        return _TRANSFORMS[self.name][0]
+
+    def output_path(self, root: str | Path, path: str | Path) -> Path:
+        """Path of the derivative of the scan at `path` (relative), stored under `root`."""
+        return Path(root, self.name, path).with_suffix(self.suffix)
+
+    def apply(self, image: Image.Image, output: Path) -> None:
+        """Create the derivative of a decoded image and save it at `output`."""
+        _, default, save = _TRANSFORMS[self.name]
+        save(image, output, self.arg if self.arg is not None else default)
+
+
+def _grayscale(image: Image.Image, output: Path, quality: int) -> None:
+    image.convert("L").save(output, "JPEG", quality=quality)
+
+
+def _thumbnail(image: Image.Image, output: Path, size: int) -> None:
+    thumbnail = image.copy()
+    thumbnail.thumbnail((size, size))
+    thumbnail.save(output, "JPEG", quality=85)
+
+
+def _rgb(image: Image.Image) -> Image.Image:
+    # e.g. CMYK scans, which WebP and AVIF do not support
+    return image if image.mode in ("L", "RGB") else image.convert("RGB")
+
+
+def _webp(image: Image.Image, output: Path, quality: int) -> None:
+    _rgb(image).save(output, "WEBP", quality=quality)
+
+
+def _avif(image: Image.Image, output: Path, quality: int) -> None:
+    _rgb(image).save(output, "AVIF", quality=quality)
+
+
+# name -> (file extension, default argument, function)
+_TRANSFORMS = {
+    "grayscale": (".jpg", 90, _grayscale),
+    "thumbnail": (".jpg", 256, _thumbnail),
+    "webp": (".webp", 80, _webp),
+    "avif": (".avif", 60, _avif),
+}
+
+
+def parse_transforms(spec: str) -> list[Transform]:
+    """Parse a comma-separated list of transforms like `grayscale,thumbnail:512`.
+
+    Raises:
+        ValueError: If a transform is unknown, has an invalid argument or is not
+            supported by the installed version of Pillow.
+    """
+    transforms: list[Transform] = []
+    for part in spec.split(","):
+        name, sep, arg = part.strip().partition(":")
+        if name not in _TRANSFORMS:
+            raise ValueError(
+                f"Unknown transform '{name}', choose from: {', '.join(_TRANSFORMS)}."
+            )
+        if name in ("webp", "avif") and not features.check(name):
+            raise ValueError(f"The installed version of Pillow cannot write {name}.")
+        try:
+            value = int(arg) if sep else None
+        except ValueError:
+            raise ValueError(
+                f"Invalid argument for transform '{name}': '{arg}'"
+            ) from None
+        if value is not None and value < 1:
+            raise ValueError(f"Invalid argument for transform '{name}': '{arg}'")
+        transforms.append(Transform(name, value))
+    return transforms
+
+
+def apply_transforms(source: str, outputs: list[tuple[Transform, Path]]) -> list[str]:
+    """Create derivatives of the scan at `source` that do not exist yet.
+
+    The scan is read and decoded once, no matter how many derivatives are created.
+    Each derivative is written to a temporary file first and moved into place.
+
+    Returns:
+        The paths of the derivatives that were created.
+    """
+    missing = [(t, output) for t, output in outputs if not output.exists()]
+    if not missing:
+        return []
+
+    created: list[str] = []
+    with Image.open(source) as image:
+        image.load()
+        for transform, output in missing:
+            output.parent.mkdir(parents=True, exist_ok=True)
+            tmp = output.with_name(f"{output.name}.{os.getpid()}.tmp")
+            # the format is given explicitly, the temporary suffix would not tell
+            transform.apply(image, tmp)
+            os.replace(tmp, output)
+            created.append(str(output))
+    return created
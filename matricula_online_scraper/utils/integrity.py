@@ -0,0 +1,347 @@
+"""Integrity checks of the images written by `parish fetch`, see `parish verify`.
+
+Every page that the journal (see `DownloadJournal`) lists as completed is checked:
+
+1. the file exists and has the recorded size
+2. its MD5 checksum matches the recorded one
+3. it is a structurally valid JPEG: starts with SOI, has a frame header (SOF),
+   valid segment lengths up to the image data (SOS) and ends with EOI
+
+Files are read through memory maps in a pool of threads (hashing releases the GIL),
+at most a bounded number of files is queued at once, so that millions of files can be
+checked with constant memory.
+
+Per register, pages are reported as missing (not downloaded or not found on disk) or
+corrupt. Files in a register's directory that the journal does not know are reported
+as extra, e.g. leftovers of interrupted downloads.
+
+Pages in ZIP/CBZ archives (`--storage zip|cbz`) are checked the same way. For PDFs,
+only the structure of the file is checked, as pages are not stored as files of their own.
+
+Example:
+>>> journal = DownloadJournal(Path("parish_register_images"))
+>>> reports = verify_directory(Path("parish_register_images"), journal)
+>>> [report.url for report in reports if not report.is_ok]
+['https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/KB+001/']
+"""
+
+import mmap
+import os
+import re
+import zipfile
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from matricula_online_scraper.logging_config import get_logger
+from matricula_online_scraper.utils.archive_writer import (
+    COMIC_INFO_FILENAME,
+    INDEX_FILENAME,
+    SOF_MARKERS,
+    STANDALONE_MARKERS,
+)
+from matricula_online_scraper.utils.download_journal import DownloadJournal
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+# NOTE: hashlib and the thread pool are imported when checking, the CLI imports this
+# module at startup for `DEFAULT_WORKERS`, see `test_startup.py`
+
+logger = get_logger(__name__)
+
+
+DEFAULT_WORKERS = 16
+"""Number of threads that read files concurrently."""
+
+_ARCHIVE_PATH = re.compile(r"^(?P<archive>.+\.(?:zip|cbz|pdf))/(?P<entry>[^/]+)$")
+# EOI must be within this many bytes of the end, some scanners append padding
+_EOI_WINDOW = 4096
+
+
+@dataclass
+class PageProblem:
+    """A page that is missing or corrupt."""
+
+    page: str
+    """Image URL of the page."""
+    path: str | None
+    """Recorded path of the page, relative to the directory."""
+    reason: str
+
+
+@dataclass
+class RegisterReport:
+    """Result of verifying all pages of a register."""
+
+    url: str
+    pages: int = 0
+    """Number of pages that are expected to exist."""
+    ok: int = 0
+    missing: list[PageProblem] = field(default_factory=list)
+    corrupt: list[PageProblem] = field(default_factory=list)
+    extra: list[str] = field(default_factory=list)
+    """Files that are not part of the register, relative to the directory."""
+
+    @property
+    def is_ok(self) -> bool:
+        """Whether all pages exist and are valid, and there are no extra files."""
+        return not (self.missing or self.corrupt or self.extra)
+
+    @property
+    def refetch(self) -> list[PageProblem]:
+        """Pages that need to be downloaded (again)."""
+        return self.missing + self.corrupt
+
+
+def check_jpeg(data: Any) -> str | None:
+    """Check the structure of a JPEG image (bytes or memory map).
+
+    Returns:
+        None if the image is valid, otherwise the reason why it is not.
+    """
+    size = len(data)
+    if data[:2] != b"\xff\xd8":
+        return "not a JPEG image (missing SOI marker)"
+
+    pos, has_frame = 2, False
+    while True:
+        if pos + 4 > size:
+            return "truncated (ends within the headers)"
+        if data[pos] != 0xFF:
+            return f"corrupt header at byte {pos}"
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in STANDALONE_MARKERS:
+            pos += 2
+            continue
+        if marker == 0xD9:
+            return "no image data (EOI before SOS)"
+        length = int.from_bytes(data[pos + 2 : pos + 4], "big")
+        if length < 2 or pos + 2 + length > size:
+            return f"corrupt segment length at byte {pos}"
+        if marker in SOF_MARKERS:
+            has_frame = True
+        if marker == 0xDA:  # start of scan, followed by the image data
+            break
+        pos += 2 + length
+
+    if not has_frame:
+        return "missing frame header (SOF marker)"
+    # 0xFF in the image data is always followed by 0x00 or RST0-7, so this is EOI
+    if data.rfind(b"\xff\xd9", max(pos, size - _EOI_WINDOW)) == -1:
+        return "truncated (missing EOI marker)"
+    return None
+
+
+def check_bytes(data: Any, size: int | None, checksum: str | None) -> str | None:
+    """Check the content of a page against its recorded size and checksum."""
+    import hashlib
+
+    if size is not None and len(data) != size:
+        return f"size is {len(data)} bytes, expected {size}"
+    if len(data) == 0:
+        return "empty file"
+    if checksum and hashlib.md5(data).hexdigest() != checksum:  # noqa: S324
+        return "checksum mismatch"
+    return check_jpeg(data)
+
+
+def check_file(path: Path, size: int | None, checksum: str | None) -> str | None:
+    """Check a page on disk, see `check_bytes`.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+    with path.open("rb") as file:
+        actual = os.fstat(file.fileno()).st_size
+        if size is not None and actual != size:
+            return f"size is {actual} bytes, expected {size}"
+        if actual == 0:
+            return "empty file"
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if hasattr(data, "madvise"):
+                data.madvise(mmap.MADV_SEQUENTIAL)
+            return check_bytes(data, size, checksum)
+
+
+def _bounded_map(
+    pool: "ThreadPoolExecutor", fn: Callable, items: Iterable, window: int
+) -> Iterator[tuple[Any, Any]]:
+    """Like `pool.map`, but only submits `window` items at once and yields (item, result)."""
+    pending: deque[tuple[Any, "Future"]] = deque()
+    for item in items:
+        pending.append((item, pool.submit(fn, item)))
+        if len(pending) >= window:
+            item, future = pending.popleft()
+            yield item, future.result()
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result()
+
+
+def _check_loose_page(path: Path, meta: dict) -> tuple[str, str | None]:
+    """Return the status (ok, missing or corrupt) of a page and the reason."""
+    try:
+        reason = check_file(path, meta.get("size"), meta.get("checksum"))
+    except FileNotFoundError:
+        return "missing", "file not found"
+    return ("corrupt", reason) if reason else ("ok", None)
+
+
+def _check_pdf(path: Path) -> str | None:
+    with path.open("rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return "empty file"
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:5] != b"%PDF-":
+                return "not a PDF"
+            if data.rfind(b"%%EOF", max(0, len(data) - 1024)) == -1:
+                return "incomplete PDF (missing trailer)"
+    return None
+
+
+def _check_archive(
+    archive: Path, name: str, entries: dict[str, tuple[str, dict]]
+) -> tuple[list[tuple[str, str, str, str | None]], list[str]]:
+    """Check the pages of a register stored in an archive (`name` is its relative path).
+
+    Returns:
+        (status, page, path, reason) of each page and the extra entries.
+    """
+    if not archive.exists():
+        return [
+            ("missing", page, f"{name}/{entry}", "archive not found")
+            for entry, (page, _) in entries.items()
+        ], []
+
+    if archive.suffix == ".pdf":
+        reason = _check_pdf(archive)
+        return [
+            ("corrupt" if reason else "ok", page, f"{name}/{entry}", reason)
+            for entry, (page, _) in entries.items()
+        ], []
+
+    results: list[tuple[str, str, str, str | None]] = []
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            names = set(zf.namelist())
+            for entry, (page, meta) in entries.items():
+                path = f"{name}/{entry}"
+                if entry not in names:
+                    results.append(("missing", page, path, "not in archive"))
+                    continue
+                try:
+                    data = zf.read(entry)  # checks the CRC
+                except zipfile.BadZipFile as e:
+                    results.append(("corrupt", page, path, str(e)))
+                    continue
+                reason = check_bytes(data, meta.get("size"), meta.get("checksum"))
+                results.append(("corrupt" if reason else "ok", page, path, reason))
+    except (zipfile.BadZipFile, OSError) as e:
+        return [
+            ("corrupt", page, f"{name}/{entry}", f"unreadable archive: {e}")
+            for entry, (page, _) in entries.items()
+        ], []
+
+    extra = [
+        f"{name}/{entry}"
+        for entry in sorted(names - set(entries))
+        if entry not in (INDEX_FILENAME, COMIC_INFO_FILENAME)
+    ]
+    return results, extra
+
+
+def verify_directory(
+    directory: Path, journal: DownloadJournal, workers: int = DEFAULT_WORKERS
+) -> list[RegisterReport]:
+    """Check all pages that the journal of `directory` knows.
+
+    Returns:
+        One report per register, in the order of the journal.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    reports: list[RegisterReport] = []
+    # (report, page, metadata, absolute path) of each loose file
+    files: list[tuple[RegisterReport, str, dict, Path]] = []
+    # (report, archive, relative path, {entry: (page, metadata)}) of each archive
+    archives: list[tuple[RegisterReport, Path, str, dict[str, tuple[str, dict]]]] = []
+
+    for progress in journal.registers.values():
+        report = RegisterReport(progress.url)
+        reports.append(report)
+        pages = progress.pages + [
+            p for p in progress.completed if p not in progress.pages
+        ]
+        report.pages = len(pages)
+        register_archives: dict[str, dict[str, tuple[str, dict]]] = {}
+        directories: set[Path] = set()
+        known: set[Path] = set()
+
+        for page in pages:
+            meta = progress.completed.get(page)
+            if meta is None:
+                reason = (
+                    "download failed" if page in progress.failed else "not downloaded"
+                )
+                report.missing.append(PageProblem(page, None, reason))
+                continue
+            if "path" not in meta:
+                report.missing.append(PageProblem(page, None, "no path recorded"))
+                continue
+            if match := _ARCHIVE_PATH.match(meta["path"]):
+                archive = register_archives.setdefault(match["archive"], {})
+                archive[match["entry"]] = (page, meta)
+                continue
+            path = directory / meta["path"]
+            files.append((report, page, meta, path))
+            directories.add(path.parent)
+            known.add(path)
+
+        archives.extend(
+            (report, directory / name, name, entries)
+            for name, entries in register_archives.items()
+        )
+        for register_directory in sorted(directories):
+            if not register_directory.is_dir():
+                continue
+            report.extra.extend(
+                str(path.relative_to(directory))
+                for path in sorted(register_directory.iterdir())
+                if path.is_file() and path not in known
+            )
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for (report, page, meta, path), (status, reason) in _bounded_map(
+            pool,
+            lambda item: _check_loose_page(item[3], item[2]),
+            files,
+            window=workers * 4,
+        ):
+            _count(report, status, page, meta["path"], reason)
+
+        for (report, *_), (results, extra) in _bounded_map(
+            pool, lambda item: _check_archive(*item[1:]), archives, workers
+        ):
+            for status, page, path, reason in results:
+                _count(report, status, page, path, reason)
+            report.extra.extend(extra)
+
+    return reports
+
+
+def _count(
+    report: RegisterReport, status: str, page: str, path: str, reason: str | None
+) -> None:
+    match status:
+        case "ok":
+            report.ok += 1
+        case "missing":
+            report.missing.append(PageProblem(page, path, reason or status))
+        case _:
+            report.corrupt.append(PageProblem(page, path, reason or status))
@@ -0,0 +1,305 @@
+"""Job queue in a SQLite file that coordinates `queue work` processes on several machines.
+
+Instead of splitting URL lists among machines by hand, jobs are added to a queue file
+on shared storage (`queue add`) and each worker claims the next job once it has
+capacity. A claimed job is leased: the worker owns it until the lease expires and
+extends the lease (heartbeat) while it works on the job. If a worker dies, its job is
+handed to the next worker that asks for one once the lease expired. A job that failed
+or whose worker died `max_attempts` times is marked as failed.
+
+Kinds of jobs:
+- `register`: download a register (target: URL of the register)
+- `parish`: add a `register` job for each register of a parish (target: URL of the parish)
+- `search`: add a `parish` job for each parish found by a search like `parish list`
+  (target: JSON with the search parameters)
+
+Every change happens in a `BEGIN IMMEDIATE` transaction, so two workers never claim
+the same job. As the file is usually on a network file system, SQLite's default
+rollback journal is used instead of WAL, which requires shared memory. Leases are
+compared with the clock of each machine, so the clocks should be synchronized.
+
+Example:
+>>> queue = JobQueue(Path("jobs.sqlite3"))
+>>> queue.add(JobKind.REGISTER, "https://data.matricula-online.eu/de/…/KB+001/")
+True
+>>> job = queue.claim("worker-1")
+>>> queue.complete(job, "worker-1")
+True
+"""
+
+import json
+import sqlite3
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Any
+
+from matricula_online_scraper.logging_config import get_logger
+from matricula_online_scraper.utils.download_journal import register_key
+
+logger = get_logger(__name__)
+
+
+DEFAULT_LEASE_SECS = 300
+"""Time after which a job of a worker that stopped sending heartbeats is handed out again."""
+
+DEFAULT_MAX_ATTEMPTS = 3
+"""Number of times a job is claimed before it is marked as failed."""
+
+
+class JobKind(str, Enum):
+    """What a job does, see the module's docstring."""
+
+    REGISTER = "register"
+    PARISH = "parish"
+    SEARCH = "search"
+
+
+class JobState(str, Enum):
+    """State of a job in the queue."""
+
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@dataclass
+class Job:
+    """A job claimed by a worker."""
+
+    id: int
+    kind: JobKind
+    target: str
+    attempts: int
+    """Number of times the job was claimed, including this time."""
+
+    @property
+    def search(self) -> dict[str, Any]:
+        """Search parameters of a `search` job, see `search_target`."""
+        return json.loads(self.target)
+
+
+def search_target(
+    place: str = "",
+    diocese: int | None = None,
+    date_range: tuple[int, int] | None = None,
+) -> str:
+    """Return the target of a `search` job with the parameters of `parish list`."""
+    return json.dumps(
+        {"place": place, "diocese": diocese, "date_range": date_range},
+        sort_keys=True,
+    )
+
+
+def _normalize(kind: JobKind, target: str) -> str:
+    # the same register or parish can be written in several ways
+    return target if kind == JobKind.SEARCH else register_key(target)
+
+
+class JobQueue:
+    """Jobs in a SQLite file, claimed by workers with leases."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        lease_secs: float = DEFAULT_LEASE_SECS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        """Open (or create) the queue at `path`.
+
+        Args:
+            path (Path): Path of the SQLite file.
+            lease_secs (float, optional): Duration of a lease, renewed by `heartbeat`.
+                Defaults to DEFAULT_LEASE_SECS.
+            max_attempts (int, optional): Number of times a job is claimed before it is
+                marked as failed. Defaults to DEFAULT_MAX_ATTEMPTS.
+        """
+        self.path = path
+        self.lease_secs = lease_secs
+        self.max_attempts = max_attempts
+        # transactions are started explicitly, see `_transaction`
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        with self._transaction():
+            self.db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    lease_until REAL,
+                    error TEXT,
+                    added REAL NOT NULL,
+                    finished REAL,
+                    UNIQUE (kind, target)
+                )
+                """
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        # IMMEDIATE takes the write lock right away, so reads and writes are atomic
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def add(self, kind: JobKind, target: str) -> bool:
+        """Add a job, unless the queue already has it.
+
+        Returns:
+            bool: Whether the job was added.
+        """
+        return self.add_many([(kind, target)]) == 1
+
+    def add_many(self, jobs: Iterable[tuple[JobKind, str]]) -> int:
+        """Add several jobs at once, skipping those the queue already has.
+
+        Returns:
+            int: Number of jobs that were added.
+        """
+        now = time.time()
+        with self._transaction():
+            return self.db.executemany(
+                "INSERT OR IGNORE INTO jobs (kind, target, added) VALUES (?, ?, ?)",
+                ((kind.value, _normalize(kind, target), now) for kind, target in jobs),
+            ).rowcount
+
+    def claim(self, worker: str) -> Job | None:
+        """Lease the oldest job that is pending or whose lease expired.
+
+        Args:
+            worker (str): Unique name of the worker, e.g. host name and process ID.
+
+        Returns:
+            Job | None: The claimed job, or None if there is nothing to do right now.
+        """
+        now = time.time()
+        with self._transaction():
+            expired = self.db.execute(
+                "UPDATE jobs SET state = 'failed', finished = ?,"
+                " error = 'worker stopped responding ' || attempts || ' times'"
+                " WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            ).rowcount
+            if expired:
+                logger.warning(f"Gave up on {expired} jobs whose workers died.")
+            row = self.db.execute(
+                "SELECT id, kind, target, attempts, state, worker FROM jobs"
+                " WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?)"
+                " ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, kind, target, attempts, state, previous = row
+            if state == JobState.LEASED:
+                logger.info(f"Taking over job {job_id} from worker {previous}.")
+            self.db.execute(
+                "UPDATE jobs SET state = 'leased', worker = ?, lease_until = ?,"
+                " attempts = attempts + 1 WHERE id = ?",
+                (worker, now + self.lease_secs, job_id),
+            )
+        return Job(job_id, JobKind(kind), target, attempts + 1)
+
+    def _update_leased(self, job: Job, worker: str, assignments: str, *args) -> bool:
+        """Update a job that `worker` still holds the lease of."""
+        with self._transaction():
+            return (
+                self.db.execute(
+                    f"UPDATE jobs SET {assignments}"  # noqa: S608
+                    " WHERE id = ? AND worker = ? AND state = 'leased'",
+                    (*args, job.id, worker),
+                ).rowcount
+                == 1
+            )
+
+    def heartbeat(self, job: Job, worker: str) -> bool:
+        """Renew the lease of a job.
+
+        Returns:
+            bool: False if the lease expired and another worker claimed the job.
+        """
+        return self._update_leased(
+            job, worker, "lease_until = ?", time.time() + self.lease_secs
+        )
+
+    def complete(self, job: Job, worker: str) -> bool:
+        """Mark a job as done, see `heartbeat` for the result."""
+        return self._update_leased(
+            job, worker, "state = 'done', finished = ?, error = NULL", time.time()
+        )
+
+    def fail(self, job: Job, worker: str, error: str) -> bool:
+        """Hand a job back to be tried again, or mark it as failed after `max_attempts`."""
+        state = (
+            JobState.FAILED if job.attempts >= self.max_attempts else JobState.PENDING
+        )
+        return self._update_leased(
+            job,
+            worker,
+            "state = ?, worker = NULL, finished = ?, error = ?",
+            state.value,
+            time.time(),
+            error,
+        )
+
+    def release(self, job: Job, worker: str) -> bool:
+        """Hand a job back without counting the attempt, e.g. when a worker is stopped."""
+        return self._update_leased(
+            job, worker, "state = 'pending', worker = NULL, attempts = attempts - 1"
+        )
+
+    def retry_failed(self) -> int:
+        """Make all failed jobs pending again.
+
+        Returns:
+            int: Number of jobs that will be tried again.
+        """
+        with self._transaction():
+            return self.db.execute(
+                "UPDATE jobs SET state = 'pending', attempts = 0, worker = NULL"
+                " WHERE state = 'failed'"
+            ).rowcount
+
+    def counts(self) -> dict[JobKind, dict[JobState, int]]:
+        """Return the number of jobs per kind and state."""
+        result = {kind: dict.fromkeys(JobState, 0) for kind in JobKind}
+        for kind, state, count in self.db.execute(
+            "SELECT kind, state, COUNT(*) FROM jobs GROUP BY kind, state"
+        ):
+            result[JobKind(kind)][JobState(state)] = count
+        return result
+
+    def failed(self) -> list[tuple[JobKind, str, str | None]]:
+        """Return the kind, target and last error of all failed jobs."""
+        return [
+            (JobKind(kind), target, error)
+            for kind, target, error in self.db.execute(
+                "SELECT kind, target, error FROM jobs WHERE state = 'failed' ORDER BY id"
+            )
+        ]
+
+    def has_open_jobs(self) -> bool:
+        """Whether any job is pending or leased, i.e. more work may come up."""
+        return (
+            self.db.execute(
+                "SELECT 1 FROM jobs WHERE state IN ('pending', 'leased') LIMIT 1"
+            ).fetchone()
+            is not None
+        )
+
+    def close(self) -> None:
+        """Close the database. Safe to call more than once."""
+        self.db.close()
@@ -0,0 +1,330 @@
+"""Job server of the `serve` command.
+
+`JobRunner` runs each submitted job in a crawler of its own, all at the same time in
+the running reactor. Connections are shared among the jobs, see
+`SharedPoolDownloadHandler`. `JobApi` exposes it over HTTP.
+
+API (JSON in and out):
+- `POST /jobs` submit a job, e.g. `{"command": "fetch", "urls": [...], "outdirectory": "images"}`
+- `GET /jobs` list all jobs
+- `GET /jobs/<id>` status and stats of a job
+- `GET /jobs/<id>/items?offset=N` scraped items of a `show`, `list` or `newsfeed` job,
+  from the `N`th on (defaults to 0)
+- `DELETE /jobs/<id>` stop a running job
+
+Commands and their parameters (all but `urls`, `outdirectory` and `parish` are optional):
+- `fetch`: like `parish fetch`: `urls`, `outdirectory`, `storage`, `pages`,
+  `single_page`, `resume`, `dedupe`
+- `show`: like `parish show`: `parish`
+- `list`: like `parish list`: `place`, `diocese`, `date_range`, `include_coordinates`
+- `newsfeed`: like `newsfeed fetch`: `limit`, `last_n_days`
+All commands accept `autotune` and `cache`.
+
+The server is meant to run for a long time, so it only keeps the latest
+`MAX_ITEMS_PER_JOB` items of each job and the latest `MAX_FINISHED_JOBS` finished
+jobs. Poll the items of a job with `offset` to receive all of them.
+"""
+
+import collections
+import dataclasses
+import itertools
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+import scrapy
+from scrapy import signals
+from scrapy.crawler import Crawler, CrawlerRunner
+from twisted.web.resource import Resource
+from twisted.web.server import Request
+
+from matricula_online_scraper.logging_config import get_logger
+from matricula_online_scraper.middlewares.http_cache import cache_settings
+from matricula_online_scraper.middlewares.shared_pool import shared_pool_settings
+from matricula_online_scraper.spiders.church_register import ChurchRegisterSpider
+from matricula_online_scraper.spiders.newsfeed_spider import NewsfeedSpider
+from matricula_online_scraper.spiders.parish import ParishSpider
+from matricula_online_scraper.spiders.parish_list import ParishMetadataSpider
+from matricula_online_scraper.utils.download_journal import DownloadJournal
+from matricula_online_scraper.utils.file_format import ImageStorage
+from matricula_online_scraper.utils.matricula_url import (
+    ParishPageURL,
+    ParishRegisterURL,
+)
+from matricula_online_scraper.utils.page_selection import PageSelection
+from matricula_online_scraper.utils.user_console import UserConsole
+
+logger = get_logger(__name__)
+usrcon = UserConsole()
+
+
+MAX_FINISHED_JOBS = 100
+"""Number of finished jobs that are kept, older ones are removed."""
+
+MAX_ITEMS_PER_JOB = 10_000
+"""Number of items that are kept per job, older ones are dropped."""
+
+
+@dataclasses.dataclass
+class ServedJob:
+    """A job submitted to `serve`."""
+
+    id: int
+    command: str
+    params: dict[str, Any]
+    crawler: Crawler
+    status: str = "running"
+    """One of running, finished, failed or stopped."""
+    error: str | None = None
+    created: float = dataclasses.field(default_factory=time.time)
+    finished: float | None = None
+    items: collections.deque = dataclasses.field(
+        default_factory=lambda: collections.deque(maxlen=MAX_ITEMS_PER_JOB)
+    )
+    """The latest items, see `items_since`."""
+    scraped: int = 0
+    """Number of items scraped so far, including dropped ones."""
+    journal: DownloadJournal | None = None
+
+    def add_item(self, item: Any) -> None:
+        """Keep a scraped item, dropping the oldest one if there are too many."""
+        self.items.append(_item_to_json(item))
+        self.scraped += 1
+
+    def items_since(self, offset: int) -> list[Any]:
+        """Return the items from the `offset`th scraped item on, as far as they are kept."""
+        dropped = self.scraped - len(self.items)
+        return list(itertools.islice(self.items, max(0, offset - dropped), None))
+
+    def to_json(self) -> dict[str, Any]:
+        """Return the job's status and stats, without its items."""
+        return {
+            "id": self.id,
+            "command": self.command,
+            "params": self.params,
+            "status": self.status,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+            "items": self.scraped,
+            "items_dropped": self.scraped - len(self.items),
+            "stats": self.crawler.stats.get_stats() if self.crawler.stats else {},
+        }
+
+
+def _item_to_json(item: Any) -> Any:
+    if dataclasses.is_dataclass(item) and not isinstance(item, type):
+        return dataclasses.asdict(item)
+    if isinstance(item, scrapy.Item):
+        return dict(item)
+    return item
+
+
+class JobRunner:
+    """Starts the crawlers of submitted jobs in the running reactor."""
+
+    def __init__(  # noqa: D107
+        self,
+        max_finished_jobs: int = MAX_FINISHED_JOBS,
+        max_items_per_job: int = MAX_ITEMS_PER_JOB,
+    ):
+        self.jobs: dict[int, ServedJob] = {}
+        self.max_finished_jobs = max_finished_jobs
+        self.max_items_per_job = max_items_per_job
+        self._ids = itertools.count(1)
+
+    def submit(self, params: dict[str, Any]) -> ServedJob:
+        """Start a job.
+
+        Raises:
+            ValueError: If the command is unknown or a parameter is invalid.
+        """
+        params = dict(params)
+        command = params.pop("command", None)
+        settings: dict[str, Any] = {
+            "AUTOTUNE_ENABLED": bool(params.get("autotune", False)),
+            # NOTE: Force a non-asyncio reactor, see `parish fetch`
+            "TWISTED_REACTOR": None,
+        } | shared_pool_settings()
+        if params.get("cache"):
+            settings |= cache_settings()
+
+        journal = None
+        match command:
+            case "fetch":
+                urls = params.get("urls")
+                if not urls or not isinstance(urls, list):
+                    raise ValueError("'urls' must be a non-empty list.")
+                for url in urls:
+                    if not ParishRegisterURL(url).is_valid:
+                        raise ValueError(f"Invalid parish register URL: {url}")
+                if not params.get("outdirectory"):
+                    raise ValueError("'outdirectory' is required.")
+                directory = Path(params["outdirectory"]).resolve()
+                storage = ImageStorage(params.get("storage", ImageStorage.REENCODE))
+                pages = params.get("pages")
+                selection = PageSelection.parse(pages) if pages else None
+                journal = DownloadJournal(directory)
+                settings |= {
+                    "IMAGES_STORE": f"cas://{directory}"
+                    if params.get("dedupe")
+                    else str(directory),
+                    "IMAGES_STORAGE": storage,
+                }
+                spider: type[scrapy.Spider] = ChurchRegisterSpider
+                kwargs: dict[str, Any] = {
+                    "start_urls": urls,
+                    "journal": journal,
+                    "resume": bool(params.get("resume", False)),
+                    "pages": selection,
+                    "single_page": bool(params.get("single_page", False)),
+                }
+            case "show":
+                parish = params.get("parish", "")
+                if not ParishPageURL(parish).is_valid:
+                    raise ValueError(f"Invalid parish URL: {parish}")
+                spider, kwargs = ParishSpider, {"start_urls": [parish]}
+            case "list":
+                date_range = params.get("date_range")
+                spider = ParishMetadataSpider
+                kwargs = {
+                    "place": params.get("place") or "",
+                    "diocese": params.get("diocese"),
+                    "date_filter": date_range is not None,
+                    "date_range": tuple(date_range or (0, 9999)),
+                    "include_coordinates": bool(
+                        params.get("include_coordinates", False)
+                    ),
+                }
+            case "newsfeed":
+                spider = NewsfeedSpider
+                kwargs = {
+                    "limit": params.get("limit"),
+                    "last_n_days": params.get("last_n_days"),
+                }
+            case _:
+                raise ValueError(
+                    f"Unknown command '{command}', choose from: fetch, show, list, newsfeed."
+                )
+
+        try:
+            runner = CrawlerRunner(settings=settings)
+            crawler = runner.create_crawler(spider)
+        except Exception:
+            if journal is not None:
+                journal.close()
+            raise
+        job = ServedJob(
+            next(self._ids),
+            command,
+            params,
+            crawler,
+            items=collections.deque(maxlen=self.max_items_per_job),
+            journal=journal,
+        )
+        if command != "fetch":  # pages are written to disk instead
+            crawler.signals.connect(
+                lambda item, response, spider: job.add_item(item),
+                signal=signals.item_scraped,
+                weak=False,
+            )
+        self.jobs[job.id] = job
+
+        deferred = runner.crawl(crawler, **kwargs)
+        deferred.addCallbacks(
+            lambda _: self._finish(job, None), lambda f: self._finish(job, f)
+        )
+        usrcon.info(f"Started {command} job {job.id}.")
+        return job
+
+    def _finish(self, job: ServedJob, failure) -> None:
+        job.finished = time.time()
+        if job.journal is not None:
+            job.journal.close()
+        if failure is not None:
+            logger.error(
+                f"Job {job.id} failed.",
+                exc_info=(failure.type, failure.value, failure.getTracebackObject()),
+            )
+            job.status, job.error = "failed", repr(failure.value)
+        elif job.status == "running":
+            job.status = "finished"
+        usrcon.info(f"{job.command.capitalize()} job {job.id} {job.status}.")
+        self._evict()
+
+    def _evict(self) -> None:
+        """Remove the oldest finished jobs beyond `max_finished_jobs`."""
+        finished = [job.id for job in self.jobs.values() if job.finished is not None]
+        for job_id in finished[: max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def stop(self, job: ServedJob) -> None:
+        """Stop a running job, keeping what it scraped so far."""
+        if job.status == "running":
+            job.status = "stopped"
+            job.crawler.stop()
+
+    def close(self) -> None:
+        """Flush the journals of running jobs, e.g. when the server is stopped."""
+        for job in self.jobs.values():
+            if job.journal is not None:
+                job.journal.close()
+
+
+class JobApi(Resource):
+    """HTTP/JSON API of `JobRunner`, see the module's docstring."""
+
+    isLeaf = True
+
+    def __init__(self, runner: JobRunner):  # noqa: D107
+        super().__init__()
+        self.runner = runner
+
+    def _respond(self, request: Request, status: int, data: Any) -> bytes:
+        request.setResponseCode(status)
+        request.setHeader(b"Content-Type", b"application/json")
+        return json.dumps(data, default=str, ensure_ascii=False).encode()
+
+    def _job(self, request: Request) -> ServedJob | None:
+        path = request.postpath or []
+        if len(path) < 2 or path[0] != b"jobs" or not path[1].isdigit():
+            return None
+        return self.runner.jobs.get(int(path[1]))
+
+    def render_GET(self, request: Request) -> bytes:  # noqa: D102, N802
+        path = [segment for segment in request.postpath or [] if segment]
+        if path == [b"jobs"]:
+            return self._respond(
+                request, 200, [job.to_json() for job in self.runner.jobs.values()]
+            )
+        job = self._job(request)
+        if job is None:
+            return self._respond(request, 404, {"error": "not found"})
+        if path[2:] == [b"items"]:
+            offset = (request.args or {}).get(b"offset", [b"0"])[0]
+            if not offset.isdigit():
+                return self._respond(
+                    request, 400, {"error": "'offset' must be a non-negative integer."}
+                )
+            return self._respond(request, 200, job.items_since(int(offset)))
+        return self._respond(request, 200, job.to_json())
+
+    def render_POST(self, request: Request) -> bytes:  # noqa: D102, N802
+        if [segment for segment in request.postpath or [] if segment] != [b"jobs"]:
+            return self._respond(request, 404, {"error": "not found"})
+        try:
+            params = json.loads(request.content.read() or b"{}")  # type: ignore
+            if not isinstance(params, dict):
+                raise ValueError("The body must be a JSON object.")
+            job = self.runner.submit(params)
+        except (ValueError, TypeError, OSError) as e:
+            return self._respond(request, 400, {"error": str(e)})
+        return self._respond(request, 201, job.to_json())
+
+    def render_DELETE(self, request: Request) -> bytes:  # noqa: D102, N802
+        job = self._job(request)
+        if job is None:
+            return self._respond(request, 404, {"error": "not found"})
+        self.runner.stop(job)
+        return self._respond(request, 202, job.to_json())
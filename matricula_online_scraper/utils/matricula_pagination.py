@@ -1,7 +1,28 @@
-"""Utility functions to work with Matricula's pagination and URLs."""
+"""Utility functions to work with Matricula's pagination and URLs.
 
+Listings like the search results, a parish's registers or the newsfeed are split into
+pages. Following the "next" link of each page makes a crawl a chain of sequential
+round-trips. `PaginationSpiderMixin` instead reads the last page from the pagination
+component of the first response and requests all remaining pages at once. Their output
+is buffered and yielded in the order of the pages, as if they were crawled one by one.
+"""
+
+import asyncio
+import itertools
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import Any
 from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
 
+from scrapy.http.response import Response
+from scrapy.spidermiddlewares.httperror import HttpError
+from twisted.internet.defer import CancelledError
+
+from matricula_online_scraper.logging_config import get_logger
+
+logger = get_logger(__name__)
+
 
 def create_next_url(current: str, next_page: str) -> str:
     """Combines the current Matricula URL with the next page number.
@@ -31,7 +52,132 @@ def create_next_url(current: str, next_page: str) -> str:
     params = {"page": next_page}
     query.update(params)  # type: ignore # NOTE: it's fine, leave it as is
 
-    url_parts[4] = urlencode(query)
+    url_parts[4] = urlencode(query, doseq=True)
     new_url = urlunparse(url_parts)
 
     return new_url
+
+
+def page_number(url: str) -> int:
+    """Return the page of a listing that `url` points to, i.e. its `?page=`.
+
+    Example:
+    >>> page_number("https://data.matricula-online.eu/de/nachrichten/?page=3")
+    ... 3
+    """
+    try:
+        return int(parse_qs(urlparse(url).query)["page"][0])
+    except (KeyError, ValueError):
+        return 1
+
+
+def last_page_number(response: Response) -> int | None:
+    """Return the highest page linked by the pagination component of `response`.
+
+    Returns:
+        int | None: The page number or `None` if `response` has no pagination.
+    """
+    pages = [
+        page_number(href)
+        for href in response.css("ul.pagination a.page-link::attr('href')").getall()
+        if "page=" in href
+    ]
+    return max(pages, default=None)
+
+
+@dataclass
+class _Listing:
+    """State of a paginated listing that is being crawled."""
+
+    next_page: int
+    """Page whose output is yielded next."""
+    last_page: int
+    """Highest page that was requested."""
+    output: dict[int, list[Any]] = field(default_factory=dict)
+    """Output of pages that arrived before `next_page`."""
+
+
+class PaginationSpiderMixin(ABC):
+    """Requests all pages of a listing at once and yields their output in order.
+
+    Spiders implement `parse_page` to scrape a single page instead of `parse`.
+    Each response handled by `parse` starts a new listing, unless it was requested
+    by the mixin. Hence, multiple listings can be crawled at the same time, e.g.
+    several parishes.
+
+    Pages are requested with a lower priority the higher their number, so they are
+    downloaded roughly in order and a spider that is closed early, e.g. by raising
+    `CloseSpider` in `in_page_order`, did not download many pages in vain.
+
+    If the pagination component only shows some pages around the current one, the
+    pages beyond are requested once a page that links them was downloaded.
+    """
+
+    _listings: dict[int, _Listing]
+    _listing_ids: Iterator[int]
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):  # noqa: D102
+        spider = super().from_crawler(crawler, *args, **kwargs)  # type: ignore
+        spider._listings = {}
+        spider._listing_ids = itertools.count()
+        return spider
+
+    @abstractmethod
+    def parse_page(self, response: Response, **kwargs) -> Iterator[Any]:
+        """Scrape the items of a single page of a listing."""
+
+    def in_page_order(self, output: Iterator[Any]) -> Iterator[Any]:
+        """Process the output of `parse_page` in the order of the pages.
+
+        Override this to e.g. stop after a number of items, by raising `CloseSpider`.
+        """
+        return output
+
+    def parse(self, response: Response, **kwargs):  # noqa: D102
+        if "listing" in response.meta:
+            key, page = response.meta["listing"], response.meta["listing_page"]
+        else:  # the first page of a new listing
+            key, page = next(self._listing_ids), page_number(response.url)
+            self._listings[key] = _Listing(next_page=page, last_page=page)
+        listing = self._listings[key]
+
+        last_page = last_page_number(response)
+        if last_page is not None and last_page > listing.last_page:
+            for number in range(listing.last_page + 1, last_page + 1):
+                yield response.follow(
+                    create_next_url(response.url, str(number)),
+                    self.parse,
+                    errback=self._page_failed,
+                    priority=-number,
+                    meta={"listing": key, "listing_page": number},
+                )
+            logger.debug(
+                f"Requested pages {listing.last_page + 1}-{last_page} of {response.url}"
+            )
+            listing.last_page = last_page
+
+        listing.output[page] = list(self.parse_page(response, **kwargs))
+        yield from self.in_page_order(self._release(key))
+
+    def _page_failed(self, failure):
+        request = failure.request
+        # HTTP errors are already reported by `HTTPErrorLoggingMiddleware`, pages are
+        # cancelled if the spider is closed early, which raises asyncio's
+        # `CancelledError` with the asyncio reactor
+        if not failure.check(HttpError, CancelledError, asyncio.CancelledError):
+            logger.error(f"Failed to fetch {request.url}: {failure.value!r}")
+        # skip the page to not hold back the pages after it
+        self._listings[request.meta["listing"]].output[
+            request.meta["listing_page"]
+        ] = []
+        yield from self.in_page_order(self._release(request.meta["listing"]))
+
+    def _release(self, key: int) -> Iterator[Any]:
+        """Yield the output of all pages that are next in order."""
+        listing = self._listings[key]
+        while listing.next_page in listing.output:
+            yield from listing.output.pop(listing.next_page)
+            listing.next_page += 1
+        if listing.next_page > listing.last_page:
+            del self._listings[key]
@@ -0,0 +1,84 @@
+"""Selection of pages of a register, e.g. to only download some pages with `parish fetch --pages`.
+
+Pages are numbered starting at 1, the same as the `?pg=` parameter in Matricula's viewer.
+A selection is a comma-separated list of single pages and ranges:
+
+- `7`: only page 7
+- `10-40`: pages 10 to 40 (both inclusive)
+- `1500-`: page 1500 until the last page
+- `-5`: the first 5 pages
+
+Example:
+>>> selection = PageSelection.parse("10-12,55")
+>>> selection.select(60)
+[10, 11, 12, 55]
+>>> 11 in selection
+True
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class PageSelection:
+    """Selection of pages, each range is given by its first and last page (inclusive)."""
+
+    ranges: tuple[tuple[int, int | None], ...]
+    """Ranges of selected pages, the last page is None for open-ended ranges."""
+
+    def __str__(self) -> str:  # noqa: D105
+        return ",".join(
+            str(first) if first == last else f"{first}-{last or ''}"
+            for first, last in self.ranges
+        )
+
+    def __contains__(self, page: int) -> bool:  # noqa: D105
+        return any(
+            first <= page and (last is None or page <= last)
+            for first, last in self.ranges
+        )
+
+    @classmethod
+    def single(cls, page: int) -> "PageSelection":
+        """Select a single page."""
+        return cls(((page, page),))
+
+    @classmethod
+    def parse(cls, spec: str) -> "PageSelection":
+        """Parse a selection like `10-40,55`.
+
+        Raises:
+            ValueError: If the selection is malformed.
+        """
+        ranges: list[tuple[int, int | None]] = []
+        for part in spec.split(","):
+            part = part.strip()
+            first, sep, last = part.partition("-")
+            if not first.strip() and not last.strip():
+                raise ValueError(f"Invalid page or page range: '{part}'")
+            try:
+                start = int(first) if first.strip() else 1
+                end = (int(last) if last.strip() else None) if sep else start
+            except ValueError:
+                raise ValueError(f"Invalid page or page range: '{part}'") from None
+            if start < 1 or (end is not None and end < start):
+                raise ValueError(
+                    f"Invalid page range: '{part}'. Pages start at 1 and ranges must be ascending."
+                )
+            ranges.append((start, end))
+        return cls(tuple(ranges))
+
+    @classmethod
+    def _from_arg(cls, value: str) -> "PageSelection":
+        """Create a PageSelection from a CLI argument.
+
+        NOTE: This method is intended to be used as a typer parser for CLIs.
+        """
+        return cls.parse(value)
+
+    def select(self, count: int) -> list[int]:
+        """Return the selected pages of a register with `count` pages, in order.
+
+        Pages beyond the end of the register are ignored, duplicates are removed.
+        """
+        return [page for page in range(1, count + 1) if page in self]
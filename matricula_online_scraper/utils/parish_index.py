@@ -0,0 +1,124 @@
+"""In-memory index to search a snapshot of `parish list`, see `--from-snapshot`.
+
+Instead of searching on Matricula, the parishes of a snapshot (e.g. the cached
+`parishes.csv.gz`) are loaded once and indexed:
+
+- every word of a parish's name, region and country, lowercased and without accents,
+  points to the parishes containing it. The words are kept sorted, so all words
+  starting with a prefix are found by a binary search.
+- each country and region points to its parishes.
+
+A search for a place matches the parishes that contain a word starting with each word
+of the query, e.g. "st. mar" matches "St. Mariä Himmelfahrt" as well as "St. Martin".
+
+Example:
+>>> index = ParishIndex(load_snapshot(Path("parishes.csv.gz")).values())
+>>> index.search(place="aachen", country="Deutschland")
+[{'country': 'Deutschland', 'region': 'Aachen', 'name': 'Aachen, St. Adalbert', …}, …]
+"""
+
+import bisect
+import functools
+import re
+import unicodedata
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from matricula_online_scraper.spiders.parish_list import ParishMetadata
+
+
+def normalize(text: str) -> str:
+    """Lowercase `text` and strip its accents, e.g. "Österreich" becomes "osterreich"."""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> list[str]:
+    """Split `text` into normalized words."""
+    return re.findall(r"\w+", normalize(text))
+
+
+# regions and countries are shared by many parishes
+_tokenize_cached = functools.lru_cache(maxsize=4096)(tokenize)
+
+
+class ParishIndex:
+    """Parishes indexed by the words of their name, region and country."""
+
+    def __init__(self, parishes: Iterable["ParishMetadata"]):  # noqa: D107
+        self.parishes = list(parishes)
+        self._postings: dict[str, set[int]] = {}
+        """Word -> positions in `parishes`."""
+        self._countries: dict[str, set[int]] = {}
+        self._regions: dict[str, set[int]] = {}
+        for i, parish in enumerate(self.parishes):
+            tokens = {
+                *tokenize(parish["name"]),
+                *_tokenize_cached(parish["region"]),
+                *_tokenize_cached(parish["country"]),
+            }
+            for token in tokens:
+                self._postings.setdefault(token, set()).add(i)
+            self._countries.setdefault(parish["country"], set()).add(i)
+            self._regions.setdefault(parish["region"], set()).add(i)
+        # normalized afterwards, there are only a few hundred of them
+        self._countries = self._normalized(self._countries)
+        self._regions = self._normalized(self._regions)
+        self._tokens = sorted(self._postings)
+
+    @staticmethod
+    def _normalized(buckets: dict[str, set[int]]) -> dict[str, set[int]]:
+        """Merge the buckets whose keys are equal once normalized."""
+        result: dict[str, set[int]] = {}
+        for key, ids in buckets.items():
+            result.setdefault(normalize(key), set()).update(ids)
+        return result
+
+    def _prefixed(self, prefix: str) -> set[int]:
+        """Parishes with a word that starts with `prefix`."""
+        matches: set[int] = set()
+        start = bisect.bisect_left(self._tokens, prefix)
+        for token in self._tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            matches |= self._postings[token]
+        return matches
+
+    @staticmethod
+    def _bucket(buckets: dict[str, set[int]], value: str) -> set[int]:
+        """Parishes of all buckets whose normalized key starts with `value`."""
+        prefix = normalize(value).strip()
+        return set().union(
+            *(ids for key, ids in buckets.items() if key.startswith(prefix))
+        )
+
+    def search(
+        self,
+        place: str | None = None,
+        country: str | None = None,
+        region: str | None = None,
+    ) -> list["ParishMetadata"]:
+        """Return the parishes matching all given filters in the snapshot's order.
+
+        Args:
+            place (str | None, optional): Words that each start a word of the name,
+                region or country.
+            country (str | None, optional): Start of the country, e.g. "deutsch".
+            region (str | None, optional): Start of the region, e.g. "passau".
+        """
+        matches: set[int] | None = None
+        candidates = [self._prefixed(token) for token in tokenize(place or "")]
+        if country:
+            candidates.append(self._bucket(self._countries, country))
+        if region:
+            candidates.append(self._bucket(self._regions, region))
+        for ids in sorted(candidates, key=len):
+            matches = ids if matches is None else matches & ids
+            if not matches:
+                break
+        if matches is None:  # no filters
+            return list(self.parishes)
+        return [self.parishes[i] for i in sorted(matches)]
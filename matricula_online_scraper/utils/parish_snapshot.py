@@ -0,0 +1,153 @@
+"""Previous output of `parish list` to sync against, see `parish list --since`.
+
+Scraping all parishes from scratch takes one request per parish for its coordinates.
+A snapshot, i.e. the output of an earlier run, is loaded into an index keyed by URL.
+The spider reuses the coordinates of parishes whose search result did not change and
+only requests the pages of new or changed ones. `SnapshotDiff` then compares the new
+results with the snapshot and lists the parishes that were added, removed or changed.
+
+Snapshots can be in any format of `FileFormat` and compressed with gzip, like the
+cached `parishes.csv.gz`.
+
+Example:
+>>> snapshot = load_snapshot(Path("parishes.csv.gz"))
+>>> diff = SnapshotDiff(snapshot)
+>>> diff.add({"country": "Deutschland", "region": "Aachen", "name": "…", "url": "…"})
+>>> diff.write(Path("parishes.diff.jsonl"))
+"""
+
+import csv
+import gzip
+import json
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any
+
+from matricula_online_scraper.logging_config import get_logger
+from matricula_online_scraper.utils.file_format import FileFormat
+
+if TYPE_CHECKING:
+    from matricula_online_scraper.spiders.parish_list import ParishMetadata
+
+logger = get_logger(__name__)
+
+
+SEARCH_FIELDS = ("country", "region", "name")
+"""Fields of a parish that are shown in the search results, besides its URL."""
+
+COORDINATE_FIELDS = ("longitude", "latitude")
+"""Fields of a parish that require a request of its page."""
+
+
+def _open(path: Path) -> tuple[IO[str], FileFormat]:
+    """Open a snapshot for reading and return its format, decompressing `.gz` files."""
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8"), FileFormat(
+            Path(path.stem).suffix[1:]
+        )
+    return path.open(encoding="utf-8"), FileFormat(path.suffix[1:])
+
+
+def load_snapshot(path: Path) -> dict[str, "ParishMetadata"]:
+    """Load the output of `parish list` and index the parishes by their URL.
+
+    Args:
+        path (Path): A JSON Lines, JSON or CSV file, optionally compressed with gzip.
+
+    Raises:
+        ValueError: If the format is not supported or a parish has no URL.
+    """
+    file, format = _open(path)
+    with file:
+        match format:
+            case FileFormat.JSONL:
+                parishes = [json.loads(line) for line in file if line.strip()]
+            case FileFormat.JSON:
+                parishes = json.load(file)
+            case FileFormat.CSV:
+                parishes = list(csv.DictReader(file))
+
+    snapshot: dict[str, ParishMetadata] = {}
+    for parish in parishes:
+        if not parish.get("url"):
+            raise ValueError(f"Parish without a URL in {path}: {parish}")
+        for key in COORDINATE_FIELDS:
+            # CSV files have empty cells for parishes without coordinates
+            if parish.get(key) in ("", None):
+                parish.pop(key, None)
+            else:
+                parish[key] = float(parish[key])
+        snapshot[parish["url"]] = parish
+    logger.debug(f"Loaded {len(snapshot)} parishes from snapshot {path}")
+    return snapshot
+
+
+def write_snapshot(
+    parishes: list["ParishMetadata"], file: IO[str], format: FileFormat
+) -> None:
+    """Write parishes like `parish list` does, the counterpart of `load_snapshot`."""
+    match format:
+        case FileFormat.JSONL:
+            for parish in parishes:
+                file.write(json.dumps(parish) + "\n")
+        case FileFormat.JSON:
+            # like Scrapy's exporter, one parish per line
+            file.write("[\n" + ",\n".join(json.dumps(p) for p in parishes) + "\n]")
+        case FileFormat.CSV:
+            # all columns, e.g. not every parish has coordinates
+            fields = list(dict.fromkeys(key for parish in parishes for key in parish))
+            writer = csv.DictWriter(file, fields)
+            writer.writeheader()
+            writer.writerows(parishes)
+
+
+def is_unchanged(parish: dict[str, Any], known: dict[str, Any] | None) -> bool:
+    """Whether the search result of `parish` equals its `known` entry in a snapshot."""
+    return known is not None and all(
+        parish.get(key) == known.get(key) for key in SEARCH_FIELDS
+    )
+
+
+class SnapshotDiff:
+    """Compares the parishes of a run with a snapshot, see `parish list --diff`."""
+
+    def __init__(self, snapshot: dict[str, "ParishMetadata"]):  # noqa: D107
+        self.snapshot = snapshot
+        self.added: list[ParishMetadata] = []
+        self.changed: list[tuple[ParishMetadata, ParishMetadata]] = []
+        """Pairs of the previous and the current entry."""
+        self._seen: set[str] = set()
+
+    def add(self, parish: "ParishMetadata") -> None:
+        """Record a parish scraped in this run."""
+        self._seen.add(parish["url"])
+        known = self.snapshot.get(parish["url"])
+        if known is None:
+            self.added.append(parish)
+        elif not is_unchanged(parish, known):
+            self.changed.append((known, parish))
+
+    @property
+    def removed(self) -> list["ParishMetadata"]:
+        """Parishes of the snapshot that were not scraped in this run."""
+        return [
+            parish for url, parish in self.snapshot.items() if url not in self._seen
+        ]
+
+    def write(self, path: Path) -> None:
+        """Write the differences as JSON Lines, one object per parish.
+
+        Each line has a `change` (`added`, `removed` or `changed`) and the `parish`.
+        Changed parishes also have their `previous` entry.
+        """
+        with path.open("w", encoding="utf-8") as file:
+            for parish in self.added:
+                file.write(json.dumps({"change": "added", "parish": parish}) + "\n")
+            for parish in self.removed:
+                file.write(json.dumps({"change": "removed", "parish": parish}) + "\n")
+            for previous, parish in self.changed:
+                file.write(
+                    json.dumps(
+                        {"change": "changed", "parish": parish, "previous": previous}
+                    )
+                    + "\n"
+                )
@@ -0,0 +1,174 @@
+"""Worker of `queue work` that claims and runs jobs of a `JobQueue`.
+
+Jobs run in crawlers of a single `CrawlerRunner`: a register job downloads the register\
+like `parish fetch --resume`, a parish job queues a register job for each of its\
+registers and a search job queues a parish job for each parish it finds.
+"""
+
+import os
+import socket
+from typing import Any
+
+from rich.markup import escape
+from scrapy import signals
+from scrapy.crawler import CrawlerRunner
+from twisted.internet import reactor
+from twisted.internet.task import LoopingCall, deferLater
+
+from matricula_online_scraper.logging_config import get_logger
+from matricula_online_scraper.spiders.church_register import ChurchRegisterSpider
+from matricula_online_scraper.spiders.parish import (
+    ParishRegisterMetadata,
+    ParishSpider,
+)
+from matricula_online_scraper.spiders.parish_list import ParishMetadataSpider
+from matricula_online_scraper.utils.download_journal import DownloadJournal
+from matricula_online_scraper.utils.job_queue import Job, JobKind, JobQueue
+from matricula_online_scraper.utils.user_console import UserConsole
+
+logger = get_logger(__name__)
+usrcon = UserConsole()
+
+
+POLL_INTERVAL_SECS = 10
+"""Time a worker waits before asking for a job again, when there was none."""
+
+
+class QueueWorker:
+    """Claims and runs jobs in a single reactor, one job per loop of `run`.
+
+    Jobs run concurrently by starting `run` several times, like `queue work --jobs`.
+    """
+
+    def __init__(  # noqa: D107
+        self,
+        queue: JobQueue,
+        runner: CrawlerRunner,
+        journal: DownloadJournal,
+        exit_when_empty: bool,
+    ):
+        self.queue = queue
+        self.runner = runner
+        self.journal = journal
+        self.exit_when_empty = exit_when_empty
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.active: dict[int, Job] = {}
+        self.stopping = False
+        self.done = 0
+        self.failed = 0
+
+    async def run(self) -> None:
+        """Run jobs one after another until stopped or, optionally, until none is left."""
+        while not self.stopping:
+            job = self.queue.claim(self.name)
+            if job is None:
+                if self.exit_when_empty and not self.queue.has_open_jobs():
+                    return
+                await deferLater(reactor, POLL_INTERVAL_SECS)
+                continue
+            await self._run_job(job)
+
+    async def _run_job(self, job: Job) -> None:
+        logger.info(f"Running {job.kind.value} job {job.id}: {job.target}")
+        self.active[job.id] = job
+        heartbeat = LoopingCall(self._heartbeat, job)
+        heartbeat.start(self.queue.lease_secs / 3, now=False)
+        try:
+            error = await self._dispatch(job)
+        except Exception as exception:
+            logger.exception(f"Job {job.id} failed with an unknown exception.")
+            error = repr(exception)
+        finally:
+            heartbeat.stop()
+            del self.active[job.id]
+
+        if self.stopping:  # handed back by `release`
+            return
+        target = escape(job.target)
+        if error is None:
+            self.done += 1
+            self.queue.complete(job, self.name)
+            usrcon.success(f"Done with {job.kind.value} {target}")
+        else:
+            self.failed += 1
+            self.queue.fail(job, self.name, error)
+            usrcon.warning(
+                f"{job.kind.value.capitalize()} {target} failed"
+                f" (attempt {job.attempts} of {self.queue.max_attempts}): {escape(error)}"
+            )
+
+    def _heartbeat(self, job: Job) -> None:
+        if not self.queue.heartbeat(job, self.name):
+            logger.warning(
+                f"Lost the lease of job {job.id}, another worker may run it as well."
+            )
+
+    async def _crawl(self, spider: type, **kwargs: Any) -> tuple[list, Any]:
+        """Run a spider and return the items it scraped and its stats."""
+        crawler = self.runner.create_crawler(spider)
+        items: list = []
+        crawler.signals.connect(
+            lambda item, response, spider: items.append(item),
+            signal=signals.item_scraped,
+            weak=False,
+        )
+        await self.runner.crawl(crawler, **kwargs)
+        return items, crawler.stats
+
+    async def _dispatch(self, job: Job) -> str | None:
+        """Run a job and return why it failed, or None if it succeeded."""
+        match job.kind:
+            case JobKind.REGISTER:
+                items, stats = await self._crawl(
+                    ChurchRegisterSpider,
+                    start_urls=[job.target],
+                    journal=self.journal,
+                    # pages from an earlier attempt are not requested again
+                    resume=True,
+                )
+                if not items:
+                    # no pages were missing, e.g. taken over from a worker that died
+                    # after downloading the last page
+                    progress = self.journal.get(job.target)
+                    if progress is not None and progress.is_complete:
+                        return None
+                    return "register could not be read"
+                if failed := stats.get_value("file_status_count/failed", 0):
+                    return f"{failed} pages failed to download"
+            case JobKind.PARISH:
+                items, _ = await self._crawl(ParishSpider, start_urls=[job.target])
+                if not items:
+                    return "parish could not be read"
+                registers = [
+                    item.url
+                    for item in items
+                    if isinstance(item, ParishRegisterMetadata)
+                ]
+                added = self.queue.add_many(
+                    (JobKind.REGISTER, url) for url in registers
+                )
+                usrcon.info(f"Queued {added} registers of {escape(job.target)}")
+            case JobKind.SEARCH:
+                search = job.search
+                date_range = search["date_range"]
+                items, _ = await self._crawl(
+                    ParishMetadataSpider,
+                    place=search["place"],
+                    diocese=search["diocese"],
+                    date_filter=date_range is not None,
+                    date_range=tuple(date_range or (0, 9999)),
+                    include_coordinates=False,
+                )
+                if not items:
+                    return "no parishes found"
+                added = self.queue.add_many(
+                    (JobKind.PARISH, item["url"]) for item in items
+                )
+                usrcon.info(f"Queued {added} parishes found by search {job.id}")
+        return None
+
+    def release(self) -> None:
+        """Hand back the jobs that are running, so that other workers take them over."""
+        self.stopping = True
+        for job in self.active.values():
+            self.queue.release(job, self.name)
@@ -0,0 +1,86 @@
+"""Order in which the registers of `parish fetch` are downloaded, see `RegisterPipelineMixin`.
+
+Without it, the image pipelines start downloading all pages of a register as soon as
+the register was parsed. With hundreds of registers, their pages are interleaved in the
+downloader's queue, all registers complete near the end of the run and the memory grows
+with the number of half-done registers.
+
+`RegisterScheduler` admits at most `max_registers` registers at once, the others wait
+until an admitted register is complete. Waiting registers are admitted in the order
+they were parsed or, with `largest_first`, the largest first, so that the longest
+downloads do not start last and keep the run going on their own. Each admitted register
+gets a limiter that allows at most `max_pages` of its pages to be downloaded at once.
+
+Example:
+>>> scheduler = RegisterScheduler(max_registers=1, max_pages=8)
+>>> first = scheduler.admit(pages=100)  # fires right away
+>>> second = scheduler.admit(pages=20)  # fires once `scheduler.finish()` is called
+"""
+
+import heapq
+import itertools
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from twisted.internet.defer import Deferred
+
+# NOTE: Twisted is imported when a register is admitted, because the defaults below
+# are also needed by `parish fetch --help`, which should not wait for Twisted.
+
+DEFAULT_MAX_REGISTERS = 4
+"""Number of registers that are downloaded at once."""
+
+DEFAULT_MAX_PAGES = 16
+"""Number of pages per register that are downloaded at once."""
+
+
+class RegisterScheduler:
+    """Admits a bounded number of registers and bounds the pages in flight of each."""
+
+    def __init__(  # noqa: D107
+        self,
+        max_registers: int = DEFAULT_MAX_REGISTERS,
+        max_pages: int = DEFAULT_MAX_PAGES,
+        largest_first: bool = False,
+    ):
+        if max_registers < 1 or max_pages < 1:
+            raise ValueError("At least one register and page must be allowed at once.")
+        self.max_registers = max_registers
+        self.max_pages = max_pages
+        self.largest_first = largest_first
+        self.active = 0
+        """Number of registers that were admitted and are not finished yet."""
+        # (priority, order of arrival, Deferred) of the registers that wait
+        self._waiting: list[tuple[int, int, "Deferred"]] = []
+        self._arrivals = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        """Number of registers that wait to be admitted."""
+        return len(self._waiting)
+
+    def admit(self, pages: int) -> "Deferred":
+        """Return a Deferred that fires with the register's page limiter once it may start.
+
+        Args:
+            pages (int): Number of pages of the register to download.
+        """
+        from twisted.internet.defer import Deferred, DeferredSemaphore, succeed
+
+        if self.active < self.max_registers:
+            self.active += 1
+            return succeed(DeferredSemaphore(self.max_pages))
+        admitted: Deferred = Deferred()
+        priority = -pages if self.largest_first else 0
+        heapq.heappush(self._waiting, (priority, next(self._arrivals), admitted))
+        return admitted
+
+    def finish(self) -> None:
+        """Admit the next register in place of one that is complete."""
+        from twisted.internet.defer import DeferredSemaphore
+
+        if self._waiting:
+            *_, admitted = heapq.heappop(self._waiting)
+            admitted.callback(DeferredSemaphore(self.max_pages))
+        else:
+            self.active -= 1
@@ -0,0 +1,245 @@
+"""Spatial index of parishes by their coordinates, see `parish locate`.
+
+Finding the parishes near a place by computing the distance to every parish of a
+snapshot is slow and needs the whole snapshot in memory. `SpatialIndex` keeps the
+coordinates in two arrays, ordered as an implicit k-d tree: the median of each range
+is the node that splits it, alternately by latitude and longitude, with the smaller
+values before and the larger ones after it. A query only visits the ranges that can
+contain a match.
+
+The index is saved to a compact file next to the snapshot: a header, the arrays of
+latitudes and longitudes, the offsets of the parishes and the parishes themselves as
+JSON. Opening it only reads the arrays, a parish is read once it matched.
+
+- `bbox` finds the parishes within a bounding box.
+- `within` finds the parishes within a radius around a point. It searches the
+  bounding box of that circle and sorts the parishes in it by their distance.
+- `nearest` finds the closest parishes, by searching ever larger circles.
+
+Example:
+>>> index = SpatialIndex.build(load_snapshot(Path("parishes.csv.gz")).values())
+>>> for distance, i in index.within(50.77, 6.08, radius_km=5):
+...     print(f"{distance:.1f} km", index.parish(i)["url"])
+"""
+
+import json
+import math
+import struct
+import sys
+from array import array
+from collections.abc import Iterable
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from matricula_online_scraper.spiders.parish_list import ParishMetadata
+
+EARTH_RADIUS_KM = 6371.0088
+"""Mean radius of the earth."""
+
+INDEX_SUFFIX = ".spatial"
+"""Suffix of the index file next to its snapshot, see `SpatialIndex.save`."""
+
+_MAGIC = b"matricula-spatial-index-1\n"
+_HEADER = struct.Struct("<cQ")
+"""Byte order of the arrays and number of parishes."""
+_BYTE_ORDER = b"<" if sys.byteorder == "little" else b">"
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def circle_bounds(
+    lat: float, lon: float, radius_km: float
+) -> list[tuple[float, float, float, float]]:
+    """Return bounding boxes that contain the circle around a point.
+
+    Returns:
+        list[tuple[float, float, float, float]]: `(south, west, north, east)` in
+            degrees, two boxes if the circle crosses the antimeridian.
+    """
+    # https://janmatuschek.de/LatitudeLongitudeBoundingCoordinates
+    distance = radius_km / EARTH_RADIUS_KM
+    phi = math.radians(lat)
+    south, north = phi - distance, phi + distance
+    if south <= -math.pi / 2 or north >= math.pi / 2:  # contains a pole
+        return [
+            (max(math.degrees(south), -90), -180, min(math.degrees(north), 90), 180)
+        ]
+
+    delta = math.degrees(math.asin(math.sin(distance) / math.cos(phi)))
+    south, north = math.degrees(south), math.degrees(north)
+    west, east = lon - delta, lon + delta
+    if west < -180:
+        return [(south, west + 360, north, 180), (south, -180, north, east)]
+    if east > 180:
+        return [(south, west, north, 180), (south, -180, north, east - 360)]
+    return [(south, west, north, east)]
+
+
+class SpatialIndex:
+    """Parishes with coordinates, ordered as an implicit k-d tree."""
+
+    def __init__(  # noqa: D107
+        self,
+        latitudes: array,
+        longitudes: array,
+        offsets: array,
+        records: bytes | IO[bytes],
+        records_start: int = 0,
+    ):
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self._offsets = offsets
+        """Position of each parish in `records`, and its end."""
+        self._records = records
+        """The parishes as JSON, in memory or in the index file."""
+        self._records_start = records_start
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self.latitudes)
+
+    @classmethod
+    def build(cls, parishes: Iterable["ParishMetadata"]) -> "SpatialIndex":
+        """Index the parishes that have coordinates."""
+        points = [
+            (
+                parish["latitude"],  # type: ignore
+                parish["longitude"],  # type: ignore
+                json.dumps(parish, ensure_ascii=False, separators=(",", ":")).encode(),
+            )
+            for parish in parishes
+            if parish.get("latitude") is not None
+            and parish.get("longitude") is not None
+        ]
+        ordered: list[Any] = [None] * len(points)
+        # place the median of each range in its middle, the others to its sides
+        stack = [(0, len(points), 0, points)]
+        while stack:
+            lo, hi, axis, items = stack.pop()
+            if lo >= hi:
+                continue
+            items.sort(key=lambda point: point[axis])
+            mid = (lo + hi) // 2
+            ordered[mid] = items[mid - lo]
+            stack.append((lo, mid, 1 - axis, items[: mid - lo]))
+            stack.append((mid + 1, hi, 1 - axis, items[mid - lo + 1 :]))
+
+        offsets = array("q", [0])
+        for _, _, record in ordered:
+            offsets.append(offsets[-1] + len(record))
+        return cls(
+            array("d", (point[0] for point in ordered)),
+            array("d", (point[1] for point in ordered)),
+            offsets,
+            b"".join(point[2] for point in ordered),
+        )
+
+    def save(self, path: Path) -> None:
+        """Write the index to a file, see `open`."""
+        assert isinstance(self._records, bytes), "the index was opened from a file"
+        with path.open("wb") as file:
+            file.write(_MAGIC)
+            file.write(_HEADER.pack(_BYTE_ORDER, len(self)))
+            self.latitudes.tofile(file)
+            self.longitudes.tofile(file)
+            self._offsets.tofile(file)
+            file.write(self._records)
+
+    @classmethod
+    def open(cls, path: Path) -> "SpatialIndex":
+        """Read the arrays of an index file, the parishes are read when needed.
+
+        Raises:
+            ValueError: If `path` is not an index file.
+        """
+        file = path.open("rb")
+        try:
+            if file.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"Not a spatial index: {path}")
+            byte_order, count = _HEADER.unpack(file.read(_HEADER.size))
+            arrays = []
+            for typecode, length in (("d", count), ("d", count), ("q", count + 1)):
+                values = array(typecode)
+                values.fromfile(file, length)
+                if byte_order != _BYTE_ORDER:
+                    values.byteswap()
+                arrays.append(values)
+        except (ValueError, EOFError, struct.error) as e:
+            file.close()
+            raise ValueError(f"Invalid spatial index {path}: {e}") from e
+        return cls(*arrays, records=file, records_start=file.tell())
+
+    def close(self) -> None:
+        """Close the index file, if the index was opened from one."""
+        if not isinstance(self._records, bytes):
+            self._records.close()
+
+    def parish(self, i: int) -> "ParishMetadata":
+        """Return the parish at position `i` of the index."""
+        start, end = self._offsets[i], self._offsets[i + 1]
+        if isinstance(self._records, bytes):
+            return json.loads(self._records[start:end])
+        self._records.seek(self._records_start + start)
+        return json.loads(self._records.read(end - start))
+
+    def bbox(self, south: float, west: float, north: float, east: float) -> list[int]:
+        """Return the positions of the parishes within a bounding box (in degrees)."""
+        latitudes, longitudes = self.latitudes, self.longitudes
+        matches = []
+        stack = [(0, len(self), 0)]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            lat, lon = latitudes[mid], longitudes[mid]
+            if south <= lat <= north and west <= lon <= east:
+                matches.append(mid)
+            value, low, high = (lat, south, north) if axis == 0 else (lon, west, east)
+            if low <= value:
+                stack.append((lo, mid, 1 - axis))
+            if value <= high:
+                stack.append((mid + 1, hi, 1 - axis))
+        return sorted(matches)
+
+    def within(
+        self, lat: float, lon: float, radius_km: float
+    ) -> list[tuple[float, int]]:
+        """Return the distances and positions of the parishes within a radius, closest first."""
+        matches = {
+            i
+            for bounds in circle_bounds(lat, lon, radius_km)
+            for i in self.bbox(*bounds)
+        }
+        distances = [
+            (haversine_km(lat, lon, self.latitudes[i], self.longitudes[i]), i)
+            for i in matches
+        ]
+        return sorted(d for d in distances if d[0] <= radius_km)
+
+    def nearest(
+        self, lat: float, lon: float, k: int, radius_km: float | None = None
+    ) -> list[tuple[float, int]]:
+        """Return the distances and positions of the `k` closest parishes.
+
+        Args:
+            lat (float): Latitude of the point.
+            lon (float): Longitude of the point.
+            k (int): Number of parishes.
+            radius_km (float | None, optional): Only parishes within this radius.
+        """
+        limit = radius_km if radius_km is not None else math.pi * EARTH_RADIUS_KM
+        radius = min(10.0, limit)
+        while True:
+            matches = self.within(lat, lon, radius)
+            if len(matches) >= k or radius >= limit:
+                return matches[:k]
+            radius = min(radius * 4, limit)
@@ -0,0 +1,138 @@
+"""URLs that are read from STDIN while a spider is already running.
+
+Reading all of STDIN before starting a spider means that, in a pipeline like
+`producer | matricula-online-scraper parish fetch`, nothing is downloaded until the
+producer is done. `UrlFeed` reads the lines in a thread instead and hands each URL to
+the reactor as soon as it was read. `UrlFeedSpiderMixin` schedules these URLs in the
+running crawler and keeps the spider open until the end of the input.
+
+At most `max_pending` URLs are read ahead of the crawler: the thread stops reading
+until the response of an earlier URL was handled, so a fast producer is slowed down
+by the pipe instead of filling up the memory.
+
+Example:
+>>> feed = UrlFeed(sys.stdin, validate=lambda url: ParishRegisterURL(url).is_valid)
+>>> runner.crawl(ChurchRegisterSpider, feed=feed)  # with `UrlFeedSpiderMixin`
+"""
+
+import threading
+from collections.abc import Callable
+from typing import Any, TextIO
+
+import scrapy
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider
+from scrapy.spidermiddlewares.httperror import HttpError
+
+from matricula_online_scraper.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+DEFAULT_MAX_PENDING = 32
+"""Number of URLs that are read before the crawler handled them."""
+
+
+class UrlFeed:
+    """Reads URLs from a file line by line in a thread and hands them to the reactor."""
+
+    def __init__(  # noqa: D107
+        self,
+        file: TextIO,
+        *,
+        validate: Callable[[str], bool] | None = None,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        self.file = file
+        self.validate = validate
+        self.eof = False
+        """Whether all lines were read."""
+        self.count = 0
+        """Number of URLs that were handed to the reactor."""
+        self.invalid: list[str] = []
+        """Lines that are not valid URLs, see `validate`."""
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def start(self, callback: Callable[[str], Any]) -> None:
+        """Start reading; `callback` is called in the reactor's thread with each URL."""
+        # NOTE: imported here to use the reactor that the crawler installed, importing
+        # it at module level would install the default one
+        from twisted.internet import reactor
+
+        threading.Thread(
+            target=self._read, args=(reactor, callback), name="url-feed", daemon=True
+        ).start()
+
+    def done(self) -> None:
+        """Allow reading another URL once one was handled. Call in the reactor's thread."""
+        self._slots.release()
+
+    def _read(self, reactor: Any, callback: Callable[[str], Any]) -> None:
+        try:
+            for line in self.file:
+                url = line.strip()
+                if not url:
+                    continue
+                if self.validate is not None and not self.validate(url):
+                    reactor.callFromThread(self._reject, url)  # type: ignore
+                    continue
+                self._slots.acquire()
+                reactor.callFromThread(self._hand_over, callback, url)  # type: ignore
+        finally:
+            reactor.callFromThread(setattr, self, "eof", True)  # type: ignore
+
+    def _hand_over(self, callback: Callable[[str], Any], url: str) -> None:
+        self.count += 1
+        callback(url)
+
+    def _reject(self, url: str) -> None:
+        logger.error(f"Skipping invalid URL from STDIN: {url}")
+        self.invalid.append(url)
+
+
+class UrlFeedSpiderMixin:
+    """Crawls the URLs of a `UrlFeed` (spider argument `feed`) as they arrive.
+
+    They are requested in addition to `start_urls` and handled by `parse`.
+    """
+
+    feed: UrlFeed | None = None
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):  # noqa: D102
+        spider = super().from_crawler(crawler, *args, **kwargs)  # type: ignore
+        if spider.feed is not None:
+            crawler.signals.connect(spider._start_feed, signal=signals.spider_opened)
+            crawler.signals.connect(spider._wait_for_feed, signal=signals.spider_idle)
+        return spider
+
+    def _start_feed(self, spider: scrapy.Spider) -> None:
+        assert self.feed is not None
+        self.feed.start(self._crawl_fed_url)
+
+    def _crawl_fed_url(self, url: str) -> None:
+        request = scrapy.Request(
+            url,
+            callback=self._parse_fed,
+            errback=self._fed_url_failed,
+            # like `start_urls`, and a filtered request would never free its slot
+            dont_filter=True,
+        )
+        self.crawler.engine.crawl(request)  # type: ignore
+
+    def _parse_fed(self, response, **kwargs):
+        assert self.feed is not None
+        self.feed.done()
+        return self.parse(response, **kwargs)  # type: ignore
+
+    def _fed_url_failed(self, failure) -> None:
+        assert self.feed is not None
+        self.feed.done()
+        # HTTP errors are already reported by `HTTPErrorLoggingMiddleware`
+        if not failure.check(HttpError):
+            logger.error(f"Failed to fetch {failure.request.url}: {failure.value!r}")
+
+    def _wait_for_feed(self, spider: scrapy.Spider) -> None:
+        assert self.feed is not None
+        if not self.feed.eof:
+            raise DontCloseSpider
@@ -10,12 +10,13 @@ Example:
 """
 
 import enum
-from typing import Optional
-
-from rich.console import Console
+from typing import TYPE_CHECKING, Optional
 
 from matricula_online_scraper.utils.singleton import Singleton
 
+if TYPE_CHECKING:
+    from rich.console import Console
+
 
 class Level(enum.Enum):
     """Levels of user console messages."""
@@ -45,9 +46,18 @@ class UserConsole(metaclass=Singleton):
     """A user console for printing user-facing messages."""
 
     def __init__(self):  # noqa: D107
-        self.console = Console(stderr=True)
+        self._console: Optional["Console"] = None
         self._quiet = False
 
+    @property
+    def console(self) -> "Console":
+        """Return the rich console, created on first use to keep the CLI's startup fast."""
+        if self._console is None:
+            from rich.console import Console
+
+            self._console = Console(stderr=True)
+        return self._console
+
     @property
     def quiet(self) -> bool:
         """Return whether the console is in quiet mode."""
@@ -56,8 +66,10 @@ class UserConsole(metaclass=Singleton):
     @quiet.setter
     def quiet(self, value: bool):
         """Set the quiet mode of the console."""
+        from rich.console import Console
+
         self._quiet = value
-        self.console = Console(stderr=False, quiet=value)
+        self._console = Console(stderr=False, quiet=value)
 
     @staticmethod
     def get_prefix(level: Level) -> str:
@@ -0,0 +1,92 @@
+"""Test the AIMD controller of `AutotuneDownloaderMiddleware`."""
+
+from scrapy import Request, Spider
+from scrapy.exceptions import IgnoreRequest
+from scrapy.utils.test import get_crawler
+
+from matricula_online_scraper.middlewares.autotune import (
+    AutotuneDownloaderMiddleware,
+    HostController,
+    parse_retry_after,
+)
+
+
+def busy(controller: HostController, requests: int) -> None:
+    """Send more requests than the concurrency allows."""
+    for _ in range(requests):
+        controller.started()
+
+
+def test_increases_while_healthy_and_busy():
+    """Check that the concurrency grows by one per window if the host keeps up."""
+    controller = HostController("data.matricula-online.eu", 4, target_latency=1.0)
+    for window in range(1, 4):
+        busy(controller, 10)
+        for _ in range(10):
+            controller.observe(200, latency=0.2)
+        assert controller.tick(elapsed=window * 5)
+    assert controller.concurrency == 7
+    assert controller.history == [(0.0, 4), (5, 5), (10, 6), (15, 7)]
+
+
+def test_does_not_increase_when_idle():
+    """Check that a host that does not use its concurrency does not get more."""
+    controller = HostController("data.matricula-online.eu", 4)
+    busy(controller, 2)
+    controller.observe(200, latency=0.1)
+    controller.observe(200, latency=0.1)
+    assert not controller.tick(elapsed=5)
+    assert controller.concurrency == 4
+
+
+def test_halves_once_per_window_on_429():
+    """Check that a burst of 429s halves the concurrency only once."""
+    controller = HostController("data.matricula-online.eu", 8)
+    busy(controller, 5)
+    assert controller.observe(429, latency=0.1, retry_after=parse_retry_after(b"10"))
+    for _ in range(4):
+        controller.observe(429, latency=0.1)
+    assert controller.concurrency == 4
+    assert controller.delay == 10
+
+    controller.tick(elapsed=5)
+    assert controller.concurrency == 4
+    assert controller.history[-1] == (5, 4)
+
+    # the delay of Retry-After decays once the host stops throttling
+    controller.tick(elapsed=10)
+    assert controller.delay == 5
+
+
+def test_decreases_on_errors_and_latency():
+    """Check that server errors and slow responses reduce the concurrency."""
+    controller = HostController(
+        "hosted-images.matricula-online.eu", 8, min_concurrency=3
+    )
+    busy(controller, 2)
+    controller.observe(500)
+    controller.observe(None)
+    controller.tick(elapsed=5)
+    assert controller.concurrency == 4
+
+    busy(controller, 5)
+    for _ in range(5):
+        controller.observe(200, latency=10.0)
+    controller.tick(elapsed=10)
+    assert controller.concurrency == 3
+
+
+def test_only_download_errors_count_against_a_host():
+    """Check that ignored requests, e.g. cache misses with --offline, are no errors."""
+    crawler = get_crawler(Spider, {"AUTOTUNE_ENABLED": True})
+    middleware = AutotuneDownloaderMiddleware.from_crawler(crawler)
+    request = Request("https://data.matricula-online.eu/en/")
+
+    middleware.process_request(request)
+    middleware.process_exception(request, IgnoreRequest())
+    controller = middleware.controllers["data.matricula-online.eu"]
+    assert (controller.in_flight, controller.errors) == (0, 0)
+
+    middleware.process_request(request)
+    middleware.process_exception(request, ConnectionRefusedError())
+    assert (controller.in_flight, controller.errors) == (0, 1)
@@ -0,0 +1,75 @@
+"""Test the HTML cache shared by all commands."""
+
+import os
+
+from scrapy import Request, Spider
+from scrapy.http import HtmlResponse, Response
+from scrapy.utils.test import get_crawler
+
+from matricula_online_scraper.middlewares.http_cache import (
+    HtmlCachePolicy,
+    SqliteCacheStorage,
+)
+
+URL = "https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/"
+
+
+def _storage(tmp_path, **settings):
+    crawler = get_crawler(Spider, {"HTTPCACHE_DIR": str(tmp_path), **settings})
+    spider = crawler._create_spider("test")
+    storage = SqliteCacheStorage(crawler.settings)
+    storage.open_spider(spider)
+    return storage, spider
+
+
+def _page(url: str, body: bytes) -> HtmlResponse:
+    return HtmlResponse(url, body=body, headers={"Content-Type": "text/html"})
+
+
+def test_responses_are_shared_and_compressed(tmp_path):
+    """Check that a response stored by one spider is found by another one."""
+    storage, spider = _storage(tmp_path)
+    body = b"<html>" + b"parish " * 1000 + b"</html>"
+    storage.store_response(spider, Request(URL), _page(URL, body))
+    assert storage.size < len(body)
+    storage.close_spider(spider)
+
+    other, spider = _storage(tmp_path)
+    response = other.retrieve_response(spider, Request(URL))
+    assert isinstance(response, HtmlResponse)
+    assert (response.status, response.body) == (200, body)
+    assert other.retrieve_response(spider, Request(URL + "?page=2")) is None
+
+
+def test_least_recently_used_responses_are_evicted(tmp_path):
+    """Check that the cache stays below its size limit by dropping unused pages."""
+    storage, spider = _storage(tmp_path, HTTPCACHE_MAX_BYTES=2500)
+    for i in range(3):
+        url = f"{URL}?page={i}"
+        # incompressible, so that each page takes about 1000 bytes
+        storage.store_response(spider, Request(url), _page(url, os.urandom(1000)))
+        if i == 1:
+            # keep the first page in use
+            storage.retrieve_response(spider, Request(f"{URL}?page=0"))
+
+    assert storage.size <= 2500
+    assert storage.retrieve_response(spider, Request(f"{URL}?page=0")) is not None
+    assert storage.retrieve_response(spider, Request(f"{URL}?page=1")) is None
+    assert storage.retrieve_response(spider, Request(f"{URL}?page=2")) is not None
+
+
+def test_images_are_not_cached(tmp_path):
+    """Check that only successful HTML responses are cached, never images."""
+    policy = HtmlCachePolicy(get_crawler(Spider).settings)
+    image = "http://hosted-images.matricula-online.eu/images/KB001/KB001_0001.jpg"
+    assert not policy.should_cache_request(Request(image))
+    assert policy.should_cache_request(Request(URL))
+
+    request = Request(URL)
+    assert policy.should_cache_response(_page(URL, b"<html></html>"), request)
+    assert not policy.should_cache_response(
+        Response(URL, status=200, headers={"Content-Type": "image/jpeg"}), request
+    )
+    assert not policy.should_cache_response(
+        Response(URL, status=429, headers={"Content-Type": "text/html"}), request
+    )
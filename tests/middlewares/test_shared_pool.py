@@ -0,0 +1,23 @@
+"""Test the download handler that shares its connection pool among crawlers."""
+
+from scrapy import Spider
+from scrapy.utils.test import get_crawler
+
+from matricula_online_scraper.middlewares.shared_pool import (
+    SharedPoolDownloadHandler,
+    shared_pool_settings,
+)
+
+
+def test_pool_outlives_crawler():
+    """Check that all handlers use the same pool and closing one keeps it open."""
+    first, second = (
+        SharedPoolDownloadHandler.from_crawler(
+            get_crawler(Spider, shared_pool_settings())
+        )
+        for _ in range(2)
+    )
+    assert first._pool is second._pool is SharedPoolDownloadHandler._shared_pool
+
+    assert first.close().called
+    assert second._pool is SharedPoolDownloadHandler._shared_pool
@@ -0,0 +1,57 @@
+"""Test the memory cap and the per-host limits of `SpoolingDownloaderMiddleware`."""
+
+from matricula_online_scraper.middlewares.spooling import ByteBudget, HostLimiter
+
+
+class FakeProducer:
+    """Records whether it was paused, like a transport would."""
+
+    def __init__(self):
+        self.paused = False
+
+    def pauseProducing(self):  # noqa: D102, N802
+        self.paused = True
+
+    def resumeProducing(self):  # noqa: D102, N802
+        self.paused = False
+
+
+def test_budget_pauses_and_resumes_producers():
+    """Check that producers are paused while the budget is exhausted."""
+    budget = ByteBudget(capacity=100)
+    first, second = FakeProducer(), FakeProducer()
+
+    budget.reserve(60, first)
+    assert not first.paused
+
+    budget.reserve(60, second)
+    assert second.paused and not first.paused
+    assert budget.peak == 120
+
+    budget.release(60)
+    assert not second.paused
+    assert budget.used == 60
+
+
+def test_budget_forgets_lost_producers():
+    """Check that a producer whose connection was lost is not resumed."""
+    budget = ByteBudget(capacity=10)
+    producer = FakeProducer()
+
+    budget.reserve(20, producer)
+    budget.forget(producer)
+    budget.release(20)
+    assert producer.paused
+
+
+def test_host_limiter_follows_concurrency():
+    """Check that downloads wait for a free slot and that new limits apply."""
+    limiter = HostLimiter(concurrency=1)
+    first, second, third = limiter.acquire(), limiter.acquire(), limiter.acquire()
+    assert first.called and not second.called
+
+    limiter.release()
+    assert second.called and not third.called
+
+    limiter.update(concurrency=2, delay=0.0)
+    assert third.called and limiter.active == 2
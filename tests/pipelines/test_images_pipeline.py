@@ -0,0 +1,61 @@
+"""Test the conditional re-fetch of pages by the image pipelines."""
+
+from scrapy import Request, Spider
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
+
+from matricula_online_scraper.pipelines.images_pipeline import RawImagesPipeline
+from matricula_online_scraper.utils.download_journal import DownloadJournal
+
+REGISTER = (
+    "https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/KB+001/"
+)
+PAGE = "http://hosted-images.matricula-online.eu/images/KB001/KB001_0001.jpg"
+
+
+def _setup(tmp_path, size: int):
+    crawler = get_crawler(Spider, {"IMAGES_STORE": str(tmp_path)})
+    crawler.spider = crawler._create_spider("test")
+    crawler.spider.journal = DownloadJournal(tmp_path)
+    pipeline = RawImagesPipeline.from_crawler(crawler)
+    info = pipeline.SpiderInfo(crawler.spider)
+
+    item = {"original_url": REGISTER}
+    request = Request(PAGE, meta={"original_url": REGISTER})
+    path = pipeline.file_path(request, item=item)
+    (tmp_path / path).parent.mkdir(parents=True)
+    (tmp_path / path).write_bytes(b"scan")
+    crawler.spider.journal.register(REGISTER, [PAGE])
+    crawler.spider.journal.mark_completed(
+        REGISTER, PAGE, path=path, checksum="abc", size=size, etag='"v1"'
+    )
+    return pipeline, info, item, request
+
+
+def test_unchanged_page_is_revalidated(tmp_path):
+    """Check that a page on disk is requested conditionally and kept on a 304."""
+    pipeline, info, item, request = _setup(tmp_path, size=4)
+
+    assert pipeline._make_conditional(None, request, info, item) is None
+    assert request.headers["If-None-Match"] == b'"v1"'
+
+    response = Response(PAGE, status=304, headers={"ETag": '"v2"'}, request=request)
+    results = []
+    pipeline.media_downloaded(response, request, info, item=item).addCallback(
+        results.append
+    )
+    assert results[0]["status"] == "uptodate"
+    assert results[0]["checksum"] == "abc"
+
+    recorded = info.spider.journal.get(REGISTER).completed[PAGE]
+    assert (recorded["etag"], recorded["size"]) == ('"v2"', 4)
+    assert info.spider.crawler.stats.get_value("file_status_count/revalidated") == 1
+
+
+def test_damaged_page_is_not_revalidated(tmp_path):
+    """Check that a page whose size on disk changed is downloaded entirely."""
+    pipeline, info, item, request = _setup(tmp_path, size=1000)
+
+    assert pipeline._make_conditional(None, request, info, item) is None
+    assert "If-None-Match" not in request.headers
+    assert "revalidate" not in request.meta
@@ -0,0 +1,58 @@
+"""Test the backpressure of `PostProcessingPipeline`."""
+
+from concurrent.futures import Future
+from pathlib import Path
+
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from matricula_online_scraper.pipelines import postprocessing_pipeline
+from matricula_online_scraper.pipelines.postprocessing_pipeline import (
+    PostProcessingPipeline,
+)
+from matricula_online_scraper.utils.image_transforms import Transform
+
+
+class FakePool:
+    """Keeps submitted jobs pending until they are completed by the test."""
+
+    def __init__(self):
+        self.futures: list[Future] = []
+
+    def submit(self, fn, *args):  # noqa: D102
+        future = Future()
+        self.futures.append(future)
+        return future
+
+    def shutdown(self):  # noqa: D102
+        pass
+
+
+class ImmediateReactor:
+    """Runs calls from the pool's threads right away."""
+
+    @staticmethod
+    def callFromThread(f, *args):  # noqa: D102, N802
+        f(*args)
+
+
+def test_pages_wait_while_pool_is_saturated(tmp_path, monkeypatch):
+    """Check that pages are only accepted while fewer than `max_pending` are processed."""
+    monkeypatch.setattr(postprocessing_pipeline, "reactor", ImmediateReactor)
+    stats = MemoryStatsCollector(get_crawler())
+    pipeline = PostProcessingPipeline(
+        [Transform("grayscale")], tmp_path, workers=1, max_pending=2, stats=stats
+    )
+    pipeline.pool = FakePool()
+
+    pages = [pipeline.page_stored(f"KB1/{i}.jpg", Path(f"/{i}.jpg")) for i in range(3)]
+    assert pages[0].called and pages[1].called and not pages[2].called
+
+    pipeline.pool.futures[0].set_result(["derivative"])
+    assert pages[2].called
+    assert stats.get_value("postprocess/pages") == 1
+
+    pipeline.pool.futures[1].set_exception(OSError("broken scan"))
+    pipeline.pool.futures[2].set_result([])
+    assert stats.get_value("postprocess/errors") == 1
+    assert pipeline.close_spider().called
@@ -0,0 +1,97 @@
+"""Test how `ChurchRegisterSpider` extracts the pages of a register."""
+
+from pathlib import Path
+
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+
+from matricula_online_scraper.spiders.church_register import (
+    ChurchRegisterDownloadItem,
+    ChurchRegisterPage,
+    ChurchRegisterSpider,
+)
+from matricula_online_scraper.spiders.utils import extract_register_pages
+from matricula_online_scraper.utils.download_journal import DownloadJournal
+from matricula_online_scraper.utils.page_selection import PageSelection
+
+FIXTURE = Path(__file__).parent.parent / "fixtures" / "church_register.html"
+REGISTER = (
+    "https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/KB+001/"
+)
+IMAGES = [
+    f"http://hosted-images.matricula-online.eu/images/matricula/DE/AA/aachen-hl-kreuz/KB+001/KB+001_{i:04d}.jpg"
+    for i in range(1, 13)
+]
+
+
+def register_response(body: bytes | None = None) -> HtmlResponse:
+    """Load the saved register page (`?pg=2`)."""
+    if body is None:
+        body = FIXTURE.read_bytes()
+    return HtmlResponse(REGISTER + "?pg=2", body=body, encoding="utf-8")
+
+
+def create_spider(settings: dict | None = None) -> ChurchRegisterSpider:  # noqa: D103
+    crawler = get_crawler(ChurchRegisterSpider, settings)
+    return ChurchRegisterSpider.from_crawler(crawler)
+
+
+def test_fast_path_matches_dom_path():
+    """Check that the byte scan extracts the same pages as the DOM-based extraction."""
+    response = register_response()
+    labels, files = extract_register_pages(response.body)
+    assert files == IMAGES
+    assert labels[0] == "Einband" and labels[-1] == "Rückseite"
+    assert create_spider()._extract_pages_from_dom(response) == (labels, files)
+
+
+def test_fast_path_rejects_malformed_files():
+    """Check that the fast path gives up on entries it cannot decode."""
+    body = FIXTURE.read_bytes().replace(b'"/image/', b'"/img/', 1)
+    assert extract_register_pages(body) is None
+    assert extract_register_pages(b"<html><body></body></html>") is None
+
+
+def test_parse_yields_download_item():
+    """Check that all decoded image URLs of a register are passed to the pipeline."""
+    (item,) = create_spider().parse(register_response())
+    assert isinstance(item, ChurchRegisterDownloadItem)
+    assert item["image_urls"] == IMAGES
+
+
+def test_parse_plan_only():
+    """Check that `IMAGES_PLAN_ONLY` yields one record per page instead."""
+    pages = list(create_spider({"IMAGES_PLAN_ONLY": True}).parse(register_response()))
+    assert len(pages) == len(IMAGES)
+    assert pages[0] == ChurchRegisterPage(REGISTER, 1, "Einband", IMAGES[0])
+    assert pages[11] == ChurchRegisterPage(REGISTER, 12, "Rückseite", IMAGES[11])
+
+
+def test_parse_selected_pages():
+    """Check that only the selected pages are downloaded, or the one given by `?pg=`."""
+    spider = create_spider()
+    spider.pages = PageSelection.parse("2-3,12-")
+    (item,) = spider.parse(register_response())
+    assert item["image_urls"] == [IMAGES[1], IMAGES[2], IMAGES[11]]
+    assert item["pages"] == [2, 3, 12]
+    assert item["labels"] == ["1", "2", "Rückseite"]
+
+    spider = create_spider()
+    spider.single_page = True
+    (item,) = spider.parse(register_response())  # ?pg=2
+    assert item["image_urls"] == [IMAGES[1]]
+
+
+def test_resume_rebuilds_archives_that_cannot_be_appended_to(tmp_path):
+    """Check that resuming requests the missing pages, or all of them for a PDF."""
+    journal = DownloadJournal(tmp_path)
+    journal.register(REGISTER, IMAGES)
+    for image in IMAGES[:10]:
+        journal.mark_completed(REGISTER, image)
+
+    for storage, pages in [("zip", [11, 12]), ("pdf", list(range(1, 13)))]:
+        spider = create_spider({"IMAGES_STORAGE": storage})
+        spider.journal, spider.resume = journal, True
+        (item,) = spider.parse(register_response())
+        assert item["pages"] == pages
+    journal.close()
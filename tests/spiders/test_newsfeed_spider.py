@@ -0,0 +1,50 @@
+"""Test how `NewsfeedSpider` stops reading the newsfeed."""
+
+import pytest
+from scrapy.exceptions import CloseSpider
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from matricula_online_scraper.spiders.newsfeed_spider import NewsfeedSpider
+
+NEWSFEED = "https://data.matricula-online.eu/en/nachrichten/"
+
+
+def newsfeed_response(dates: list[str]) -> HtmlResponse:
+    """A newsfeed page with one article per date and without pagination."""
+    articles = "".join(
+        f"<div id='news-{i}'><h3><a href='/en/nachrichten/{i}/'>News {i}</a>"
+        f"<small>{date}</small></h3></div>"
+        for i, date in enumerate(dates)
+    )
+    body = f"<div id='page-main-content'>{articles}</div>"
+    return HtmlResponse(
+        NEWSFEED, body=body.encode(), encoding="utf-8", request=Request(NEWSFEED)
+    )
+
+
+def create_spider(**kwargs) -> NewsfeedSpider:  # noqa: D103
+    return NewsfeedSpider.from_crawler(get_crawler(NewsfeedSpider), **kwargs)
+
+
+def test_limit_stops_the_crawl():
+    """Check that no more than `limit` articles are yielded."""
+    spider = create_spider(limit=2)
+    output = spider.parse(newsfeed_response(["June 3, 2024"] * 3))
+    assert [article["headline"] for article in (next(output), next(output))] == [
+        "News 0",
+        "News 1",
+    ]
+    with pytest.raises(CloseSpider) as closed:
+        next(output)
+    assert "limit" in closed.value.reason
+
+
+def test_unreadable_date_stops_the_crawl():
+    """Check that an article whose date cannot be parsed stops the crawl."""
+    spider = create_spider()
+    output = spider.parse(newsfeed_response(["Dec. 19, 2023", "yesterday"]))
+    assert next(output)["date"] == "Dec. 19, 2023"
+    with pytest.raises(CloseSpider) as closed:
+        next(output)
+    assert closed.value.reason.startswith("Failed to parse Matricula date string")
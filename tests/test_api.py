@@ -0,0 +1,146 @@
+"""Test the async Python API."""
+
+import asyncio
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import pytest
+
+from matricula_online_scraper.api import download_register, iter_registers
+from matricula_online_scraper.utils.file_format import ImageStorage
+
+REGISTER = (
+    "https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/KB+001/"
+)
+
+
+async def _first(iterator):
+    async for item in iterator:
+        return item
+
+
+def test_invalid_arguments_are_rejected(tmp_path):
+    """Check that invalid arguments are rejected before anything is crawled."""
+    with pytest.raises(ValueError, match="Invalid parish URL"):
+        asyncio.run(_first(iter_registers("https://example.com/parish/")))
+    with pytest.raises(ValueError, match="Invalid parish register URL"):
+        asyncio.run(_first(download_register("https://example.com/", tmp_path)))
+    with pytest.raises(ValueError, match="one by one"):
+        asyncio.run(
+            _first(download_register(REGISTER, tmp_path, storage=ImageStorage.ZIP))
+        )
+    with pytest.raises(ValueError):
+        asyncio.run(_first(download_register(REGISTER, tmp_path, pages="x-y")))
+
+
+PARISH = "https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/"
+
+
+class _ParishPage(BaseHTTPRequestHandler):
+    """Serves a parish with 3 pages of 2 registers, the last pages slowly."""
+
+    def log_message(self, *args):  # noqa: D102
+        pass
+
+    def do_GET(self):  # noqa: D102, N802
+        page = int((re.search(r"page=(\d+)", self.path) or [0, 1])[1])
+        if page > 1:
+            time.sleep(1)
+        rows = "".join(
+            f'<tr><td><a href="{urlsplit(PARISH).path}KB{i}/">KB{i}</a></td>'
+            f"<td>KB{i}</td><td>Taufen</td><td>1700 - 1800</td></tr>"
+            "<tr><td><dl><dt>Typ</dt><dd>Taufen</dd></dl></td></tr>"
+            for i in (2 * page - 1, 2 * page)
+        )
+        pagination = "".join(
+            f'<li><a class="page-link" href="?page={p}">{p}</a></li>' for p in (1, 2, 3)
+        )
+        body = (
+            '<html><body><div class="table-responsive"><table><tr><th></th></tr>'
+            f'{rows}</table></div><ul class="pagination">{pagination}</ul></body></html>'
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# NOTE: The API installs Twisted's asyncio reactor, so it runs in a fresh process.
+# Requests to Matricula are sent to the local server by a download handler.
+SCRIPT = """
+import asyncio, inspect, sys
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from matricula_online_scraper.api import iter_registers
+
+MATRICULA, LOCAL = "https://data.matricula-online.eu", f"http://127.0.0.1:{sys.argv[1]}"
+
+class LocalServer(HTTP11DownloadHandler):
+    if inspect.iscoroutinefunction(HTTP11DownloadHandler.download_request):
+        async def download_request(self, request):
+            local = request.replace(url=request.url.replace(MATRICULA, LOCAL))
+            return (await super().download_request(local)).replace(url=request.url)
+    else:  # Scrapy < 2.14
+        def download_request(self, request, spider):
+            local = request.replace(url=request.url.replace(MATRICULA, LOCAL))
+            return super().download_request(local, spider).addCallback(
+                lambda response: response.replace(url=request.url)
+            )
+
+SETTINGS = {"DOWNLOAD_HANDLERS": {"https": "__main__.LocalServer"}}
+unclosed = []
+
+async def main(mode):
+    registers = iter_registers(sys.argv[3], settings=SETTINGS)
+    async for register in registers:
+        print(register.url, flush=True)
+        if mode == "break":
+            break
+        if mode == "unclosed":  # closed while `asyncio.run` shuts down the loop
+            unclosed.append(registers)
+            return
+
+asyncio.run(main(sys.argv[2]))
+print("exited")
+"""
+
+
+@pytest.fixture(scope="module")
+def parish_server():  # noqa: D103
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ParishPage)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+
+
+def _run_api(port: int, mode: str) -> list[str]:
+    """Iterate the registers of the local parish in a new process and return its output."""
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT, str(port), mode, PARISH],
+        capture_output=True,
+        text=True,
+        timeout=60,
+        env=os.environ | {"PYTHONWARNINGS": "ignore"},
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout.splitlines()
+
+
+def test_iter_registers_yields_all_pages_in_order(parish_server):
+    """Check that the registers of all pages of a parish are yielded in order."""
+    assert _run_api(parish_server, "all") == [
+        *(f"{PARISH}KB{i}/" for i in range(1, 7)),
+        "exited",
+    ]
+
+
+@pytest.mark.parametrize("mode", ["break", "unclosed"])
+def test_stopping_early_stops_the_crawl(parish_server, mode):
+    """Check that the process exits when the caller stops while pages are pending."""
+    assert _run_api(parish_server, mode) == [f"{PARISH}KB1/", "exited"]
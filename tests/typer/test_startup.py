@@ -0,0 +1,72 @@
+"""Test that the CLI starts fast, i.e. does not import Scrapy and the like up front."""
+
+import subprocess
+import sys
+
+import pytest
+
+STARTUP_BUDGET_MS = 100
+"""Upper limit of the time `COMMANDS` spend importing, measured with `-X importtime`."""
+
+COMMANDS = (["--help"], ["--version"])
+"""Commands that must not import more than the CLI itself."""
+
+HEAVY_MODULES = ("scrapy", "twisted", "PIL", "rich", "urllib.request")
+"""Modules that must only be imported by the commands that use them."""
+
+
+def _import_times(command: list[str]) -> list[tuple[str, int]]:
+    """Run `command` in a fresh interpreter and return the cumulative μs per module.
+
+    The modules are in the order they finished importing and indented by their depth.
+    """
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "from matricula_online_scraper.main import app; app()",
+            *command,
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = []
+    # e.g. "import time:       227 |        731 |     matricula_online_scraper.cli.common"
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line.split("|")
+        if cumulative.strip().isdigit():
+            times.append((module[1:].rstrip(), int(cumulative)))
+    return times
+
+
+def _command_import_ms(command: list[str]) -> float:
+    """Return the time `command` spends importing the CLI and what it uses."""
+    times = _import_times(command)
+    # what Python imports at startup is printed before the CLI
+    start = [module for module, _ in times].index("matricula_online_scraper.main")
+    return sum(us for module, us in times[start:] if not module.startswith(" ")) / 1000
+
+
+@pytest.mark.parametrize("command", COMMANDS, ids=" ".join)
+def test_no_heavy_imports(command: list[str]):
+    """Check that `--help` and `--version` do not wait for Scrapy, Twisted, Pillow or rich."""
+    modules = [module.strip() for module, _ in _import_times(command)]
+    heavy = [
+        module
+        for module in modules
+        if any(module == m or module.startswith(f"{m}.") for m in HEAVY_MODULES)
+    ]
+    assert not heavy
+
+
+@pytest.mark.parametrize("command", COMMANDS, ids=" ".join)
+def test_startup_budget(command: list[str]):
+    """Check that `--help` and `--version` import within `STARTUP_BUDGET_MS`."""
+    # the fastest of a few runs, to not fail because of a busy machine
+    fastest = min(_command_import_ms(command) for _ in range(5))
+    assert fastest < STARTUP_BUDGET_MS
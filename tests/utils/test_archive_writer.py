@@ -0,0 +1,114 @@
+"""Test the writers that store all pages of a register in one archive."""
+
+import io
+import json
+import re
+import zipfile
+
+import pytest
+from PIL import Image
+
+from matricula_online_scraper.utils.archive_writer import (
+    CbzArchiveWriter,
+    PdfArchiveWriter,
+    ZipArchiveWriter,
+    entry_name,
+    read_jpeg_info,
+)
+
+
+def make_jpeg(width: int, height: int, mode: str = "RGB", dpi: int = 300) -> bytes:  # noqa: D103
+    buffer = io.BytesIO()
+    Image.new(mode, (width, height)).save(buffer, "JPEG", dpi=(dpi, dpi))
+    return buffer.getvalue()
+
+
+def test_read_jpeg_info():
+    """Check that size, color components and resolution are read from the headers."""
+    info = read_jpeg_info(make_jpeg(40, 30, "L", dpi=150))
+    assert (info.width, info.height, info.components) == (40, 30, 1)
+    assert info.dpi == (150, 150)
+    assert read_jpeg_info(make_jpeg(4, 3, "CMYK")).components == 4
+
+    with pytest.raises(ValueError):
+        read_jpeg_info(b"\x89PNG\r\n\x1a\n")
+
+
+def test_entry_name():  # noqa: D103
+    assert entry_name(12, "7r") == "00012_7r.jpg"
+    assert entry_name(1, "Einband / vorne") == "00001_Einband_vorne.jpg"
+    assert entry_name(2, "../..") == "00002.jpg"
+    assert entry_name(3, None) == "00003.jpg"
+
+
+def test_zip_pages_in_any_order_and_resume(tmp_path):
+    """Check that pages are stored as received and kept when the archive is extended."""
+    path = tmp_path / "KB+001.cbz"
+    pages = {page: make_jpeg(10 * page, 10) for page in (1, 2, 3)}
+
+    writer = CbzArchiveWriter(path)
+    writer.add(3, "2", pages[3])
+    writer.add(1, "Einband", pages[1])
+    assert not path.exists() and writer.part.exists()
+    writer.close()
+    assert not writer.part.exists()
+
+    # e.g. resuming a download, which adds the missing page
+    writer = CbzArchiveWriter(path)
+    writer.add(2, "1", pages[2])
+    writer.close()
+
+    with zipfile.ZipFile(path) as archive:
+        assert archive.read("00001_Einband.jpg") == pages[1]
+        assert archive.read("00002_1.jpg") == pages[2]
+        assert archive.read("00003_2.jpg") == pages[3]
+        assert json.loads(archive.read("index.json")) == [
+            {"page": 1, "label": "Einband", "file": "00001_Einband.jpg"},
+            {"page": 2, "label": "1", "file": "00002_1.jpg"},
+            {"page": 3, "label": "2", "file": "00003_2.jpg"},
+        ]
+        comic_info = archive.read("ComicInfo.xml").decode()
+        assert '<Page Image="0" Bookmark="Einband" />' in comic_info
+        assert all(
+            info.compress_type == zipfile.ZIP_STORED for info in archive.infolist()
+        )
+
+
+def test_zip_abort(tmp_path):  # noqa: D103
+    writer = ZipArchiveWriter(tmp_path / "KB+001.zip")
+    writer.add(1, None, make_jpeg(4, 4))
+    writer.abort()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_pdf_embeds_jpegs_as_is(tmp_path):
+    """Check that each JPEG is embedded without re-encoding, with its page's label."""
+    path = tmp_path / "KB+001.pdf"
+    rgb, gray = make_jpeg(600, 900), make_jpeg(300, 150, "L", dpi=150)
+
+    writer = PdfArchiveWriter(path)
+    writer.add(2, "Rückseite", gray)
+    writer.add(1, "1", rgb)
+    writer.close()
+
+    pdf = path.read_bytes()
+    assert pdf.startswith(b"%PDF-1.4") and pdf.endswith(b"%%EOF\n")
+    # the unmodified JPEGs, in the order they arrived
+    assert pdf.index(gray) < pdf.index(rgb)
+    assert b"/ColorSpace /DeviceGray" in pdf and b"/ColorSpace /DeviceRGB" in pdf
+    # pages in order of their number, sized by the scan's resolution (2 x 3 inch)
+    kids = re.search(rb"/Kids \[(\d+) 0 R (\d+) 0 R\]", pdf)
+    first_page = re.search(rb"\n%s 0 obj\n([^\n]*)" % kids.group(1), pdf).group(1)
+    assert b"/MediaBox [0 0 144.00 216.00]" in first_page
+    # labels and bookmarks as UTF-16BE
+    assert "Rückseite".encode("utf-16-be").hex().upper().encode() in pdf
+    assert b"/PageLabels" in pdf and b"/Outlines" in pdf
+
+    # every object can be found through the cross-reference table
+    startxref = int(pdf.rsplit(b"startxref\n", 1)[1].split()[0])
+    entries = pdf[startxref:].split(b"\n")[3:]
+    for number, entry in enumerate(entries, start=1):
+        if entry.startswith(b"trailer"):
+            break
+        offset = int(entry.split()[0])
+        assert pdf[offset:].startswith(b"%d 0 obj\n" % number)
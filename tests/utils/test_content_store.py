@@ -0,0 +1,98 @@
+"""Test the content-addressed store used by `parish fetch --dedupe`."""
+
+import os
+import time
+
+import pytest
+
+from matricula_online_scraper.utils.content_store import (
+    TMP_MAX_AGE_SECS,
+    ContentStore,
+)
+
+
+def test_identical_images_are_stored_once(tmp_path):
+    """Check that identical bytes share one object, linked to each path."""
+    store = ContentStore(tmp_path)
+    assert store.add("de/a/KB1/0001.jpg", b"scan 1")
+    assert not store.add("de/b/KB7/0042.jpg", b"scan 1")
+    assert store.add("de/b/KB7/0043.jpg", b"scan 2")
+    # storing the same image at the same path again changes nothing
+    assert not store.add("de/a/KB1/0001.jpg", b"scan 1")
+
+    first, second = tmp_path / "de/a/KB1/0001.jpg", tmp_path / "de/b/KB7/0042.jpg"
+    assert first.read_bytes() == second.read_bytes() == b"scan 1"
+    assert os.path.samefile(first, second)
+
+    stats = store.stats()
+    assert (stats.objects, stats.links, stats.orphans) == (2, 3, 0)
+    assert stats.stored_bytes == 12
+    assert stats.saved_bytes == 6
+
+
+def test_overwrite_path_with_other_image(tmp_path):
+    """Check that replacing the image at a path does not modify the old object."""
+    store = ContentStore(tmp_path)
+    store.add("KB1/0001.jpg", b"old")
+    store.add("KB2/0001.jpg", b"old")
+    store.add("KB1/0001.jpg", b"new")
+    assert (tmp_path / "KB1/0001.jpg").read_bytes() == b"new"
+    assert (tmp_path / "KB2/0001.jpg").read_bytes() == b"old"
+
+
+def test_collect_garbage(tmp_path):
+    """Check that only objects without any path are removed."""
+    store = ContentStore(tmp_path)
+    store.add("KB1/0001.jpg", b"kept")
+    store.add("KB2/0001.jpg", b"removed")
+    (tmp_path / "KB2/0001.jpg").unlink()
+
+    stats = store.stats()
+    assert (stats.orphans, stats.orphaned_bytes, stats.saved_bytes) == (1, 7, 0)
+
+    assert store.collect_garbage(dry_run=True).orphans == 1
+    assert store.stats().objects == 2
+
+    removed = store.collect_garbage()
+    assert (removed.orphans, removed.orphaned_bytes) == (1, 7)
+    assert store.stats().objects == 1
+    assert (tmp_path / "KB1/0001.jpg").read_bytes() == b"kept"
+
+
+def test_store_without_hardlinks(tmp_path, monkeypatch):
+    """Check that copies are stored and never collected if hardlinks are not supported."""
+
+    def link(src, dst):
+        raise OSError("Operation not permitted")
+
+    monkeypatch.setattr(os, "link", link)
+    store = ContentStore(tmp_path)
+    store.add("KB1/0001.jpg", b"scan 1")
+    store.add("KB2/0001.jpg", b"scan 1")
+    assert (tmp_path / "KB2/0001.jpg").read_bytes() == b"scan 1"
+    assert not os.path.samefile(tmp_path / "KB1/0001.jpg", tmp_path / "KB2/0001.jpg")
+
+    # also for a store opened later on, e.g. by `store gc`
+    for store in (store, ContentStore(tmp_path)):
+        assert store.stores_copies
+        stats = store.stats()
+        assert stats.copies and (stats.objects, stats.orphans) == (1, 0)
+        assert stats.saved_bytes == 0
+        with pytest.raises(RuntimeError):
+            store.collect_garbage()
+        assert store.stats().objects == 1
+
+
+def test_collect_garbage_keeps_recent_temporary_files(tmp_path):
+    """Check that only temporary objects no longer written by `add` are removed."""
+    store = ContentStore(tmp_path)
+    store.add("KB1/0001.jpg", b"kept")
+    obj = next(store.objects.glob("*/*.jpg"))
+    recent, left_over = obj.with_suffix(".1.tmp"), obj.with_suffix(".2.tmp")
+    recent.write_bytes(b"partial")
+    left_over.write_bytes(b"partial")
+    expired = time.time() - TMP_MAX_AGE_SECS - 1
+    os.utime(left_over, (expired, expired))
+
+    store.collect_garbage()
+    assert recent.exists() and not left_over.exists()
@@ -0,0 +1,41 @@
+"""Test the persistent cache of the parishes' coordinates."""
+
+import time
+
+from matricula_online_scraper.utils.coordinates_cache import CoordinatesCache
+
+URL = "https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/"
+
+
+def test_coordinates_are_shared_and_expire(tmp_path):
+    """Check that a parish cached by one run is found by the next until it expires."""
+    cache = CoordinatesCache(tmp_path)
+    cache.put(URL, {"longitude": 6.08, "latitude": 50.77})
+    cache.put(URL + "empty/", {})
+    cache.close()
+
+    cache = CoordinatesCache(tmp_path)
+    assert cache.get(URL) == {"longitude": 6.08, "latitude": 50.77}
+    assert cache.get(URL + "empty/") == {}
+    assert cache.get(URL + "unknown/") is None
+    assert cache.hits == 2
+    cache.close()
+
+    assert CoordinatesCache(tmp_path, refresh=True).get(URL) is None
+    time.sleep(1.1)
+    assert CoordinatesCache(tmp_path, expiration_secs=1).get(URL) is None
+
+
+def test_least_recently_used_coordinates_are_evicted(tmp_path):
+    """Check that the cache keeps at most `max_entries` parishes, the recently used."""
+    cache = CoordinatesCache(tmp_path, max_entries=2)
+    for i in range(3):
+        cache.put(f"{URL}{i}/", {"longitude": i, "latitude": i})
+        time.sleep(0.01)
+    cache.get(f"{URL}0/")
+    cache.close()
+
+    cache = CoordinatesCache(tmp_path)
+    assert cache.get(f"{URL}0/") is not None
+    assert cache.get(f"{URL}1/") is None
+    assert cache.get(f"{URL}2/") is not None
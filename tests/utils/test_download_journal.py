@@ -0,0 +1,86 @@
+"""Test the on-disk download journal used by `parish fetch --resume`."""
+
+from matricula_online_scraper.utils.download_journal import (
+    JOURNAL_FILENAME,
+    DownloadJournal,
+    JournalTail,
+    register_key,
+    shard_registers,
+)
+
+REGISTER = "https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/KB+001/?pg=1"
+PAGES = [
+    f"http://hosted-images.matricula-online.eu/images/KB_{i:04d}.jpg"
+    for i in range(1, 5)
+]
+
+
+def test_register_key():
+    """Check that register URLs are normalized regardless of `?pg=` and trailing slashes."""
+    assert register_key(REGISTER) == register_key(REGISTER.split("?")[0].rstrip("/"))
+
+
+def test_journal_replay(tmp_path):
+    """Check that a reopened journal knows which pages are still missing."""
+    journal = DownloadJournal(tmp_path)
+    journal.register(REGISTER, PAGES)
+    journal.mark_completed(REGISTER, PAGES[0], path="a.jpg", checksum="abc")
+    journal.mark_failed(REGISTER, PAGES[1])
+    journal.mark_completed(REGISTER, PAGES[2])
+    journal.close()
+
+    reopened = DownloadJournal(tmp_path)
+    assert reopened.missing(REGISTER) == [PAGES[1], PAGES[3]]
+    assert reopened.get(REGISTER).completed[PAGES[0]] == {
+        "path": "a.jpg",
+        "checksum": "abc",
+    }
+    assert reopened.missing("https://data.matricula-online.eu/de/x/y/z/KB/") is None
+    reopened.close()
+
+
+def test_journal_ignores_truncated_line(tmp_path):
+    """Check that a line truncated by a crash does not prevent reading the journal."""
+    journal = DownloadJournal(tmp_path)
+    journal.register(REGISTER, PAGES)
+    journal.close()
+
+    with (tmp_path / JOURNAL_FILENAME).open("a") as file:
+        file.write('{"event": "completed", "regis')
+
+    reopened = DownloadJournal(tmp_path)
+    assert reopened.missing(REGISTER) == PAGES
+    reopened.mark_completed(REGISTER, PAGES[0])
+    reopened.close()
+
+    assert DownloadJournal(tmp_path).missing(REGISTER) == PAGES[1:]
+
+
+def test_shard_registers():
+    """Check that URLs of the same register are never split among shards."""
+    urls = [REGISTER, *(f"{REGISTER.rsplit('KB+001', 1)[0]}KB+00{i}/" for i in (2, 3))]
+    urls.append(REGISTER.replace("?pg=1", "?pg=5"))
+
+    shards = shard_registers(urls, 2)
+    assert shards == [[urls[0], urls[3], urls[2]], [urls[1]]]
+    assert len(shard_registers(urls, 8)) == 3
+
+
+def test_journal_tail(tmp_path):
+    """Check that a tail only counts complete events appended after it was created."""
+    journal = DownloadJournal(tmp_path, flush_every=1)
+    journal.register(REGISTER, PAGES)
+    tail = JournalTail(tmp_path)
+
+    journal.mark_completed(REGISTER, PAGES[0])
+    journal.mark_failed(REGISTER, PAGES[1])
+    with (tmp_path / JOURNAL_FILENAME).open("a") as file:
+        file.write('{"event": "completed", "regis')
+    tail.poll()
+    assert (tail.registers, tail.completed, tail.failed) == (set(), 1, 1)
+
+    with (tmp_path / JOURNAL_FILENAME).open("a") as file:
+        file.write(f'ter": "{register_key(REGISTER)}", "page": "{PAGES[2]}"}}\n')
+    tail.poll()
+    assert tail.completed == 2
+    journal.close()
@@ -0,0 +1,41 @@
+"""Test the transforms of `parish fetch --postprocess`."""
+
+import pytest
+from PIL import Image
+
+from matricula_online_scraper.utils.image_transforms import (
+    Transform,
+    apply_transforms,
+    parse_transforms,
+)
+
+
+def test_parse_transforms():  # noqa: D103
+    assert parse_transforms("grayscale, thumbnail:512") == [
+        Transform("grayscale"),
+        Transform("thumbnail", 512),
+    ]
+    for spec in ("sepia", "thumbnail:big", "webp:0", ""):
+        with pytest.raises(ValueError):
+            parse_transforms(spec)
+
+
+def test_apply_transforms_creates_missing_derivatives(tmp_path):
+    """Check that each derivative is created once, with the transform's format."""
+    source = tmp_path / "KB1_0001.jpg"
+    Image.new("RGB", (800, 600), "white").save(source)
+    transforms = parse_transforms("grayscale,thumbnail:100")
+    outputs = [
+        (t, t.output_path(tmp_path / "derivatives", "KB1/0001.jpg")) for t in transforms
+    ]
+
+    created = apply_transforms(str(source), outputs)
+    assert created == [str(output) for _, output in outputs]
+    with Image.open(outputs[0][1]) as gray:
+        assert gray.mode == "L" and gray.size == (800, 600)
+    with Image.open(outputs[1][1]) as thumbnail:
+        assert thumbnail.size == (100, 75)
+
+    # existing derivatives are kept, the scan is not even opened
+    source.unlink()
+    assert apply_transforms(str(source), outputs) == []
@@ -0,0 +1,67 @@
+"""Test the integrity checks of `parish verify`."""
+
+import hashlib
+import io
+
+from PIL import Image
+
+from matricula_online_scraper.utils.download_journal import DownloadJournal
+from matricula_online_scraper.utils.integrity import check_jpeg, verify_directory
+
+REGISTER = (
+    "https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/KB+001/"
+)
+
+
+def _jpeg() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (16, 16)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def test_check_jpeg():
+    """Check that valid, truncated and non-JPEG data are told apart."""
+    data = _jpeg()
+    assert check_jpeg(data) is None
+    assert check_jpeg(data[:-2]) == "truncated (missing EOI marker)"
+    assert check_jpeg(data[:20]) is not None
+    assert check_jpeg(b"GIF89a") == "not a JPEG image (missing SOI marker)"
+
+
+def test_verify_directory(tmp_path):
+    """Check that missing, corrupt and extra files are reported per register."""
+    data = _jpeg()
+    checksum = hashlib.md5(data).hexdigest()  # noqa: S324
+    pages = [f"http://images/{i}.jpg" for i in range(1, 6)]
+
+    journal = DownloadJournal(tmp_path)
+    journal.register(REGISTER, pages)
+    for i, page in enumerate(pages[:4], start=1):
+        path = tmp_path / "KB1" / f"{i}.jpg"
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(data)
+        journal.mark_completed(
+            REGISTER, page, path=f"KB1/{i}.jpg", checksum=checksum, size=len(data)
+        )
+    (tmp_path / "KB1/2.jpg").unlink()
+    (tmp_path / "KB1/3.jpg").write_bytes(data[:-1] + b"\x00")
+    (tmp_path / "KB1/5.jpg.part").write_bytes(b"")
+
+    (report,) = verify_directory(tmp_path, journal, workers=2)
+    assert (report.pages, report.ok) == (5, 2)
+    assert [(p.page, p.reason) for p in report.missing] == [
+        (pages[4], "not downloaded"),
+        (pages[1], "file not found"),
+    ]
+    assert [(p.path, p.reason) for p in report.corrupt] == [
+        ("KB1/3.jpg", "checksum mismatch")
+    ]
+    assert report.extra == ["KB1/5.jpg.part"]
+    assert not report.is_ok
+
+    # invalidated pages are downloaded again by `parish fetch --resume`
+    for problem in report.refetch:
+        if problem.path is not None:
+            journal.mark_invalidated(REGISTER, problem.page, problem.reason)
+    journal.close()
+    assert DownloadJournal(tmp_path).missing(REGISTER) == pages[1:3] + pages[4:]
@@ -0,0 +1,80 @@
+"""Test the SQLite job queue used by `queue add` and `queue work`."""
+
+import time
+
+from matricula_online_scraper.utils.job_queue import (
+    JobKind,
+    JobQueue,
+    JobState,
+    search_target,
+)
+
+REGISTER = (
+    "https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/KB+001/"
+)
+PARISH = "https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/"
+
+
+def test_add_skips_queued_jobs(tmp_path):
+    """Check that the same register, written differently, is only queued once."""
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    assert queue.add(JobKind.REGISTER, f"{REGISTER}?pg=7")
+    assert not queue.add(JobKind.REGISTER, REGISTER.rstrip("/"))
+    assert (
+        queue.add_many([(JobKind.PARISH, PARISH), (JobKind.SEARCH, search_target("x"))])
+        == 2
+    )
+    assert queue.counts()[JobKind.REGISTER][JobState.PENDING] == 1
+    queue.close()
+
+
+def test_claim_and_complete(tmp_path):
+    """Check that a claimed job is not handed out twice and can be completed."""
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    queue.add_many([(JobKind.REGISTER, REGISTER), (JobKind.PARISH, PARISH)])
+
+    first, second = queue.claim("a"), queue.claim("b")
+    assert (first.kind, first.target, first.attempts) == (JobKind.REGISTER, REGISTER, 1)
+    assert second.kind == JobKind.PARISH
+    assert queue.claim("c") is None
+
+    assert not queue.complete(first, "b")  # not the owner
+    assert queue.complete(first, "a")
+    assert queue.release(second, "b")
+    assert queue.claim("c").attempts == 1  # releasing does not count as an attempt
+    assert queue.has_open_jobs()
+    queue.close()
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    """Check that the job of a dead worker is handed out again, until it is given up."""
+    queue = JobQueue(tmp_path / "jobs.sqlite3", lease_secs=0.05, max_attempts=2)
+    queue.add(JobKind.REGISTER, REGISTER)
+
+    dead = queue.claim("dead")
+    time.sleep(0.1)
+    taken_over = queue.claim("alive")
+    assert taken_over.id == dead.id and taken_over.attempts == 2
+    assert not queue.heartbeat(dead, "dead")
+
+    time.sleep(0.1)
+    assert queue.claim("other") is None
+    assert queue.failed() == [
+        (JobKind.REGISTER, REGISTER, "worker stopped responding 2 times")
+    ]
+    assert not queue.has_open_jobs()
+    assert queue.retry_failed() == 1
+    assert queue.claim("other").attempts == 1
+    queue.close()
+
+
+def test_fail_retries_until_max_attempts(tmp_path):
+    """Check that a failed job is tried again `max_attempts` times."""
+    queue = JobQueue(tmp_path / "jobs.sqlite3", max_attempts=2)
+    queue.add(JobKind.REGISTER, REGISTER)
+
+    queue.fail(queue.claim("a"), "a", "boom")
+    assert queue.counts()[JobKind.REGISTER][JobState.PENDING] == 1
+    queue.fail(queue.claim("a"), "a", "boom again")
+    assert queue.failed() == [(JobKind.REGISTER, REGISTER, "boom again")]
+    queue.close()
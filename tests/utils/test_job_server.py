@@ -0,0 +1,146 @@
+"""Test the job API of `serve`."""
+
+import io
+import json
+
+import pytest
+from scrapy import signals
+from scrapy.utils.test import get_crawler
+from twisted.internet.defer import Deferred, succeed
+from twisted.web.test.requesthelper import DummyRequest
+
+from matricula_online_scraper.utils import job_server
+from matricula_online_scraper.utils.job_server import JobApi, JobRunner
+
+PARISH = "https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/"
+REGISTER = PARISH + "KB+001/"
+
+
+class FakeEngine:
+    """Records that the crawler stopped its engine."""
+
+    running = True
+    stopped = False
+
+    def stop(self):  # noqa: D102
+        self.stopped = True
+        return succeed(None)
+
+    async def stop_async(self):  # noqa: D102
+        self.stop()
+
+
+class FakeRunner:
+    """Creates real crawlers, but only pretends to run them until the test finishes them."""
+
+    crawls: list[Deferred] = []
+
+    def __init__(self, settings):  # noqa: D107
+        self.settings = settings
+
+    def create_crawler(self, spidercls):  # noqa: D102
+        return get_crawler(spidercls, self.settings)
+
+    def crawl(self, crawler, **kwargs):  # noqa: D102
+        crawler.crawling = True
+        crawler.engine = FakeEngine()
+        deferred = Deferred()
+        FakeRunner.crawls.append(deferred)
+        return deferred
+
+
+@pytest.fixture(autouse=True)
+def fake_runner(monkeypatch):  # noqa: D103
+    FakeRunner.crawls = []
+    monkeypatch.setattr(job_server, "CrawlerRunner", FakeRunner)
+
+
+def _request(api: JobApi, method: str, path: str, body=None, **args):
+    request = DummyRequest(path.strip("/").encode().split(b"/"))
+    request.method = method.encode()
+    request.args = {key.encode(): [str(value).encode()] for key, value in args.items()}
+    request.content = io.BytesIO(json.dumps(body).encode() if body else b"")
+    data = json.loads(api.render(request))
+    return request.responseCode, data
+
+
+def _scrape(job, item):
+    job.crawler.signals.send_catch_log(
+        signals.item_scraped, item=item, response=None, spider=None
+    )
+
+
+def test_submit_status_items_and_stop():
+    """Check a job's life cycle through the API."""
+    api = JobApi(JobRunner())
+    assert _request(api, "POST", "/jobs", {"command": "unknown"})[0] == 400
+    assert _request(api, "POST", "/jobs", {"command": "show", "parish": "x"})[0] == 400
+
+    code, job = _request(api, "POST", "/jobs", {"command": "show", "parish": PARISH})
+    assert code == 201 and job["status"] == "running"
+    served = api.runner.jobs[job["id"]]
+    for i in range(3):
+        _scrape(served, {"url": f"{PARISH}KB{i}/"})
+
+    assert _request(api, "GET", f"/jobs/{job['id']}")[1]["items"] == 3
+    assert len(_request(api, "GET", f"/jobs/{job['id']}/items")[1]) == 3
+    assert _request(api, "GET", f"/jobs/{job['id']}/items", offset=2)[1] == [
+        {"url": f"{PARISH}KB2/"}
+    ]
+    assert _request(api, "GET", f"/jobs/{job['id']}/items", offset="x")[0] == 400
+    assert _request(api, "GET", "/jobs/99")[0] == 404
+
+    assert _request(api, "DELETE", f"/jobs/{job['id']}")[1]["status"] == "stopped"
+    FakeRunner.crawls[0].callback(None)
+    _, status = _request(api, "GET", f"/jobs/{job['id']}")
+    assert status["status"] == "stopped" and status["finished"] is not None
+
+
+def test_stopping_a_running_job_stops_its_crawler():
+    """Check that `DELETE /jobs/<id>` stops the engine of the job's crawler."""
+    api = JobApi(JobRunner())
+    _, job = _request(api, "POST", "/jobs", {"command": "show", "parish": PARISH})
+    crawler = api.runner.jobs[job["id"]].crawler
+
+    code, status = _request(api, "DELETE", f"/jobs/{job['id']}")
+    assert code == 202 and status["status"] == "stopped"
+    assert crawler.engine.stopped and not crawler.crawling
+
+
+def test_finished_jobs_and_items_are_bounded():
+    """Check that only the latest finished jobs and items of a job are kept."""
+    runner = JobRunner(max_finished_jobs=1, max_items_per_job=2)
+    jobs = [runner.submit({"command": "show", "parish": PARISH}) for _ in range(3)]
+    for i in range(3):
+        _scrape(jobs[2], {"page": i})
+    assert jobs[2].items_since(0) == [{"page": 1}, {"page": 2}]
+    assert jobs[2].items_since(2) == [{"page": 2}]
+    assert jobs[2].to_json()["items_dropped"] == 1
+
+    FakeRunner.crawls[0].callback(None)
+    FakeRunner.crawls[1].errback(RuntimeError("broken"))
+    assert list(runner.jobs) == [jobs[1].id, jobs[2].id]
+    assert jobs[1].status == "failed"
+    FakeRunner.crawls[2].callback(None)
+    assert list(runner.jobs) == [jobs[2].id]
+
+
+def test_journal_is_closed_if_the_crawler_cannot_be_created(tmp_path, monkeypatch):
+    """Check that a failed fetch job does not keep its journal open."""
+    journals = []
+
+    class Journal(job_server.DownloadJournal):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            journals.append(self)
+
+    def broken(self, spidercls):
+        raise ValueError("broken settings")
+
+    monkeypatch.setattr(job_server, "DownloadJournal", Journal)
+    monkeypatch.setattr(FakeRunner, "create_crawler", broken)
+    with pytest.raises(ValueError, match="broken settings"):
+        JobRunner().submit(
+            {"command": "fetch", "urls": [REGISTER], "outdirectory": str(tmp_path)}
+        )
+    assert journals and journals[0]._closed
@@ -0,0 +1,82 @@
+"""Test requesting all pages of a listing at once and yielding them in order."""
+
+import pytest
+import scrapy
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+from twisted.python.failure import Failure
+
+from matricula_online_scraper.utils.matricula_pagination import (
+    PaginationSpiderMixin,
+    create_next_url,
+    last_page_number,
+)
+
+LISTING = "https://data.matricula-online.eu/en/suchen/?place=aachen"
+
+
+class _ListingSpider(PaginationSpiderMixin, scrapy.Spider):
+    name = "listing"
+
+    def parse_page(self, response):
+        yield from response.css("li.item::text").getall()
+
+
+def _page(request: Request, items: list[str], pages: range) -> HtmlResponse:
+    body = "<ul>{}</ul><ul class='pagination'>{}</ul>".format(
+        "".join(f"<li class='item'>{item}</li>" for item in items),
+        "".join(
+            f"<li class='page-item'><a class='page-link' href='?page={p}'>{p}</a></li>"
+            for p in pages
+        ),
+    )
+    return HtmlResponse(request.url, body=body.encode(), request=request)
+
+
+def test_pages_are_requested_at_once_and_yielded_in_order():
+    """Check that pages arriving out of order or failing do not change the output."""
+    spider = _ListingSpider.from_crawler(get_crawler(_ListingSpider))
+    output = list(spider.parse(_page(Request(LISTING), ["a", "b"], range(1, 4))))
+    requests = [o for o in output if isinstance(o, Request)]
+    assert [o for o in output if not isinstance(o, Request)] == ["a", "b"]
+    assert [r.meta["listing_page"] for r in requests] == [2, 3]
+    assert [r.priority for r in requests] == [-2, -3]
+    assert "place=aachen" in requests[1].url and "page=3" in requests[1].url
+
+    # the last page links a page that was not in the first pagination
+    page_3, page_2 = requests[1], requests[0]
+    output = list(spider.parse(_page(page_3, ["e"], range(2, 5))))
+    assert [r.meta["listing_page"] for r in output] == [4]
+    page_4 = output[0]
+
+    failure = Failure(ConnectionError("refused"))
+    failure.request = page_2  # type: ignore
+    assert list(spider._page_failed(failure)) == ["e"]
+    assert list(spider.parse(_page(page_4, ["f"], range(3, 5)))) == ["f"]
+    assert not spider._listings
+
+
+def test_parse_page_must_be_implemented():
+    """Check that a spider without `parse_page` cannot be created."""
+
+    class IncompleteSpider(PaginationSpiderMixin, scrapy.Spider):
+        name = "incomplete"
+
+    with pytest.raises(TypeError, match="parse_page"):
+        IncompleteSpider.from_crawler(get_crawler(IncompleteSpider))
+
+
+def test_create_next_url_keeps_the_query():
+    """Check that the page is replaced and all other parameters are kept as they are."""
+    search = (
+        "https://data.matricula-online.eu/en/suchen/?place=aachen&diocese=1&diocese=2"
+    )
+    assert create_next_url(search, "2") == f"{search}&page=2"
+    assert create_next_url(f"{search}&page=2", "3") == f"{search}&page=3"
+
+
+def test_last_page_number():
+    """Check that the highest linked page is found and a missing pagination is None."""
+    request = Request(LISTING)
+    assert last_page_number(_page(request, [], range(4, 8))) == 7
+    assert last_page_number(_page(request, [], range(0))) is None
@@ -0,0 +1,33 @@
+"""Test the page selection of `parish fetch --pages`."""
+
+import pytest
+
+from matricula_online_scraper.utils.page_selection import PageSelection
+
+
+@pytest.mark.parametrize(
+    ("spec", "expected"),
+    [
+        ("10-12,55", [10, 11, 12, 55]),
+        ("3", [3]),
+        ("58-", [58, 59, 60]),
+        ("-2, 4", [1, 2, 4]),
+        ("5-6,1-5", [1, 2, 3, 4, 5, 6]),
+        ("61-70", []),
+    ],
+)
+def test_select(spec, expected):
+    """Check that the selected pages are in order, without duplicates and within the register."""
+    assert PageSelection.parse(spec).select(60) == expected
+
+
+@pytest.mark.parametrize("spec", ["", "0", "5-2", "a-b", "1,,2", "-"])
+def test_parse_invalid(spec):
+    """Check that malformed selections are rejected."""
+    with pytest.raises(ValueError):
+        PageSelection.parse(spec)
+
+
+def test_str_roundtrip():
+    """Check that a selection is printed the way it is written."""
+    assert str(PageSelection.parse("1-3,7,10-")) == "1-3,7,10-"
@@ -0,0 +1,38 @@
+"""Test searching a snapshot of `parish list` offline."""
+
+from matricula_online_scraper.utils.parish_index import ParishIndex
+
+
+def _parish(country: str, region: str, name: str) -> dict:
+    return {"country": country, "region": region, "name": name, "url": name}
+
+
+PARISHES = [
+    _parish("Deutschland", "Passau, rk. Bistum", "Arbing-bei-Neuoetting"),
+    _parish("Österreich", "Oberösterreich: Rk. Diözese Linz", "Eberschwang"),
+    _parish("Deutschland", "Aachen", "Aachen, St. Mariä Himmelfahrt"),
+    _parish("Deutschland", "Aachen", "Aachen, St. Martin"),
+]
+
+
+def test_search_by_place():
+    """Check that each word of the query must start a word, ignoring case and accents."""
+    index = ParishIndex(PARISHES)
+    assert [p["name"] for p in index.search(place="st. mar")] == [
+        "Aachen, St. Mariä Himmelfahrt",
+        "Aachen, St. Martin",
+    ]
+    assert [p["name"] for p in index.search(place="Maria")] == [
+        "Aachen, St. Mariä Himmelfahrt"
+    ]
+    assert [p["name"] for p in index.search(place="LINZ eber")] == ["Eberschwang"]
+    assert index.search(place="schwang") == []
+
+
+def test_search_by_country_and_region():
+    """Check that countries and regions match by their start and combine with places."""
+    index = ParishIndex(PARISHES)
+    assert [p["name"] for p in index.search(country="osterreich")] == ["Eberschwang"]
+    assert len(index.search(country="Deutsch", region="aachen")) == 2
+    assert index.search(region="passau", place="aachen") == []
+    assert index.search() == PARISHES
@@ -0,0 +1,60 @@
+"""Test syncing `parish list` against a previous snapshot."""
+
+import csv
+import gzip
+import json
+
+from matricula_online_scraper.utils.parish_snapshot import SnapshotDiff, load_snapshot
+
+HOST = "https://data.matricula-online.eu/de/deutschland/aachen"
+
+
+def _parish(name: str, **coordinates: float) -> dict:
+    return {
+        "country": "Deutschland",
+        "region": "Aachen",
+        "name": name,
+        "url": f"{HOST}/{name.lower()}/",
+        **coordinates,
+    }
+
+
+def test_load_gzipped_csv(tmp_path):
+    """Check that coordinates are parsed and empty cells are dropped."""
+    path = tmp_path / "parishes.csv.gz"
+    with gzip.open(path, "wt", newline="") as file:
+        writer = csv.DictWriter(file, ["country", "region", "name", "url", "longitude", "latitude"])  # fmt: skip
+        writer.writeheader()
+        writer.writerow(_parish("A", longitude=6.1, latitude=50.7))
+        writer.writerow(_parish("B") | {"longitude": "", "latitude": ""})
+
+    snapshot = load_snapshot(path)
+    assert snapshot[f"{HOST}/a/"] == _parish("A", longitude=6.1, latitude=50.7)
+    assert snapshot[f"{HOST}/b/"] == _parish("B")
+
+
+def test_diff(tmp_path):
+    """Check that added, removed and renamed parishes are reported."""
+    path = tmp_path / "parishes.jsonl"
+    path.write_text(
+        "".join(
+            json.dumps(p) + "\n"
+            for p in (_parish("A", longitude=6.1, latitude=50.7), _parish("B"))
+        )
+    )
+    diff = SnapshotDiff(load_snapshot(path))
+    diff.add(_parish("A", longitude=6.1, latitude=50.7))
+    diff.add(_parish("C"))
+    diff.add(_parish("B") | {"region": "Köln"})
+
+    diff.write(tmp_path / "parishes.diff.jsonl")
+    changes = [json.loads(line) for line in (tmp_path / "parishes.diff.jsonl").open()]
+    assert [(c["change"], c["parish"]["name"]) for c in changes] == [
+        ("added", "C"),
+        ("changed", "B"),
+    ]
+    assert changes[1]["previous"]["region"] == "Aachen"
+
+    diff = SnapshotDiff(load_snapshot(path))
+    diff.add(_parish("B"))
+    assert [p["name"] for p in diff.removed] == ["A"]
@@ -0,0 +1,51 @@
+"""Test how `queue work` runs the jobs it claims."""
+
+import asyncio
+from pathlib import Path
+
+from scrapy.http import HtmlResponse
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from matricula_online_scraper.spiders.utils import extract_register_pages
+from matricula_online_scraper.utils.download_journal import DownloadJournal
+from matricula_online_scraper.utils.job_queue import JobKind, JobQueue, JobState
+from matricula_online_scraper.utils.queue_worker import QueueWorker
+
+FIXTURE = Path(__file__).parent.parent / "fixtures" / "church_register.html"
+REGISTER = (
+    "https://data.matricula-online.eu/de/deutschland/aachen/aachen-hl-kreuz/KB+001/"
+)
+
+
+def test_requeued_register_that_is_complete_succeeds(tmp_path):
+    """Check that a register whose pages are all in the journal is not failed."""
+    response = HtmlResponse(
+        REGISTER + "?pg=2", body=FIXTURE.read_bytes(), encoding="utf-8"
+    )
+    _, pages = extract_register_pages(response.body)
+    journal = DownloadJournal(tmp_path)
+    journal.register(REGISTER, pages)
+    for page in pages:
+        journal.mark_completed(REGISTER, page)
+
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    queue.add(JobKind.REGISTER, REGISTER)
+    worker = QueueWorker(queue, runner=None, journal=journal, exit_when_empty=True)  # type: ignore
+
+    async def crawl(spidercls, **kwargs):
+        # the spider finds no missing page and yields nothing, like in a real crawl
+        crawler = get_crawler(spidercls)
+        spider = spidercls.from_crawler(crawler, **kwargs)
+        items = list(spider.parse(response))
+        return items, MemoryStatsCollector(crawler)
+
+    worker._crawl = crawl  # type: ignore
+    job = queue.claim(worker.name)
+    assert job is not None
+    asyncio.run(worker._run_job(job))
+
+    assert worker.done == 1 and worker.failed == 0
+    assert queue.counts()[JobKind.REGISTER][JobState.DONE] == 1
+    journal.close()
+    queue.close()
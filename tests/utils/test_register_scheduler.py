@@ -0,0 +1,50 @@
+"""Test the order in which `RegisterScheduler` admits registers."""
+
+import pytest
+
+from matricula_online_scraper.utils.register_scheduler import RegisterScheduler
+
+
+def _admitted(scheduler: RegisterScheduler, sizes: list[int]) -> list[int]:
+    """Admit registers of the given sizes and return the order in which they start."""
+    order: list[int] = []
+    for size in sizes:
+        scheduler.admit(size).addCallback(lambda _, size=size: order.append(size))
+    while scheduler.active:
+        scheduler.finish()
+    return order
+
+
+def test_registers_are_admitted_in_order():
+    """Check that at most `max_registers` run at once, the others in arrival order."""
+    scheduler = RegisterScheduler(max_registers=2, max_pages=4)
+    assert _admitted(scheduler, [10, 500, 20, 300]) == [10, 500, 20, 300]
+    assert (scheduler.active, scheduler.waiting) == (0, 0)
+
+
+def test_largest_registers_first():
+    """Check that waiting registers are admitted by size, the largest first."""
+    scheduler = RegisterScheduler(max_registers=1, max_pages=4, largest_first=True)
+    assert _admitted(scheduler, [10, 20, 500, 20, 300]) == [10, 500, 300, 20, 20]
+
+
+def test_pages_in_flight_are_limited():
+    """Check that each register gets its own limiter with `max_pages` tokens."""
+    scheduler = RegisterScheduler(max_registers=2, max_pages=2)
+    limiters = []
+    scheduler.admit(5).addCallback(limiters.append)
+    scheduler.admit(5).addCallback(limiters.append)
+    first, second = limiters
+    assert first is not second
+
+    pages = [first.acquire() for _ in range(3)]
+    assert [page.called for page in pages] == [True, True, False]
+    assert second.acquire().called
+    first.release()
+    assert pages[2].called
+
+
+def test_invalid_limits():
+    """Check that a scheduler that admits nothing cannot be created."""
+    with pytest.raises(ValueError):
+        RegisterScheduler(max_registers=0)
@@ -0,0 +1,67 @@
+"""Test finding parishes by their coordinates."""
+
+import random
+
+from matricula_online_scraper.utils.spatial_index import SpatialIndex, haversine_km
+
+rng = random.Random(42)
+PARISHES = [
+    {
+        "name": f"Ort{i}",
+        "url": f"https://data.matricula-online.eu/de/x/{i}/",
+        "latitude": rng.uniform(-89, 89),
+        "longitude": rng.uniform(-180, 180),
+    }
+    for i in range(2000)
+] + [{"name": "Ohne Koordinaten", "url": "https://data.matricula-online.eu/de/x/-/"}]
+
+
+def _urls(index: SpatialIndex, matches) -> list[str]:
+    return [index.parish(i)["url"] for _, i in matches]
+
+
+def _closest(lat: float, lon: float) -> list[tuple[float, str]]:
+    return sorted(
+        (haversine_km(lat, lon, p["latitude"], p["longitude"]), p["url"])
+        for p in PARISHES
+        if "latitude" in p
+    )
+
+
+def test_bbox_matches_a_scan():
+    """Check that a bounding box finds exactly the parishes inside it."""
+    index = SpatialIndex.build(PARISHES)
+    assert len(index) == 2000
+    found = {index.parish(i)["url"] for i in index.bbox(10, -20, 40, 30)}
+    assert found == {
+        p["url"]
+        for p in PARISHES
+        if "latitude" in p and 10 <= p["latitude"] <= 40 and -20 <= p["longitude"] <= 30
+    }
+
+
+def test_radius_and_nearest_match_a_scan():
+    """Check the closest parishes, also across the antimeridian and near a pole."""
+    index = SpatialIndex.build(PARISHES)
+    for lat, lon in [(50.77, 6.08), (-10, 179.9), (88, 0)]:
+        closest = _closest(lat, lon)
+        within = [url for distance, url in closest if distance <= 1500]
+        assert _urls(index, index.within(lat, lon, 1500)) == within
+        assert _urls(index, index.nearest(lat, lon, 7)) == [
+            url for _, url in closest[:7]
+        ]
+        assert _urls(index, index.nearest(lat, lon, 7, radius_km=1500)) == within[:7]
+
+
+def test_saved_index_reads_parishes_on_demand(tmp_path):
+    """Check that an index written to a file answers the same queries."""
+    built = SpatialIndex.build(PARISHES)
+    built.save(tmp_path / "parishes.jsonl.spatial")
+
+    index = SpatialIndex.open(tmp_path / "parishes.jsonl.spatial")
+    try:
+        assert index.nearest(48.57, 13.46, 3) == built.nearest(48.57, 13.46, 3)
+        i = index.bbox(-90, -180, 90, 180)[123]
+        assert index.parish(i) == built.parish(i)
+    finally:
+        index.close()
@@ -0,0 +1,41 @@
+"""Test reading URLs from STDIN while the crawler runs."""
+
+import io
+import time
+
+import twisted.internet
+
+from matricula_online_scraper.utils.url_feed import UrlFeed
+
+
+class _InlineReactor:
+    """Runs the calls of the reader thread right away instead of in a reactor."""
+
+    @staticmethod
+    def callFromThread(fn, *args):  # noqa: D102, N802
+        fn(*args)
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_feed_reads_ahead_only_max_pending(monkeypatch):
+    """Check that invalid lines are skipped and reading waits for handled URLs."""
+    monkeypatch.setattr(twisted.internet, "reactor", _InlineReactor(), raising=False)
+    feed = UrlFeed(
+        io.StringIO("a\n\nbad\nb\n"), validate=lambda url: url != "bad", max_pending=1
+    )
+    urls: list[str] = []
+    feed.start(urls.append)
+
+    _wait_for(lambda: feed.invalid == ["bad"])
+    time.sleep(0.05)
+    assert urls == ["a"] and not feed.eof
+
+    feed.done()
+    _wait_for(lambda: feed.eof)
+    assert urls == ["a", "b"] and feed.count == 2